@@ -0,0 +1,296 @@
+'''
+Copyright:   Copyright (C) 2015 Baruch College, FX Modeling Course
+Author:      Weiyi Chen
+Description: Electronic hedging of a book of several USD currency pairs, run in one vectorized engine. The state is
+             laid out as (pairs x runs): every pair has its own client trade intensity, spreads and delta limit, the
+             spots move with correlated shocks from the Cholesky factor of the pair correlation matrix, and the
+             hedging rule works either on each pair's delta or on the aggregate USD delta of the book.
+
+Test: test_portfolio.py
+'''
+
+# 3rd party imports
+
+from numpy import *
+
+# local imports
+
+from graph import lazy
+from simulator import Simulator
+
+
+class PortfolioSimulator(Simulator):
+    '''
+    Monte Carlo Simulator of a multi-pair book. Per-pair inputs are column arrays, one row per pair, so the Simulator
+    hedge rule and the chunked, parallel and variance reduced machinery apply unchanged; the PNL statistics are those
+    of the whole book in USD.
+    '''
+    def __init__(self):
+        super(PortfolioSimulator, self).__init__()
+
+    @lazy
+    def Pairs(self):
+        ''' Names of the currency pairs, all quoted against USD '''
+        return ['EURUSD', 'GBPUSD', 'AUDUSD']
+
+    @lazy
+    def Spot(self):
+        ''' Starting USD value of one unit of each pair '''
+        return array([[1.1], [1.3], [.75]])
+
+    @lazy
+    def Vol(self):
+        ''' Daily volatilities of the pairs, from 10%, 9% and 12% a year over 260 trading days '''
+        return array([[.1], [.09], [.12]]) * sqrt(1 / 260.)
+
+    @lazy
+    def Correlation(self):
+        ''' Correlation matrix of the spot shocks '''
+        return array([[1., .6, .5], [.6, 1., .4], [.5, .4, 1.]])
+
+    @lazy
+    def Cholesky(self):
+        ''' lower Cholesky factor of the correlation, turning independent normals into correlated shocks '''
+        return linalg.cholesky(self.Correlation)
+
+    @lazy
+    def FactorModel(self):
+        '''
+        The correlation as common factors plus an independent shock per pair: the largest multiple floor x I of the 
+        identity that the correlation stays positive semi-definite without is split off, and the rest factored through
+        its nonzero eigenvalues. Returns the (pairs x factors) loadings and the specific vol sqrt(floor). A flat 
+        correlation needs a single factor however many pairs there are, and a single pair none.
+        '''
+        eigenvalues, eigenvectors = linalg.eigh(self.Correlation)
+        floor = maximum(eigenvalues[0], 0.)
+        factors = eigenvalues > floor + 1e-12 * eigenvalues[-1]
+        return eigenvectors[:, factors] * sqrt(eigenvalues[factors] - floor), sqrt(floor)
+
+    @lazy
+    def Lambda(self):
+        ''' Poisson frequencies of client trades per day: 1, 0.5 and 0.25 trades/second '''
+        return array([[1.], [.5], [.25]]) * 60 * 60 * 24
+
+    @lazy
+    def SpreadClient(self):
+        ''' Bid/ask spreads for client trades '''
+        return array([[1e-4], [1.5e-4], [2e-4]])
+
+    @lazy
+    def SpreadDealer(self):
+        ''' Bid/ask spreads for inter-dealer hedge trades '''
+        return array([[2e-4], [3e-4], [4e-4]])
+
+    @lazy
+    def DeltaLimit(self):
+        ''' Per-pair delta limits, in units of each pair '''
+        return array([[3.], [3.], [3.]])
+
+    @lazy
+    def HedgeRule(self):
+        '''
+        'pair' hedges each pair against its own delta limit; 'aggregate' hedges the whole book when its USD delta
+        breaches AggregateLimit, either flattening every pair or (partial hedge) scaling the book back to the limit
+        '''
+        return 'pair'
+
+    @lazy
+    def AggregateLimit(self):
+        ''' Limit on the absolute USD delta of the book for the aggregate hedging rule '''
+        return 4.
+
+    @lazy
+    def EventBlock(self):
+        ''' Number of (pair, run) entries the event engine advances together, few enough for their state to stay in cache '''
+        return 2**13
+
+    @lazy
+    def TimeStep(self):
+        ''' a time step delta t equal to 0.1/lambda of the busiest pair '''
+        return 0.1 / self.Lambda.max()
+
+    @lazy
+    def ExpectedIncome(self):
+        ''' Expected client spread income of the book, the spots being martingales '''
+        return (self.NSteps * self.TradingProb * self.SpreadClient * self.Spot / 2.).sum()
+
+    def generator(self, nruns, seed):
+        ''' random Generator for a chunk; the Sobol driver only covers the single pair engines '''
+        if self.QuasiRandom:
+            raise ValueError('Quasi random runs are not supported for portfolios')
+        return random.default_rng(seed)
+
+    def sweep(self, **grid):
+        ''' the trading parameters are already per-pair columns, so they cannot be swept as configurations '''
+        raise ValueError('Parameter sweeps are not supported for portfolios')
+
+    def simulate_runs(self, nruns, rng):
+        '''
+        Simulate one chunk of runs of the book with the selected engine, returning the USD PNL of the book and its
+        client spread income for each run
+        '''
+        if self.Engine == 'event':
+            return self.simulate_events(nruns, rng)
+        if self.Engine == 'stepped':
+            return self.simulate_steps(nruns, rng)
+        raise ValueError('Portfolios only run on the stepped and event engines, not ' + repr(self.Engine))
+
+    def simulate_steps(self, nruns, rng):
+        '''
+        Stepped simulation of the book. Each step draws one normal and one uniform per pair and run; the uniform decides
+        both whether a client trade arrives (u < p) and its sign (u < p/2 sells). Positions only change where a trade 
+        arrives or a hedge is due, so trades and hedges are applied to those (pair, run) entries only. Returns the USD 
+        PNL of the book and its client spread income for each run.
+        '''
+        npairs = len(self.Pairs)
+        spots = self.Spot * ones(nruns)
+        positions = zeros((npairs, nruns))
+        pnls = zeros(nruns)
+        incomes = zeros(nruns)
+        shocks = self.Vol * sqrt(self.TimeStep)
+        probs, limits = self.TradingProb[:, 0], self.DeltaLimit[:, 0]
+        client, dealer = self.SpreadClient[:, 0], self.SpreadDealer[:, 0]
+
+        for step in range(self.NSteps):
+            normals = dot(self.Cholesky, rng.standard_normal((npairs, nruns)))
+            uniforms = rng.random((npairs, nruns))
+
+            # client trades of +/- one unit, getting paid half the client bid/ask
+            pairs, runs = nonzero(less(uniforms, self.TradingProb))
+            positions[pairs, runs] += where(less(uniforms[pairs, runs], probs[pairs] / 2.), -1., 1.)
+            income = bincount(runs, client[pairs] * spots[pairs, runs], nruns) / 2.
+            pnls += income
+            incomes += income
+
+            # check if there are hedge trades
+            if self.HedgeRule == 'pair':
+                # only the pairs that just traded can be outside their limit
+                positions[pairs, runs], costs = self.hedge(positions[pairs, runs], spots[pairs, runs], limits[pairs], 
+                                                           dealer[pairs])
+                pnls -= bincount(runs, costs, nruns)
+            else:
+                # the book delta also moves with the spots, so every run is checked
+                deltas = (positions * spots).sum(axis=0)
+                if self.FullHedge == True:
+                    runs = flatnonzero(greater_equal(absolute(deltas), self.AggregateLimit))
+                    targets = zeros((npairs, runs.size))
+                else:
+                    runs = flatnonzero(greater(absolute(deltas), self.AggregateLimit))
+                    targets = positions[:, runs] * self.AggregateLimit / absolute(deltas[runs])
+                pnls[runs] -= (absolute(positions[:, runs] - targets) * self.SpreadDealer * spots[:, runs]).sum(axis=0) / 2.
+                positions[:, runs] = targets
+
+            dspots = shocks * spots * normals
+            pnls += (positions * dspots).sum(axis=0)
+            spots += dspots
+
+        return pnls, incomes
+
+    def simulate_events(self, nruns, rng):
+        '''
+        Event driven simulation of the book on the stepped engine's time grid, for the pair hedging rule. Each pair 
+        jumps straight to its next client trade: the steps to it are a geometric draw (the number of failed Bernoulli 
+        trials of TradingProb), and one uniform u gives both the trade's sign, that of 2u - 1, and that wait, since 
+        |2u - 1| is again uniform. The spots are driftless lognormal on the grid, driven by the common factors of FactorModel and 
+        by each pair's specific shock, drawn once for the whole wait to its next trade. 
+
+        A pair's position only changes at its own trades, so the PNL on it is taken from one trade to the next, and 
+        the (pair, run) entries of a run only share its factor paths. The runs are advanced EventBlock entries at a 
+        time, and within a block every entry with trades left is jumped to its next trade, round after round, the 
+        entries done dropping out; the factor paths are drawn in windows of steps taking at most RandomBlock numbers.
+        '''
+        if self.HedgeRule != 'pair':
+            raise ValueError('The book delta of the aggregate rule moves with every spot; it needs the stepped engine')
+
+        block = int(maximum(1, self.EventBlock // len(self.Pairs)))
+        results = [self.simulate_event_block(int(minimum(block, nruns - start)), rng) for start in range(0, nruns, block)]
+        return tuple(concatenate(arrays) for arrays in zip(*results))
+
+    def simulate_event_block(self, nruns, rng):
+        ''' Event driven simulation of a block of runs of the book (see simulate_events) '''
+        npairs, nsteps, dt = len(self.Pairs), self.NSteps, self.TimeStep
+        loadings, specific = self.FactorModel
+        limits, client, dealer = self.DeltaLimit[:, 0], self.SpreadClient[:, 0] / 2., self.SpreadDealer[:, 0]
+        spot, vol = self.Spot[:, 0], self.Vol[:, 0]
+        waits = 1. / log1p(-self.TradingProb[:, 0])
+
+        # log spot moves per unit of each factor's path (the sum of its normals) and per unit specific normal, and 
+        # the lognormal drift per step
+        exposures, shocks, drifts = loadings.T * (vol * sqrt(dt)), specific * vol * sqrt(dt), vol**2 * dt / 2.
+
+        # state of each (pair, run) entry, pair by pair: the step of its next trade and the sign of that trade, its
+        # position and the spot it was last marked at, its specific log spot move up to the next trade, its PNL and 
+        # income
+        STEP, TRADE, POSITION, MARK, SHOCK, PNL, INCOME = range(7)
+        state = zeros((7, npairs * nruns))
+        state[MARK] = repeat(spot, nruns)
+
+        def schedule(columns, pairs, start):
+            ''' the next trades of entries marked at their current STEP, from step start on, and their shocks '''
+            uniforms = rng.random(len(pairs))
+            uniforms *= 2.
+            uniforms -= 1.
+            copysign(1., uniforms, out=columns[TRADE])
+            with errstate(divide='ignore'):
+                steps = log(absolute(uniforms, out=uniforms), out=uniforms)
+            steps *= waits.take(pairs)
+            steps = minimum(floor(steps, out=steps) + start, nsteps, out=steps)
+            moves = sqrt(steps - columns[STEP])
+            moves *= shocks.take(pairs)
+            moves *= rng.standard_normal(len(pairs))
+            columns[SHOCK] += moves
+            columns[STEP] = steps
+
+        schedule(state, repeat(arange(npairs), nruns), 0.)
+
+        # factor paths, as the running sums of their normals, one row per step and factor
+        factors = zeros((loadings.shape[1], nruns))
+        window = int(maximum(1, self.RandomBlock // maximum(factors.size, 1)))
+        for first in range(0, nsteps, window):
+            last = int(minimum(first + window, nsteps))
+
+            paths = empty((last - first + 1,) + factors.shape)
+            paths[0] = factors
+            rng.standard_normal(out=paths[1:])
+            cumsum(paths, axis=0, out=paths)
+            factors = paths[-1].copy()
+            paths = paths.ravel()
+
+            live = flatnonzero(state[STEP] < last)
+            columns = state[:, live]
+            while live.size:
+                pairs = live // nruns
+                cells = (columns[STEP] - first).astype(intp) * factors.size + live - pairs * nruns
+
+                # spots at the trades, and the PNL on the positions since the last trade
+                spots = columns[STEP] * drifts.take(pairs)
+                spots -= columns[SHOCK]
+                for factor in range(len(factors)):
+                    spots -= exposures[factor].take(pairs) * paths.take(cells + factor * nruns)
+                spots = exp(negative(spots, out=spots), out=spots)
+                spots *= spot.take(pairs)
+                columns[PNL] += columns[POSITION] * (spots - columns[MARK])
+                columns[MARK] = spots
+
+                # client trades of +/- one unit, getting paid half the client bid/ask, then the hedges
+                columns[POSITION], costs = self.hedge(columns[POSITION] + columns[TRADE], spots, limits.take(pairs), 
+                                                      dealer.take(pairs))
+                spots *= client.take(pairs)
+                columns[INCOME] += spots
+                spots -= costs
+                columns[PNL] += spots
+
+                schedule(columns, pairs, columns[STEP] + 1.)
+
+                # entries with no trade left in the window are written back
+                done = columns[STEP] >= last
+                if done.any():
+                    state[:, live[done]] = columns[:, done]
+                    kept = flatnonzero(~done)
+                    live, columns = live.take(kept), columns.take(kept, axis=1)
+
+        # every position held to the horizon
+        moves = dot(exposures.T, factors) + state[SHOCK].reshape(npairs, nruns) - (drifts * nsteps)[:, newaxis]
+        state[PNL] += state[POSITION] * ((spot[:, newaxis] * exp(moves)).ravel() - state[MARK])
+
+        return state[PNL].reshape(npairs, nruns).sum(axis=0), state[INCOME].reshape(npairs, nruns).sum(axis=0)
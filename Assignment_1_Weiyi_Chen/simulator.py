@@ -17,16 +17,38 @@ Test: Assign1_test.py
 
 # python import
 
-from lazy import lazy
+import collections
+import itertools
+import os
+import warnings
 from multiprocessing import Pool
 
 # 3rd party imports
 
 from numpy import *
 
+# optional imports, only needed for quasi random runs
+
+try:
+    from scipy.stats import norm, qmc
+except ImportError:
+    qmc = None
+
+# local imports
+
+from graph import lazy
+from pnlstats import RunningMoments, QuantileSketch
+
 
 class Simulator(object):
     ''' Monte Carlo Simulator '''
+
+    # the model and simulation parameters, as opposed to the values derived from them and the statistics of a run
+    Inputs = ('Vol', 'Lambda', 'SpreadClient', 'SpreadDealer', 'FullHedge', 'DeltaLimit', 'TimeStep', 'NSteps', 'NRuns',
+              'TradingProb', 'Seed', 'Parallel', 'Processes', 'Engine', 'Dtype', 'RandomBlock', 'Horizon',
+              'ChunkSize', 'Antithetic', 'QuasiRandom', 'ControlVariate', 'MeanTolerance', 'SharpeTolerance',
+              'MaxRuns', 'Compression', 'Window')
+
     def __init__(self):
         super(Simulator, self).__init__()
 
@@ -82,59 +104,429 @@ class Simulator(object):
 
     @lazy
     def Seed(self):
-        ''' Seed for random generators '''
+        ''' Seed for random generators; every chunk of runs gets its own stream spawned from it '''
         return 100
 
     @lazy
     def Parallel(self):
+        ''' True means the chunks of runs are spread over a pool of worker processes '''
+        return False
+
+    @lazy
+    def Processes(self):
+        ''' Size of the worker pool for parallel runs, one per core '''
+        return os.cpu_count()
+
+    @lazy
+    def Window(self):
+        '''
+        Number of chunks handed to the worker pool ahead of the results merged so far; an adaptive run that converges
+        wastes at most this many chunks of work
+        '''
+        return 2 * self.Processes
+
+    @lazy
+    def Engine(self):
+        '''
+        'stepped' advances every run on the fixed TimeStep grid; 'kernel' is the same stepped scheme run in place on 
+        preallocated buffers; 'event' draws the Poisson inter-arrival times directly and only touches a run when a 
+        client trade (and so possibly a hedge) happens
+        '''
+        return 'stepped'
+
+    @lazy
+    def Dtype(self):
+        ''' Floating point type of the kernel engine buffers; float32 halves the memory traffic '''
+        return float64
+
+    @lazy
+    def RandomBlock(self):
+        ''' Number of random numbers the kernel engine draws from the Generator at once, and Sobol normals held at once '''
+        return 2**20
+
+    @lazy
+    def Horizon(self):
+        ''' Length of the simulation, the same NSteps time steps covered by the stepped engine '''
+        return self.NSteps * self.TimeStep
+
+    @lazy
+    def ChunkSize(self):
+        ''' Number of runs simulated at once; memory use is bounded by the chunk rather than by NRuns '''
+        return 100000
+
+    @lazy
+    def Antithetic(self):
+        ''' True means runs come in pairs sharing the trade draws, with the spot shocks of the second run mirrored '''
+        return False
+
+    @lazy
+    def QuasiRandom(self):
+        ''' True means the spot shocks of the stepped engines are driven by a scrambled Sobol sequence (needs scipy) '''
+        return False
+
+    @lazy
+    def ControlVariate(self):
+        ''' True means the PNL mean is estimated against the client spread income, whose expectation is known '''
         return False
 
+    @lazy
+    def ExpectedIncome(self):
+        ''' Expected client spread income: half the spread per expected trade, on a spot that is a martingale from 1 '''
+        trades = self.Lambda * self.Horizon if self.Engine == 'event' else self.NSteps * self.TradingProb
+        return trades * self.SpreadClient / 2.
+
+    @lazy
+    def MeanTolerance(self):
+        ''' Adaptive runs: keep adding chunks until the standard error of PNLMean is below this '''
+        return None
+
+    @lazy
+    def SharpeTolerance(self):
+        ''' Adaptive runs: keep adding chunks until the standard error of SharpeRatio is below this '''
+        return None
+
+    @lazy
+    def MaxRuns(self):
+        ''' Cap on the number of runs of an adaptive simulation '''
+        return 100 * self.NRuns
+
+    def chunks(self):
+        '''
+        Split the runs into chunks of ChunkSize, each with an independent random stream spawned from Seed. The split 
+        does not depend on how many workers run it, so results are reproducible for a given Seed and ChunkSize.
+        Adaptive runs go on up to MaxRuns, the caller stopping once the tolerances are met.
+        '''
+        adaptive = self.MeanTolerance is not None or self.SharpeTolerance is not None
+        total = self.MaxRuns if adaptive else self.NRuns
+        seeds = random.SeedSequence(self.Seed)
+        for start in range(0, total, self.ChunkSize):
+            yield int(minimum(self.ChunkSize, total - start)), seeds.spawn(1)[0]
+
+    def converged(self):
+        ''' whether the standard errors of the statistics so far meet the tolerances of an adaptive run '''
+        if self.MeanTolerance is not None and not all(self.PNLMeanStdErr < self.MeanTolerance):
+            return False
+        if self.SharpeTolerance is not None and not all(self.SharpeStdErr < self.SharpeTolerance):
+            return False
+        return self.MeanTolerance is not None or self.SharpeTolerance is not None
+
     def simulate(self):
         ''' Monte carlo simulation and change statistics on PNL '''
 
-        if self.Parallel:
-            random.seed(self.Seed)
+        tasks = ((self, nruns, seed) for nruns, seed in self.chunks())
+
+        with Pool(self.Processes) if self.Parallel else SerialPool() as pool:
+            # merge the chunk results in chunk order, whichever worker produced them
+            moments = RunningMoments()
+            estimates = RunningMoments()
+            sketch = QuantileSketch(self.Compression)
+            for chunk_moments, chunk_estimates, chunk_sketch in imap_window(pool, simulate_chunk, tasks, self.Window):
+                moments.merge(chunk_moments)
+                estimates.merge(chunk_estimates)
+                if chunk_sketch is not None:
+                    sketch.merge(chunk_sketch)
+                    self.PNLDistribution = sketch
+
+                # statistics of all the runs so far, the mean coming from the (variance reduced) estimates
+                self.PNLMean = estimates.Mean
+                self.PNLStdDev = moments.StdDev
+                self.SharpeRatio = self.PNLMean / self.PNLStdDev
+                self.PNLMeanStdErr = estimates.StdErr
+                self.SharpeStdErr = sqrt((self.PNLMeanStdErr / self.PNLStdDev)**2 + self.SharpeRatio**2 / (2. * moments.Count))
+
+                if self.converged():
+                    break
+
+        return moments
+
+    def simulate_estimates(self, nruns, seed):
+        '''
+        Simulate one chunk of runs from its seed, applying the variance reduction. Returns the PNL of each run, and the 
+        independent samples whose average estimates the PNL mean: the runs themselves, pair averages for antithetic 
+        runs, adjusted by the control variate when it is on.
+        '''
+        if self.Antithetic:
+            # the second run of each pair replays the same stream with mirrored normals; for an odd number of runs the
+            # mirror of the last run is dropped, and that run is an estimate on its own
+            pairs = (nruns + 1) // 2
+            pnls, incomes = self.simulate_runs(pairs, self.generator(pairs, seed))
+            mirrored_pnls, mirrored_incomes = self.simulate_runs(pairs, Mirrored(self.generator(pairs, seed)))
+            if nruns % 2:
+                mirrored_pnls[..., -1], mirrored_incomes[..., -1] = pnls[..., -1], incomes[..., -1]
+            estimates, incomes = (pnls + mirrored_pnls) / 2., (incomes + mirrored_incomes) / 2.
+            pnls = concatenate([pnls, mirrored_pnls[..., :nruns - pairs]], axis=-1)
+        else:
+            pnls, incomes = self.simulate_runs(nruns, self.generator(nruns, seed))
+            estimates = pnls
+
+        if self.ControlVariate:
+            # regression coefficient of the estimates on the income, fitted on the chunk
+            incomes = incomes - self.ExpectedIncome
+            centred = incomes - incomes.mean(axis=-1)[..., newaxis]
+            beta = (centred * estimates).sum(axis=-1) / maximum((centred**2).sum(axis=-1), finfo(float64).tiny)
+            estimates = estimates - beta[..., newaxis] * incomes
+
+        return pnls, estimates
+
+    def generator(self, nruns, seed):
+        ''' random Generator for a chunk; the spot shocks come from a Sobol sequence for quasi random runs '''
+        rng = random.default_rng(seed)
+        if self.QuasiRandom:
+            if qmc is None:
+                raise ImportError('Quasi random runs need scipy.stats.qmc')
+            if self.Engine == 'event':
+                raise ValueError('Quasi random runs need a stepped engine')
+            # blocks of as many steps as the kernel engine draws at once
+            rng = SobolNormals(rng, nruns, self.NSteps, int(maximum(1, self.RandomBlock // nruns)))
+        return rng
+
+    def sweep(self, **grid):
+        '''
+        Evaluate every combination of the given trading parameters in one batched pass, e.g.
+
+            s.sweep(DeltaLimit=[2., 3., 4.], FullHedge=[True, False])
+
+        Each configuration is a row of the simulation state and all rows share the same random draws (common random 
+        numbers), so differences between configurations are not swamped by simulation noise. Returns a record array 
+        holding the parameters and the PNL mean, standard deviation and Sharpe ratio of each configuration.
+        '''
+        for name in grid:
+            if name not in ('DeltaLimit', 'SpreadClient', 'SpreadDealer', 'FullHedge'):
+                raise TypeError('Cannot sweep over ' + name)
+
+        configs = list(itertools.product(*grid.values()))
+
+        # a fresh simulator with the same parameters, so that nothing derived from the swept ones (like the
+        # ExpectedIncome of the control variate) or left over from an earlier run carries over
+        batch = self.__class__()
+        for name in self.Inputs:
+            if name not in grid:
+                setattr(batch, name, getattr(self, name))
+        for name, values in zip(grid, zip(*configs)):
+            setattr(batch, name, array(values)[:, newaxis])
+        batch.simulate()
+
+        table = zeros(len(configs), dtype=[(name, type(grid[name][0])) for name in grid] + 
+                                         [('PNLMean', float64), ('PNLStdDev', float64), ('SharpeRatio', float64)])
+        for name in grid:
+            table[name] = getattr(batch, name)[:, 0]
+        table['PNLMean'], table['PNLStdDev'], table['SharpeRatio'] = batch.PNLMean, batch.PNLStdDev, batch.SharpeRatio
+        return table.view(recarray)
+
+    def simulate_runs(self, nruns, rng):
+        '''
+        Simulate one chunk of runs with the selected engine and random Generator, returning the PNL of each run and the
+        client spread income within it
+        '''
+        if self.Engine == 'event':
+            return self.simulate_events(nruns, rng)
+        if self.Engine == 'kernel':
+            return self.simulate_kernel(nruns, rng)
+        return self.simulate_steps(nruns, rng)
+
+    def state(self, nruns):
+        '''
+        Zeroed position/PNL state for a chunk of runs. When the trading parameters are column arrays (see sweep) there
+        is one row per configuration, all rows sharing the same random draws.
+        '''
+        return zeros(broadcast(self.DeltaLimit, self.SpreadClient, self.SpreadDealer, self.FullHedge, zeros(nruns)).shape)
+
+    def hedged(self, positions, limits=None):
+        '''
+        The positions after hedging those outside the delta limit: full hedges trigger at the limit and go to zero, 
+        the others go back to the limit once beyond it. The limits default to DeltaLimit.
+        '''
+        limits = self.DeltaLimit if limits is None else limits
+        if ndim(self.FullHedge) == 0:
+            if self.FullHedge:
+                return where(greater_equal(absolute(positions), limits), 0., positions)
+            return clip(positions, -limits, limits)
+        return where(self.FullHedge, where(greater_equal(absolute(positions), limits), 0., positions),
+                     clip(positions, -limits, limits))
+
+    def hedge(self, positions, spots, limits=None, spreads=None):
+        '''
+        Hedge the positions outside the delta limit (see hedged), paying half the dealer bid/ask on the hedged amount.
+        Returns the new positions and the hedging cost. The limits and dealer spreads default to DeltaLimit and 
+        SpreadDealer.
+        '''
+        spreads = self.SpreadDealer if spreads is None else spreads
+        hedged = self.hedged(positions, limits)
+        return hedged, absolute(positions - hedged) * spreads * spots / 2.
+
+    def simulate_steps(self, nruns, rng):
+        ''' Stepped simulation: advance every run through all NSteps time steps '''
 
         # Spot starts at 1
-        spots = ones(self.NRuns)
-        positions = zeros(self.NRuns)
-        pnls = zeros(self.NRuns)
+        spots = ones(nruns)
+        positions = self.state(nruns)
+        pnls = self.state(nruns)
+        incomes = self.state(nruns)
         
         for step in range(self.NSteps):
             # random numbers generators
-            normals = random.normal(0, sqrt(self.TimeStep), self.NRuns)
-            uniforms = random.uniform(0, 1, self.NRuns)
-            binormails = random.binomial(1, 0.5, self.NRuns) * 2 - 1
+            normals = rng.normal(0, sqrt(self.TimeStep), nruns)
+            uniforms = rng.uniform(0, 1, nruns)
+            binormails = rng.binomial(1, 0.5, nruns) * 2 - 1
             
             # check if there are client trades
             indicators = less(uniforms, self.TradingProb)
             positions += indicators * binormails
-            pnls += ones(self.NRuns) * indicators * self.SpreadClient * spots / 2.
+            income = indicators * self.SpreadClient * spots / 2.
+            pnls += income
+            incomes += income
             
             # check if there are hedge trades
-            if self.FullHedge == True:
-                indicators = logical_or(less_equal(positions, -self.DeltaLimit), greater_equal(positions, self.DeltaLimit))
-                pnls -= absolute(positions) * indicators * self.SpreadDealer * spots / 2.
-                positions -= positions*indicators
-
-            else:
-                # Cases pos > delta_lim
-                indicators  = greater(positions, self.DeltaLimit)
-                pnls -= (positions - self.DeltaLimit) * indicators * self.SpreadDealer * spots/2.
-                positions = positions * logical_not(indicators) + ones(self.NRuns) * indicators * self.DeltaLimit
-                
-                # Cases pos < -delta_lim
-                indicators  = less(positions, -self.DeltaLimit)
-                pnls -= (-self.DeltaLimit - positions) * indicators * self.SpreadDealer * spots/2.
-                positions = positions * logical_not(indicators) + ones(self.NRuns) * indicators * (-self.DeltaLimit)
+            positions, costs = self.hedge(positions, spots)
+            pnls -= costs
             
             dspots = self.Vol * spots * normals
             pnls += positions * dspots
             spots += dspots
 
-            self.PNLMean = pnls.mean()
-            self.PNLStdDev = pnls.std()
-            self.SharpeRatio = self.PNLMean / self.PNLStdDev
+        return pnls, incomes
+
+    def simulate_kernel(self, nruns, rng):
+        '''
+        Stepped simulation without temporaries: all work buffers are allocated once and updated with out= ufuncs, and
+        the random numbers come from the Generator in blocks of several steps. A single uniform per step decides both 
+        whether a client trade arrives (u < p) and its sign (u < p/2 sells), since u/p is again uniform given u < p.
+        '''
+
+        dtype = self.Dtype
+        shape = self.state(nruns).shape
+
+        # Spot starts at 1
+        spots = ones(nruns, dtype)
+        positions = zeros(shape, dtype)
+        pnls = zeros(shape, dtype)
+        incomes = zeros(shape, dtype)
+
+        # work buffers
+        trades, moves = empty(nruns, dtype), empty(nruns, dtype)
+        arrived, sells = empty(nruns, bool), empty(nruns, bool)
+        hedges, signs = empty(shape, dtype), empty(shape, dtype)
+        breached, touched = empty(shape, bool), empty(shape, bool)
+
+        # parameters folded into the constants the loop needs; the delta limit kept after a hedge is zero for full hedges
+        kept = self.DeltaLimit * logical_not(self.FullHedge)
+        client = asarray(self.SpreadClient / 2., dtype)
+        dealer = asarray(self.SpreadDealer / 2., dtype)
+        vol = dtype(self.Vol * sqrt(self.TimeStep))
+
+        steps = int(maximum(1, self.RandomBlock // nruns))
+        for first in range(0, self.NSteps, steps):
+            block = int(minimum(steps, self.NSteps - first))
+            normals = rng.standard_normal((block, nruns), dtype=dtype)
+            uniforms = rng.random((block, nruns), dtype=dtype)
+
+            for step in range(block):
+                # client trades: +1 / -1 / 0, getting paid half the client bid/ask
+                less(uniforms[step], self.TradingProb, out=arrived)
+                less(uniforms[step], self.TradingProb / 2., out=sells)
+                subtract(arrived, sells, out=trades, dtype=dtype)
+                trades -= sells
+                positions += trades
+                multiply(arrived, spots, out=moves, dtype=dtype)
+                multiply(moves, client, out=hedges)
+                pnls += hedges
+                incomes += hedges
+
+                # hedges: full hedges trigger at the limit, partial hedges beyond it
+                absolute(positions, out=hedges)
+                greater(hedges, self.DeltaLimit, out=breached)
+                equal(hedges, self.DeltaLimit, out=touched)
+                logical_and(touched, self.FullHedge, out=touched)
+                logical_or(breached, touched, out=breached)
+                hedges -= kept
+                hedges *= breached
+                sign(positions, out=signs)
+                signs *= hedges
+                positions -= signs
+                hedges *= spots
+                hedges *= dealer
+                pnls -= hedges
+
+                # spot move, PNL on the position held over the step
+                multiply(spots, normals[step], out=moves)
+                moves *= vol
+                multiply(positions, moves, out=hedges)
+                pnls += hedges
+                spots += moves
+
+        return pnls, incomes
+
+    def simulate_events(self, nruns, rng):
+        '''
+        Event driven simulation: jump every run straight to its next client trade, evolving the spot in closed form 
+        (driftless lognormal) in between, then apply the trade and the hedge rule exactly as the stepped engine does.
+
+        The events are taken in blocks of a few per run, laid out (events x runs). One uniform u per event gives both
+        the trade's sign, that of 2u - 1, and the exponential wait to it, from |2u - 1|, again uniform; the arrival
+        times and the spots at the trades are then running sums down the block. Only the positions, each hedge 
+        depending on the position before it, take a loop over the events of the block, and the PNL, client income
+        and hedging costs are summed over the block at once. Runs past the Horizon drop out between blocks.
+
+        At the default parameters, about 50 trades per run against 500 steps, this runs 5 to 7 times faster than the
+        stepped engine for 1000 to 50000 runs, and about 3 times faster than the kernel one (benchmarks/benchmark.py,
+        checked in test_benchmark.py); the work per event, the blocks of draws and running sums, costs more than a step.
+        '''
+        horizon, vol = self.Horizon, self.Vol
+        spots = ones(nruns)
+        positions = self.state(nruns)
+        pnls = self.state(nruns)
+        incomes = self.state(nruns)
+        times = zeros(nruns)
+
+        # indices of the runs that are still before the horizon
+        live = arange(nruns)
+        # (events x runs) arrays broadcast against (events x configurations x runs) ones
+        expand = (slice(None),) + (newaxis,) * (positions.ndim - 1)
+
+        while live.size:
+            # about enough events for the live runs to reach the horizon, within RandomBlock numbers
+            expected = self.Lambda * (horizon - times[live].min())
+            nevents = int(minimum(maximum(1, self.RandomBlock // live.size), ceil(expected + sqrt(expected)) + 1))
+
+            # trade signs, and arrival times capped at the horizon, where trades stop
+            uniforms = rng.random((nevents, live.size))
+            uniforms *= 2.
+            uniforms -= 1.
+            trades = copysign(1., uniforms)
+            with errstate(divide='ignore'):
+                arrivals = log(absolute(uniforms, out=uniforms), out=uniforms)
+            cumsum(arrivals, axis=0, out=arrivals)
+            arrivals *= -1. / self.Lambda
+            arrivals += times[live]
+            arrived = arrivals < horizon
+            trades *= arrived
+
+            # closed form spot moves over the waits, and the spots at the trades
+            waits = diff(minimum(arrivals, horizon), axis=0, prepend=times[live][newaxis])
+            moves = sqrt(waits) * rng.standard_normal(waits.shape)
+            moves *= vol
+            moves -= vol**2 / 2. * waits
+            marks = exp(cumsum(moves, axis=0, out=moves), out=moves)
+            marks *= spots[live]
+
+            # client trade of the given sign, then hedge if outside the delta limit
+            held = empty((nevents + 1,) + positions[..., live].shape)
+            held[0] = positions[..., live]
+            for event in range(nevents):
+                held[event + 1] = self.hedged(held[event] + trades[event])
+
+            # PNL on the position held up to each trade, half the client bid/ask on the trades and the hedging costs
+            pnls[..., live] += (held[:-1] * diff(marks, axis=0, prepend=spots[live][newaxis])[expand]).sum(axis=0)
+            income = self.SpreadClient / 2. * (arrived * marks).sum(axis=0)
+            hedges = absolute(held[:-1] + trades[expand] - held[1:])
+            costs = self.SpreadDealer / 2. * (hedges * marks[expand]).sum(axis=0)
+            pnls[..., live] += income - costs
+            incomes[..., live] += income
+
+            spots[live], times[live], positions[..., live] = marks[-1], arrivals[-1], held[-1]
+            live = live[arrivals[-1] < horizon]
+
+        return pnls, incomes
 
     @lazy
     def SharpeRatio(self):
@@ -151,9 +543,135 @@ class Simulator(object):
         ''' PNL standard deviation '''
         return 0.
 
+    @lazy
+    def PNLMeanStdErr(self):
+        ''' Standard error of the PNL mean estimate '''
+        return 0.
+
+    @lazy
+    def SharpeStdErr(self):
+        ''' Standard error of the Sharpe ratio estimate '''
+        return 0.
+
+    @lazy
+    def Compression(self):
+        ''' Compression of the PNL quantile sketch; higher keeps more centroids and gives more accurate tails '''
+        return 1000
+
+    @lazy
+    def PNLDistribution(self):
+        '''
+        Quantile sketch of the PNL across the runs, giving quantiles, histogram, VaR and expected shortfall with 
+        bounded memory. Not kept for the batched configurations of a sweep.
+        '''
+        return None
+
     def __str__(self):
         ''' '''
         print('\tPNL Sharpe ratio:\t', self.SharpeRatio)
         print('\tPNL Mean:\t\t', self.PNLMean)
         print('\tPNL Std dev:\t\t', self.PNLStdDev)
+        if self.PNLDistribution is not None:
+            print('\tPNL 99% VaR:\t\t', self.PNLDistribution.VaR(.99))
+            print('\tPNL 99% ES:\t\t', self.PNLDistribution.ExpectedShortfall(.99))
         return ''
+
+
+class SerialPool(object):
+    ''' Stand-in for a process Pool that runs the tasks one after the other in this process '''
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def imap(self, func, tasks):
+        return map(func, tasks)
+
+
+def imap_window(pool, func, tasks, window):
+    '''
+    pool.imap over the tasks, in order, with at most window tasks submitted ahead of the results taken, so that a
+    caller stopping early leaves no queue of tasks behind (a Pool's imap submits every task at once)
+    '''
+    if isinstance(pool, SerialPool):
+        yield from pool.imap(func, tasks)
+        return
+    pending = collections.deque()
+    for task in tasks:
+        pending.append(pool.apply_async(func, (task,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+class Mirrored(object):
+    ''' Random Generator replaying another Generator's stream with the normals mirrored, for antithetic runs '''
+    def __init__(self, rng):
+        super(Mirrored, self).__init__()
+        self.Rng = rng
+
+    def normal(self, loc=0., scale=1., size=None):
+        return 2. * loc - self.Rng.normal(loc, scale, size)
+
+    def standard_normal(self, size=None, dtype=float64, out=None):
+        if out is None:
+            return -self.Rng.standard_normal(size, dtype=dtype)
+        return negative(self.Rng.standard_normal(size, dtype=dtype, out=out), out=out)
+
+    def __getattr__(self, name):
+        return getattr(self.Rng, name)
+
+
+class SobolNormals(object):
+    '''
+    Random Generator serving the spot shocks of a stepped engine from scrambled Sobol sequences, one dimension per time
+    step and one point per run. The steps are covered in blocks of a few dimensions, each block its own independently
+    scrambled sequence (padded quasi random numbers), so only a block of steps x runs is held at once rather than all 
+    NSteps x runs. Everything else comes from the wrapped Generator, which also seeds the scrambling.
+    '''
+    def __init__(self, rng, nruns, nsteps, block):
+        super(SobolNormals, self).__init__()
+        self.Rng = rng
+        self.NRuns = nruns
+        self.Remaining = nsteps
+        self.Block = block
+        self.Normals = zeros((0, nruns))
+
+    def draw(self, nsteps):
+        ''' the normals of the next nsteps steps, scrambling a new block of dimensions whenever the last runs out '''
+        blocks = []
+        while nsteps:
+            if not len(self.Normals):
+                dimensions = int(minimum(self.Block, self.Remaining))
+                with warnings.catch_warnings():
+                    # the balance properties are only exact for a power of 2 runs, which chunk sizes need not be
+                    warnings.simplefilter('ignore')
+                    points = qmc.Sobol(dimensions, scramble=True, seed=self.Rng).random(self.NRuns)
+                self.Normals = norm.ppf(points).T
+                self.Remaining -= dimensions
+            taken = int(minimum(nsteps, len(self.Normals)))
+            blocks.append(self.Normals[:taken])
+            self.Normals = self.Normals[taken:]
+            nsteps -= taken
+        return blocks[0] if len(blocks) == 1 else concatenate(blocks)
+
+    def normal(self, loc=0., scale=1., size=None):
+        return loc + scale * self.draw(1)[0]
+
+    def standard_normal(self, size=None, dtype=float64):
+        return self.draw(size[0]).astype(dtype)
+
+    def __getattr__(self, name):
+        return getattr(self.Rng, name)
+
+
+def simulate_chunk(task):
+    ''' Worker task: PNL moments, mean estimates and quantile sketch of one chunk of runs, from the chunk's own seed '''
+    simulator, nruns, seed = task
+    pnls, estimates = simulator.simulate_estimates(nruns, seed)
+
+    # one sketch per chunk of a single configuration; sweeps only keep moments
+    sketch = QuantileSketch(simulator.Compression).add(pnls) if pnls.ndim == 1 else None
+    return RunningMoments().add(pnls), RunningMoments().add(estimates), sketch
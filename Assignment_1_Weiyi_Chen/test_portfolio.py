@@ -0,0 +1,120 @@
+'''
+Copyright:   Copyright (C) 2015 Baruch College, FX Modeling Course
+Author:      Weiyi Chen
+Description: Test script for portfolio.py
+Run:         PYTHONPATH=../common python3 test_portfolio.py
+'''
+
+# 3rd party imports
+
+from numpy import *
+
+# local imports
+
+from simulator import Simulator
+from portfolio import PortfolioSimulator
+
+def book(npairs, rho):
+    ''' a book of identical pairs with the single pair Simulator parameters and a flat correlation '''
+    s = Simulator()
+    p = PortfolioSimulator()
+    p.Pairs = ['Pair%d' % i for i in range(npairs)]
+    p.Spot = ones((npairs, 1))
+    p.Vol = full((npairs, 1), s.Vol)
+    p.Lambda = full((npairs, 1), float(s.Lambda))
+    p.SpreadClient = full((npairs, 1), s.SpreadClient)
+    p.SpreadDealer = full((npairs, 1), s.SpreadDealer)
+    p.DeltaLimit = full((npairs, 1), s.DeltaLimit)
+    p.Correlation = (1 - rho) * eye(npairs) + rho
+    return p
+
+def test_portfolio():
+    ''' test function on PortfolioSimulator '''
+
+    for rule in ['pair', 'aggregate']:
+        for full_hedge in [True, False]:
+            p = PortfolioSimulator()
+            p.HedgeRule = rule
+            p.FullHedge = full_hedge
+            p.simulate()
+            print(rule, 'hedging, full hedge', full_hedge, '- \n', p)
+
+def test_single_pair():
+    ''' a one pair book should agree statistically with Simulator '''
+
+    for full_hedge in [True, False]:
+        s = Simulator()
+        s.FullHedge = full_hedge
+        s.simulate()
+
+        p = book(1, 0.)
+        p.FullHedge = full_hedge
+        p.Seed = 200
+        p.simulate()
+
+        assert abs(p.PNLMean - s.PNLMean) < 5 * sqrt(p.PNLMeanStdErr**2 + s.PNLMeanStdErr**2)
+        assert abs(p.PNLStdDev / s.PNLStdDev - 1) < .05
+
+def test_correlated_pairs():
+    ''' per pair hedging of a correlated book earns the sum of the pairs' mean PNL '''
+
+    s = Simulator()
+    s.simulate()
+
+    correlated = book(5, .9)
+    correlated.simulate()
+    assert abs(correlated.PNLMean - 5 * s.PNLMean) < 5 * sqrt(correlated.PNLMeanStdErr**2 + 25 * s.PNLMeanStdErr**2)
+
+def test_aggregate_limit():
+    ''' a book never breaching its aggregate limit keeps all the client spread income '''
+
+    p = PortfolioSimulator()
+    p.HedgeRule = 'aggregate'
+    p.AggregateLimit = 1e9
+    p.simulate()
+    assert abs(p.PNLMean - p.ExpectedIncome) < 5 * p.PNLMeanStdErr
+
+def test_event_engine():
+    ''' the event driven book agrees statistically with the stepped one, for one pair and a correlated book '''
+
+    for npairs, rho in [(1, 0.), (5, .9), (20, .5)]:
+        for full_hedge in [True, False]:
+            stepped, event = book(npairs, rho), book(npairs, rho)
+            for p in stepped, event:
+                p.FullHedge = full_hedge
+            event.Engine = 'event'
+            event.Seed = 200
+            stepped.simulate()
+            event.simulate()
+
+            assert abs(event.PNLMean - stepped.PNLMean) < 5 * sqrt(event.PNLMeanStdErr**2 + stepped.PNLMeanStdErr**2)
+            assert abs(event.PNLStdDev / stepped.PNLStdDev - 1) < .05
+
+    # antithetic runs replay the factor paths drawn in place mirrored
+    stepped, event = book(5, .9), book(5, .9)
+    event.Engine, event.Antithetic, event.Seed = 'event', True, 200
+    stepped.simulate()
+    event.simulate()
+    assert abs(event.PNLMean - stepped.PNLMean) < 5 * sqrt(event.PNLMeanStdErr**2 + stepped.PNLMeanStdErr**2)
+    assert abs(event.PNLStdDev / stepped.PNLStdDev - 1) < .05
+
+def test_unsupported():
+    ''' the kernel engine, the event engine under the aggregate rule and sweeps are rejected rather than ignored '''
+
+    for engine, rule in [('kernel', 'pair'), ('event', 'aggregate')]:
+        p = PortfolioSimulator()
+        p.Engine = engine
+        p.HedgeRule = rule
+        try:
+            p.simulate()
+            assert False
+        except ValueError:
+            pass
+    try:
+        PortfolioSimulator().sweep(DeltaLimit=[2., 3.])
+        assert False
+    except ValueError:
+        pass
+
+if __name__=="__main__":
+    test_portfolio()
@@ -2,17 +2,18 @@
 Copyright:   Copyright (C) 2015 Baruch College, FX Modeling Course
 Author:      Weiyi Chen
 Description: Test script for simulator.py
-Run:         python3 test_simulator.py
+Run:         PYTHONPATH=../common python3 test_simulator.py
 '''
 
 # 3rd party imports
 
 from numpy import *
-from multiprocessing import Pool
+from scipy.stats import norm
 
 # local imports
 
 from simulator import Simulator
+from pnlstats import RunningMoments, QuantileSketch
 
 def test_simulator():
     '''test function on Simulator'''
@@ -28,25 +29,283 @@ def test_simulator():
     res = s.simulate()
     print('Partial Hedge approach - \n', s)
 
-def f(n):
+def test_event_engine():
+    ''' the event driven engine should agree statistically with the stepped engine '''
+
+    for full_hedge in [True, False]:
+        stepped = Simulator()
+        stepped.FullHedge = full_hedge
+        # one trade per step at most, with the same expected number of trades as the Poisson arrivals
+        stepped.TradingProb = stepped.Lambda * stepped.TimeStep
+        stepped.simulate()
+
+        events = Simulator()
+        events.FullHedge = full_hedge
+        events.Engine = 'event'
+        events.simulate()
+        print('Stepped engine - \n', stepped)
+        print('Event engine - \n', events)
+
+        stderr = sqrt((stepped.PNLStdDev**2 + events.PNLStdDev**2) / stepped.NRuns)
+        assert abs(stepped.PNLMean - events.PNLMean) < 5 * stderr
+        assert abs(stepped.PNLStdDev / events.PNLStdDev - 1) < .05
+
+def test_kernel_engine():
+    ''' the in-place kernel, in double and single precision, should agree statistically with the stepped engine '''
+
+    stepped = Simulator()
+    stepped.simulate()
+    print('Stepped engine - \n', stepped)
+
+    for dtype in [float64, float32]:
+        kernel = Simulator()
+        kernel.Engine = 'kernel'
+        kernel.Dtype = dtype
+        kernel.Seed = 200
+        kernel.simulate()
+        print('Kernel engine', dtype.__name__, '- \n', kernel)
+
+        stderr = sqrt((stepped.PNLStdDev**2 + kernel.PNLStdDev**2) / stepped.NRuns)
+        assert abs(stepped.PNLMean - kernel.PNLMean) < 5 * stderr
+        assert abs(stepped.PNLStdDev / kernel.PNLStdDev - 1) < .05
+
+def test_variance_reduction():
+    ''' antithetic, quasi random and control variate runs should estimate the same PNL mean, more precisely '''
+
+    plain = Simulator()
+    plain.Engine = 'kernel'
+    plain.simulate()
+
+    for technique in ['Antithetic', 'QuasiRandom', 'ControlVariate']:
+        s = Simulator()
+        s.Engine = 'kernel'
+        s.Seed = 300
+        setattr(s, technique, True)
+        s.simulate()
+        print(technique, 'PNL mean:', s.PNLMean, '+/-', s.PNLMeanStdErr)
+
+        assert abs(s.PNLMean - plain.PNLMean) < 5 * sqrt(s.PNLMeanStdErr**2 + plain.PNLMeanStdErr**2)
+
+    # on the same draws the control variate regression can only take variance out of the estimates
     s = Simulator()
-    s.Parallel = True
-    s.Seed = n
+    s.Engine, s.ControlVariate = 'kernel', True
+    s.simulate()
+    assert s.PNLMeanStdErr < plain.PNLMeanStdErr
+
+    # antithetic pairs cancel the spot PNL but share the trades, so they pay off once the spot risk dominates
+    errors = {}
+    for antithetic in [False, True]:
+        s = Simulator()
+        s.Engine, s.Antithetic = 'kernel', antithetic
+        s.Vol *= 10.
+        s.simulate()
+        errors[antithetic] = s.PNLMeanStdErr
+    assert errors[True] < errors[False] / 2.
+
+def test_quasi_random_blocks():
+    ''' Sobol normals come in blocks of steps, each dimension stratified over the runs '''
+
+    s = Simulator()
+    s.QuasiRandom = True
+    s.RandomBlock = 3 * 1024
+    s.NSteps = 10
+    rng = s.generator(1024, 0)
+    normals = concatenate([rng.standard_normal((2, 1024)), [rng.normal(0., 1.)], rng.standard_normal((7, 1024))])
+    assert normals.shape == (10, 1024) and len(rng.Normals) == 0
+    strata = sort(floor(norm.cdf(normals) * 1024), axis=1)
+    assert all(strata == arange(1024))
+
+def test_adaptive_simulator():
+    ''' adaptive runs should stop at the first chunk meeting the tolerance '''
+
+    s = Simulator()
+    s.Engine = 'kernel'
+    s.ChunkSize = 1000
+    s.MeanTolerance = 1e-5
+    s.SharpeTolerance = .02
+    moments = s.simulate()
+    print('Adaptive simulation over', moments.Count, 'runs - \n', s)
+
+    assert s.PNLMeanStdErr < s.MeanTolerance and s.SharpeStdErr < s.SharpeTolerance
+    assert moments.Count < s.MaxRuns and moments.Count % s.ChunkSize == 0
+
+    # one chunk less would not have been enough
+    s.MeanTolerance = s.SharpeTolerance = None
+    s.NRuns = moments.Count - s.ChunkSize
+    s.simulate()
+    assert s.PNLMeanStdErr >= 1e-5 or s.SharpeStdErr >= .02
+
+def test_antithetic_runs():
+    ''' antithetic runs give exactly the number of runs asked for, odd or even '''
+
+    for nruns, chunk in [(1001, 300), (1000, 250), (7, 3)]:
+        s = Simulator()
+        s.Engine, s.Antithetic = 'event', True
+        s.NRuns, s.ChunkSize = nruns, chunk
+        assert s.simulate().Count == nruns
+
+    pnls, estimates = s.simulate_estimates(7, random.SeedSequence(0))
+    assert pnls.shape == (7,) and estimates.shape == (4,)
+    # the unpaired last run is its own estimate
+    assert estimates[-1] == pnls[3]
+
+    # mirrored normals, returned or drawn in place
+    from simulator import Mirrored
+    normals, out = random.default_rng(0).standard_normal((3, 4)), empty((3, 4))
+    assert array_equal(Mirrored(random.default_rng(0)).standard_normal((3, 4)), -normals)
+    assert Mirrored(random.default_rng(0)).standard_normal(out=out) is out and array_equal(out, -normals)
+
+def test_window():
+    ''' the pool is handed at most a window of chunks ahead of the results taken '''
+
+    from multiprocessing import Pool
+    from simulator import imap_window
+    submitted = []
+    def tasks():
+        for i in range(100):
+            submitted.append(i)
+            yield i
+    with Pool(2) as pool:
+        results = imap_window(pool, abs, tasks(), 4)
+        assert [next(results) for i in range(3)] == [0, 1, 2]
+        assert len(submitted) <= 3 + 4
+
+    # an adaptive parallel run stops as soon as the serial one does, with the same statistics
+    serial, parallel = Simulator(), Simulator()
+    for s in [serial, parallel]:
+        s.Engine, s.ChunkSize, s.SharpeTolerance = 'event', 1000, .05
+    parallel.Parallel, parallel.Processes = True, 2
+    assert serial.simulate().Count == parallel.simulate().Count < serial.MaxRuns
+    assert (serial.PNLMean, serial.SharpeRatio) == (parallel.PNLMean, parallel.SharpeRatio)
+
+def test_running_moments():
+    ''' merging chunk moments should reproduce the moments of the whole sample '''
+
+    values = random.normal(1e3, 1e-2, 100001)
+    moments = RunningMoments()
+    for chunk in array_split(values, 7):
+        moments.merge(RunningMoments().add(chunk))
+
+    assert moments.Count == values.size
+    assert abs(moments.Mean - values.mean()) < 1e-9
+    assert abs(moments.StdDev / values.std() - 1) < 1e-9
+
+    # rows with missing values, one column at a time, keep their own counts
+    values = random.normal(0, 1, (3, 50))
+    values[0, ::3], values[2] = nan, nan
+    moments = RunningMoments()
+    for column in values.T:
+        moments.add(column[:, newaxis], skipna=True)
+    assert array_equal(moments.Count, [33, 50, 0])
+    assert allclose(moments.Mean[:2], nanmean(values[:2], axis=1)) and moments.Mean[2] == 0.
+    assert allclose(moments.M2[:2] / moments.Count[:2], nanvar(values[:2], axis=1)) and moments.M2[2] == 0.
+
+def test_quantile_sketch():
+    ''' a sketch merged from chunks should give accurate quantiles, tails and expected shortfall '''
+
+    values = random.standard_t(5, 1000000)
+    sketch = QuantileSketch()
+    for chunk in array_split(values, 100):
+        sketch.merge(QuantileSketch().add(chunk))
+
+    assert sketch.Count == values.size
+    assert sketch.Means.size < 1000
+
+    # error in rank, relative to the tail probability
+    levels = array([1e-4, 1e-3, .01, .05, .5, .95, .99, .999])
+    ranks = searchsorted(sort(values), sketch.quantile(levels)) / values.size
+    assert all(abs(ranks - levels) < .05 * minimum(levels, 1 - levels) + 1e-4)
+
+    tail = sort(values)[:10000]
+    assert abs(sketch.ExpectedShortfall(.99) / -tail.mean() - 1) < .01
+    assert abs(sketch.histogram(10)[0].sum() - values.size) < 1e-6 * values.size
+
+def test_chunked_simulator():
+    ''' streaming the runs through small chunks should not change the statistics '''
+
+    s = Simulator()
+    s.simulate()
+
+    chunked = Simulator()
+    chunked.ChunkSize = 1000
+    moments = chunked.simulate()
+    print('Chunked simulation - \n', chunked)
+
+    assert moments.Count == chunked.NRuns
+    assert abs(s.PNLMean - chunked.PNLMean) < 5 * sqrt(2) * moments.StdErr
+
+def test_sweep():
+    ''' a batched sweep should match separate runs driven by the same random numbers '''
+
+    for engine in ['stepped', 'event']:
+        s = Simulator()
+        s.Engine = engine
+        table = s.sweep(DeltaLimit=[2., 3.], FullHedge=[True, False])
+        print(table)
+
+        for row in table:
+            single = Simulator()
+            single.Engine = engine
+            single.DeltaLimit = row.DeltaLimit
+            single.FullHedge = row.FullHedge
+            single.simulate()
+            assert allclose([row.PNLMean, row.PNLStdDev], [single.PNLMean, single.PNLStdDev], rtol=1e-10)
+
+def test_sweep_after_simulate():
+    ''' a sweep after a run should not reuse anything the run derived from the swept parameters '''
+
+    s = Simulator()
+    s.ControlVariate, s.Engine, s.NRuns = True, 'event', 2000
     s.simulate()
-    return s.NRuns, s.PNLMean, s.PNLStdDev
+    table = s.sweep(SpreadClient=[1e-4, 3e-4])
+
+    for row in table:
+        fresh = Simulator()
+        fresh.ControlVariate, fresh.Engine, fresh.NRuns = True, 'event', 2000
+        fresh.SpreadClient = row.SpreadClient
+        fresh.simulate()
+        assert allclose([row.PNLMean, row.PNLStdDev], [fresh.PNLMean, fresh.PNLStdDev], rtol=1e-10)
+
+def test_invalidation():
+    ''' changing a parameter recomputes the values derived from it '''
+
+    s = Simulator()
+    s.ControlVariate = True
+    income = s.ExpectedIncome
+    s.Lambda, s.SpreadClient = 2. * s.Lambda, 3e-4
+
+    fresh = Simulator()
+    fresh.ControlVariate = True
+    fresh.Lambda, fresh.SpreadClient = s.Lambda, s.SpreadClient
+    assert (s.TimeStep, s.TradingProb, s.Horizon) == (fresh.TimeStep, fresh.TradingProb, fresh.Horizon)
+    assert s.ExpectedIncome == fresh.ExpectedIncome != income
 
 def test_simulators():
     ''' parallel version to call Simulator '''
 
-    p = Pool(100)
-    res = p.map(f, range(100))
-    
-    NRuns = sum([n for n, m, std in res])
-    PNLMean = mean([n*m for n, m, std in res]) / NRuns
-    PNLStdDev = mean([n*std for n, m, std in res]) / NRuns
-    SharpeRatio = PNLMean / PNLStdDev
+    s = Simulator()
+    s.NRuns = 100000
+    s.ChunkSize = 10000
+    s.Parallel = True
+    moments = s.simulate()
+    print('Parallel simulation - \n', s)
+
+    # the same chunks and random streams, whatever the number of workers
+    for processes in [1, 3]:
+        p = Simulator()
+        p.NRuns = s.NRuns
+        p.ChunkSize = s.ChunkSize
+        p.Parallel = True
+        p.Processes = processes
+        assert p.simulate().Count == moments.Count
+        assert (p.PNLMean, p.PNLStdDev) == (s.PNLMean, s.PNLStdDev)
+        assert all(p.PNLDistribution.Means == s.PNLDistribution.Means)
 
-    print(SharpeRatio)
+    serial = Simulator()
+    serial.NRuns = s.NRuns
+    serial.ChunkSize = s.ChunkSize
+    serial.simulate()
+    assert (serial.PNLMean, serial.PNLStdDev, serial.SharpeRatio) == (s.PNLMean, s.PNLStdDev, s.SharpeRatio)
 
 if __name__=="__main__":
     test_simulator()
\ No newline at end of file
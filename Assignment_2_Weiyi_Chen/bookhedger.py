@@ -0,0 +1,162 @@
+'''
+Author:      Weiyi Chen
+Copyright:   Copyright (C) 2015 Baruch College, Modeling and Market Making in Forex Exchange
+Description: Generalisation of hedger.py to a book of many forwards across the curve, hedged with any number of
+benchmark forwards against a factor model with any number of factors. Hedge notionals for the whole book come out of
+one linear solve and the book PNL out of matrix products, rather than one Hedger per position.
+Test:        bookhedger_test.py
+'''
+
+
+from numpy import *
+
+from graph import lazy
+from hedger import Hedger
+
+class BookHedger(Hedger):
+    """
+    The asset currency interest rate follows a K factor model:
+
+        dQ(T) = Σ_f σ_f e^(-β_f T) dz_f
+        E[dz_f dz_g] = ρ_fg dt
+
+    The book holds forwards with notionals N_i settling at T_i, hedged with forwards settling at the benchmark tenors
+    B_1 < ... < B_n. By default this is the two factor, two benchmark, one position market of Hedger.
+    """
+    def __init__(self):
+        super(BookHedger, self).__init__()
+
+    @lazy
+    def PositionTenors(self):
+        ''' settlement times of the forwards in the book '''
+        return array([self.Tenor])
+
+    @lazy
+    def PositionNotionals(self):
+        ''' asset-currency notionals of the forwards in the book '''
+        return ones(len(self.PositionTenors))
+
+    @lazy
+    def Benchmarks(self):
+        ''' settlement times of the hedge forwards, increasing '''
+        return array([self.T1, self.T2])
+
+    @lazy
+    def Sigmas(self):
+        ''' vols of the factors '''
+        return array([self.Sigma1, self.Sigma2])
+
+    @lazy
+    def Betas(self):
+        ''' mean reversions of the factors '''
+        return array([self.Beta1, self.Beta2])
+
+    @lazy
+    def Correlation(self):
+        ''' correlation matrix of the factor brownian motions '''
+        return array([[1., self.Rho], [self.Rho, 1.]])
+
+    @lazy
+    def ChunkSize(self):
+        ''' number of Monte Carlo runs revalued at once, bounding memory at ChunkSize x positions '''
+        return int(maximum(1, 2**22 // len(self.PositionTenors)))
+
+    def loadings(self, tenors):
+        ''' sensitivity of Q(T) to each factor, one row per tenor '''
+        return self.Sigmas * exp(-outer(tenors, self.Betas))
+
+    @lazy
+    def PV01Ratios(self):
+        '''
+        notional of each benchmark forward with the same sensitivity to its own rate as a unit of each position has to
+        its own, one row per position
+        '''
+        positions, benchmarks = self.PositionTenors[:, newaxis], self.Benchmarks
+        return positions / benchmarks * exp(-self.Q*(positions-benchmarks))
+
+    @lazy
+    def TriangleWeights(self):
+        '''
+        share of each position's rate shock put on each benchmark by the triangle shocks: linear between neighbouring
+        benchmarks, flat before the first and after the last
+        '''
+        tenors = clip(self.PositionTenors, self.Benchmarks[0], self.Benchmarks[-1])
+        right = clip(searchsorted(self.Benchmarks, tenors), 1, len(self.Benchmarks) - 1)
+        left = right - 1
+        fraction = (tenors - self.Benchmarks[left]) / (self.Benchmarks[right] - self.Benchmarks[left])
+
+        weights = zeros((len(tenors), len(self.Benchmarks)))
+        rows = arange(len(tenors))
+        weights[rows, left] = 1. - fraction
+        weights[rows, right] += fraction
+        return weights
+
+    @lazy
+    def FactorWeights(self):
+        '''
+        rate shock of each position in terms of the benchmark rate shocks: the factor loadings of the positions written
+        as combinations of the benchmark loadings, all positions in one least squares solve (exact when there are as
+        many benchmarks as factors, minimum norm when there are more)
+        '''
+        return linalg.lstsq(self.loadings(self.Benchmarks).T, self.loadings(self.PositionTenors).T, rcond=None)[0].T
+
+    @lazy
+    def BenchmarkNotionals(self):
+        ''' notionals of the benchmark forwards hedging the whole book, under HedgingStrategy '''
+        if self.HedgingStrategy == 0:
+            return zeros(len(self.Benchmarks))
+        elif self.HedgingStrategy == 1:
+            return dot(self.PositionNotionals, self.TriangleWeights * self.PV01Ratios)
+        elif self.HedgingStrategy == 2:
+            return dot(self.PositionNotionals, self.FactorWeights * self.PV01Ratios)
+        else:
+            raise TypeError('Hedging Strategy can only be 0, 1 or 2')
+
+    @lazy
+    def Dzs(self):
+        ''' correlated factor brownian motions, one row per run '''
+        normals = random.normal(0, self.SqrtDt, (int(self.Nruns), len(self.Sigmas)))
+        return dot(normals, linalg.cholesky(self.Correlation).T)
+
+    def forward_pnls(self, tenors, notionals, dzs):
+        ''' PNL of forwards with the given notionals and tenors for each run of factor shocks '''
+        dqs = dot(dzs, self.loadings(tenors).T)
+        return dot(self.Spot * (exp(-(self.Q+dqs)*tenors) - exp(-self.Q*tenors)), notionals)
+
+    @lazy
+    def PNLs(self):
+        ''' PNL of the hedged book, revalued ChunkSize runs at a time '''
+        pnls = zeros(len(self.Dzs))
+        for start in range(0, len(pnls), self.ChunkSize):
+            dzs = self.Dzs[start:start + self.ChunkSize]
+            pnls[start:start + len(dzs)] = (self.forward_pnls(self.PositionTenors, self.PositionNotionals, dzs) -
+                                            self.forward_pnls(self.Benchmarks, self.BenchmarkNotionals, dzs))
+        return pnls
+
+    @lazy
+    def PNL_std(self):
+        ''' standard deviation of the book PNL, simulated or in closed form (see Method) '''
+        if self.CrossCheck:
+            self.cross_check(self.book_std_analytic(self.AnalyticOrder))
+        if self.Method == 'analytic':
+            return self.book_std_analytic(self.AnalyticOrder)
+        return self.PNLs.std()
+
+    def book_std_analytic(self, order=2):
+        '''
+        Closed form standard deviation of the book PNL over Dt, expanding each leg's exp() payoff to first or second
+        order in the factor shocks as in Hedger.PNL_std_analytic; the legs are the positions and the benchmark hedges.
+        '''
+        maturities = concatenate([self.PositionTenors, self.Benchmarks])
+        weights = concatenate([self.PositionNotionals, -self.BenchmarkNotionals]) * self.Spot * exp(-self.Q*maturities)
+        loadings = -maturities[:, newaxis] * self.loadings(maturities)
+        cov = self.Correlation * self.Dt
+
+        gradient = dot(weights, loadings)
+        variance = dot(gradient, dot(cov, gradient))
+        if order == 2:
+            products = dot(dot(loadings.T * weights, loadings), cov)
+            variance += trace(dot(products, products)) / 2.
+        elif order != 1:
+            raise TypeError('Analytic order can only be 1 or 2')
+        return sqrt(variance)
@@ -0,0 +1,75 @@
+'''
+Author:      Weiyi Chen
+Copyright:   Copyright (C) 2015 Baruch College, Modeling and Market Making in Forex Exchange
+Description: Test for bookhedger.py
+'''
+
+from numpy import *
+from hedger import Hedger
+from bookhedger import BookHedger
+
+from hedger_test import Tenors, Strategies
+
+def book(npositions, strategy, seed=0):
+    ''' a random book of forwards out to 10y, hedged with 8 benchmarks against a 3 factor model '''
+    rng = random.default_rng(seed)
+    b = BookHedger()
+    b.PositionTenors = rng.uniform(.05, 10., npositions)
+    b.PositionNotionals = rng.normal(0., 1., npositions)
+    b.Benchmarks = array([.25, .5, 1., 2., 3., 5., 7., 10.])
+    b.Sigmas = array([.01, .008, .005])
+    b.Betas = array([.5, .1, 1.5])
+    b.Correlation = array([[1., -.4, .2], [-.4, 1., .1], [.2, .1, 1.]])
+    b.HedgingStrategy = strategy
+    return b
+
+def bookhedger_test():
+    for j, strategy in enumerate(Strategies):
+        b = book(10000, j)
+        print(strategy, 'strategy book PNL std:', b.book_std_analytic() * 1e4)
+
+def test_single_position():
+    ''' the default book is Hedger's one forward hedged with two benchmarks against two factors '''
+    for tenor in Tenors:
+        for j in range(len(Strategies)):
+            h = Hedger()
+            h.Tenor = tenor
+            h.HedgingStrategy = j
+            b = BookHedger()
+            b.Tenor = tenor
+            b.HedgingStrategy = j
+            assert allclose(b.BenchmarkNotionals, [h.HedgingNotional1, h.HedgingNotional2], rtol=1e-10, atol=1e-15)
+            assert allclose(b.book_std_analytic(), h.PNL_std_analytic(tenor, j), rtol=1e-10, atol=1e-15)
+
+def test_book():
+    ''' factor hedging a large book beats triangle hedging, which beats not hedging at all '''
+    stds = [book(10000, j).book_std_analytic() for j in range(len(Strategies))]
+    assert stds[2] < stds[1] < stds[0]
+
+    # the book notionals add up position by position
+    whole = book(100, 1)
+    total = zeros(len(whole.Benchmarks))
+    for tenor, notional in zip(whole.PositionTenors, whole.PositionNotionals):
+        single = book(1, 1)
+        single.PositionTenors, single.PositionNotionals = array([tenor]), array([notional])
+        total += single.BenchmarkNotionals
+    assert allclose(whole.BenchmarkNotionals, total)
+
+def test_analytic():
+    ''' the closed form book PNL std should agree with Monte Carlo within its error, chunked or not '''
+    random.seed(0)
+    for j in range(len(Strategies)):
+        b = book(500, j)
+        b.Nruns = 20000
+        b.ChunkSize = 3000
+        b.Method = 'analytic'
+        b.CrossCheck = True
+        assert b.PNL_std == b.book_std_analytic()
+
+        whole = book(500, j)
+        whole.Dzs = b.Dzs
+        whole.ChunkSize = b.Nruns
+        assert allclose(whole.PNLs, b.PNLs)
+
+if __name__=="__main__":
+    bookhedger_test()
@@ -7,8 +7,11 @@ true factor shocks should provide a better hedge performance than based on the a
 Test:        hedger_test.py
 '''
 
+
 from numpy import *
-from lazy import lazy
+
+from graph import lazy
+from pnlstats import RunningMoments, QuantileSketch
 
 class Hedger(object):
     """
@@ -124,41 +127,72 @@ class Hedger(object):
     @lazy
     def Dz1s(self):
         ''' first brownian motion '''
-        return random.normal(0, self.SqrtDt, self.Nruns)
+        return random.normal(0, self.SqrtDt, int(self.Nruns))
 
     @lazy
     def Dz2s(self):
         ''' second browian motion '''
-        return self.Rho * self.Dz1s + sqrt(1 - self.Rho ** 2) * random.normal(0, self.SqrtDt, self.Nruns)
+        return self.Rho * self.Dz1s + sqrt(1 - self.Rho ** 2) * random.normal(0, self.SqrtDt, int(self.Nruns))
+
+    def rate_shocks(self, tenors):
+        ''' shocks to Q(T) for an array of tenors, one row per tenor when the tenors are a column array '''
+        return self.Sigma1 * exp(-self.Beta1 * tenors) * self.Dz1s + self.Sigma2 * exp(-self.Beta2 * tenors) * self.Dz2s
 
     @lazy
     def DQTs(self):
         ''' the dynamics of the asset currency interest rate '''
-        return self.Sigma1 * exp(-self.Beta1 * self.Tenor) * self.Dz1s + self.Sigma2 * exp(-self.Beta2 * self.Tenor) * self.Dz2s
+        return self.rate_shocks(self.Tenor)
 
     @lazy
     def DQ1s(self):
         ''' rate shocks for T1 '''
-        return self.Sigma1 * exp(-self.Beta1 * self.T1) * self.Dz1s + self.Sigma2 * exp(-self.Beta2 * self.T1) * self.Dz2s
+        return self.rate_shocks(self.T1)
 
     @lazy
     def DQ2s(self):
         ''' rate shocks for T2 '''
-        return self.Sigma1 * exp(-self.Beta1 * self.T2) * self.Dz1s + self.Sigma2 * exp(-self.Beta2 * self.T2) * self.Dz2s
+        return self.rate_shocks(self.T2)
+
+    def factor_shocks(self, tenors):
+        ''' the resulting shocks to Q(T), i.e. dQ(T)/dQ1 and dQ(T)/dQ2, for a tenor or an array of tenors '''
+        dz1 = -1./self.Sigma1 * exp(self.Beta1*self.T2-self.Beta2*(self.T2-self.T1)) / (1.-exp((self.Beta1-self.Beta2)*(self.T2-self.T1)))
+        dz2 =  1./self.Sigma2 * exp(self.Beta2*self.T1) / (1.-exp((self.Beta1-self.Beta2)*(self.T2-self.T1)))
+        dqt_dq1 = self.Sigma1 * exp(-self.Beta1*tenors)*dz1 + self.Sigma2 * exp(-self.Beta2*tenors)*dz2
+
+        dz1 = -1./self.Sigma1 * exp(self.Beta1*self.T1+self.Beta2*(self.T2-self.T1)) / (1.-exp((self.Beta2-self.Beta1)*(self.T2-self.T1)))
+        dz2 =  1./self.Sigma2 * exp(self.Beta2*self.T2) / (1.-exp((self.Beta2-self.Beta1)*(self.T2-self.T1)))
+        dqt_dq2 = self.Sigma1 * exp(-self.Beta1*tenors)*dz1 + self.Sigma2*exp(-self.Beta2*tenors)*dz2
+        return dqt_dq1, dqt_dq2
 
     @lazy
     def DQT_dQ1(self):
         ''' the resulting shock to Q(T); i.e. dQ(T)/dQ1 '''
-        dz1 = -1./self.Sigma1 * exp(self.Beta1*self.T2-self.Beta2*(self.T2-self.T1)) / (1.-exp((self.Beta1-self.Beta2)*(self.T2-self.T1)))
-        dz2 =  1./self.Sigma2 * exp(self.Beta2*self.T1) / (1.-exp((self.Beta1-self.Beta2)*(self.T2-self.T1)))
-        return self.Sigma1 * exp(-self.Beta1*self.Tenor)*dz1 + self.Sigma2 * exp(-self.Beta2*self.Tenor)*dz2
+        return self.factor_shocks(self.Tenor)[0]
 
     @lazy
     def DQT_dQ2(self):
         ''' second shock, i.e. dQ(T)/dQ2 '''
-        dz1 = -1./self.Sigma1 * exp(self.Beta1*self.T1+self.Beta2*(self.T2-self.T1)) / (1.-exp((self.Beta2-self.Beta1)*(self.T2-self.T1)))
-        dz2 =  1./self.Sigma2 * exp(self.Beta2*self.T2) / (1.-exp((self.Beta2-self.Beta1)*(self.T2-self.T1)))
-        return self.Sigma1 * exp(-self.Beta1*self.Tenor)*dz1 + self.Sigma2*exp(-self.Beta2*self.Tenor)*dz2
+        return self.factor_shocks(self.Tenor)[1]
+
+    def hedging_notionals(self, tenors, strategy):
+        '''
+        Notionals of the forwards settling at T1 and T2 hedging a unit forward settling at each of the tenors, under a 
+        hedging strategy (see HedgingStrategy)
+        '''
+        tenors = asarray(tenors, dtype=float)
+        if strategy == 0:
+            return zeros_like(tenors), zeros_like(tenors)
+        elif strategy == 1:
+            # triangle shocks: flat before T1 and after T2, linear in between
+            weights1 = clip((self.T2-tenors) / (self.T2-self.T1), 0., 1.)
+            return (weights1 * tenors / self.T1 * exp(-self.Q*(tenors-self.T1)), 
+                    (1.-weights1) * tenors / self.T2 * exp(self.Q*(self.T2-tenors)))
+        elif strategy == 2:
+            dqt_dq1, dqt_dq2 = self.factor_shocks(tenors)
+            return (dqt_dq1 * tenors / self.T1 * exp(-self.Q*(tenors-self.T1)), 
+                    dqt_dq2 * tenors / self.T2 * exp(self.Q*(self.T2-tenors)))
+        else:
+            raise TypeError('Hedging Strategy can only be 0, 1 or 2')
 
     @lazy
     def HedgingNotional1(self):
@@ -166,19 +200,7 @@ class Hedger(object):
         Add in the hedges: two forwards, settling at times T1 and T2, with notionals set to hedge the portfolio (either 
         against the two triangle shocks or against the two factor shocks). 
         '''
-        if self.HedgingStrategy == 0:
-            return 0.
-        elif self.HedgingStrategy == 1:
-            if self.Tenor <= self.T1:
-                return self.Tenor / self.T1 * exp(-self.Q*(self.Tenor-self.T1))
-            elif self.Tenor >= self.T2:
-                return 0.
-            else:
-                return (self.T2-self.Tenor) / (self.T2-self.T1) * self.Tenor / self.T1 * exp(-self.Q*(self.Tenor-self.T1))
-        elif self.HedgingStrategy == 2:
-            return self.DQT_dQ1 * self.Tenor / self.T1 * exp(-self.Q*(self.Tenor-self.T1))
-        else:
-            raise TypeError('Hedging Strategy can only be 0, 1 or 2')
+        return float(self.hedging_notionals(self.Tenor, self.HedgingStrategy)[0])
 
     @lazy
     def HedgingNotional2(self):
@@ -186,19 +208,7 @@ class Hedger(object):
         Add in the hedges: two forwards, settling at times T1 and T2, with notionals set to hedge the portfolio (either 
         against the two triangle shocks or against the two factor shocks). 
         '''
-        if self.HedgingStrategy == 0:
-            return 0.
-        elif self.HedgingStrategy == 1:
-            if self.Tenor <= self.T1:
-                return 0.
-            elif self.Tenor >= self.T2:
-                return self.Tenor/self.T2*exp(-self.Q*(self.Tenor-self.T2))
-            else:
-                return (self.Tenor-self.T1)/(self.T2-self.T1)*self.Tenor/self.T2*exp(self.Q*(self.T2-self.Tenor))
-        elif self.HedgingStrategy == 2:
-            return self.DQT_dQ2 * self.Tenor / self.T2 * exp(self.Q*(self.T2-self.Tenor))
-        else:
-            raise TypeError('Hedging Strategy can only be 0, 1 or 2')
+        return float(self.hedging_notionals(self.Tenor, self.HedgingStrategy)[1])
 
     @lazy
     def PNLs(self):
@@ -208,7 +218,223 @@ class Hedger(object):
         pnls -= self.HedgingNotional2 * self.Spot * (exp(-(self.Q+self.DQ2s)*self.T2) - exp(-self.Q*self.T2))
         return pnls
 
+    @lazy
+    def Method(self):
+        '''
+        How PNL_std is computed. Value 'mc': from the Monte Carlo PNLs; value 'analytic': in closed form (see 
+        PNL_std_analytic), with no simulation at all.
+        '''
+        return 'mc'
+
+    @lazy
+    def AnalyticOrder(self):
+        ''' Order of the expansion of the exp() payoffs for the analytic PNL std: 1 is the delta approximation, 2 adds
+        the convexity correction '''
+        return 2
+
+    @lazy
+    def CrossCheck(self):
+        ''' True means PNL_std is computed both ways, raising if the analytic value is not within MC error '''
+        return False
+
     @lazy
     def PNL_std(self):
         ''' standard deviation of simulation PNL '''
-        return self.PNLs.std()
\ No newline at end of file
+        if self.CrossCheck:
+            self.cross_check(self.PNL_std_analytic(self.Tenor, self.HedgingStrategy, order=self.AnalyticOrder))
+        if self.Method == 'analytic':
+            return float(self.PNL_std_analytic(self.Tenor, self.HedgingStrategy, order=self.AnalyticOrder))
+        return self.PNLs.std()
+
+    def cross_check(self, analytic, nsigmas=5.):
+        '''
+        Raise if an analytic PNL std is not within nsigmas standard errors of the std of the simulated PNLs. The
+        standard error of a sample std s is sqrt((m4 - s^4) / (4 n s^2)), m4 the fourth central moment: the hedged PNL 
+        is mostly convexity and heavy tailed, so the Gaussian 1/sqrt(2n) relative error would understate it.
+        '''
+        deviations = self.PNLs - self.PNLs.mean()
+        variance = (deviations**2).mean()
+        kurtosis = maximum((deviations**4).mean() - variance**2, 0.)
+        mc, error = sqrt(variance), sqrt(kurtosis / (4. * len(deviations) * maximum(variance, 1e-300)))
+        if abs(analytic - mc) > nsigmas * error + 1e-12 * self.Spot:
+            raise ValueError('Analytic PNL std %g is outside the MC error of %g' % (analytic, mc))
+
+    def PNL_std_analytic(self, tenors, strategy, notionals=1., order=2):
+        '''
+        Closed form standard deviation of the hedged PNL over Dt, for arrays of tenors and position notionals 
+        (broadcast against each other). Each leg k (the position, then the two hedges) pays w_k (exp(u_k) - 1) with
+        
+            w_k = notional_k * Spot * exp(-Q x_k),    u_k = -x_k (σ_1 e^(-β_1 x_k) dz_1 + σ_2 e^(-β_2 x_k) dz_2) = b_k.dz
+
+        so to first order the PNL is g.dz with g = Σ w_k b_k, of variance g'Cg where C = [[1, ρ], [ρ, 1]] dt. The 
+        second order adds the convexity term dz'H dz / 2 with H = Σ w_k b_k b_k', uncorrelated with g.dz, of variance 
+        tr(HCHC) / 2.
+        '''
+        tenors, notionals = broadcast_arrays(asarray(tenors, dtype=float), asarray(notionals, dtype=float))
+        hedges1, hedges2 = self.hedging_notionals(tenors, strategy)
+
+        maturities = stack(broadcast_arrays(tenors, self.T1, self.T2), axis=-1)
+        weights = stack([ones_like(tenors), -hedges1, -hedges2], axis=-1) * notionals[..., newaxis] 
+        weights = weights * self.Spot * exp(-self.Q*maturities)
+        loadings = -maturities[..., newaxis] * stack([self.Sigma1*exp(-self.Beta1*maturities), 
+                                                      self.Sigma2*exp(-self.Beta2*maturities)], axis=-1)
+        cov = array([[1., self.Rho], [self.Rho, 1.]]) * self.Dt
+
+        gradients = einsum('...k,...ki->...i', weights, loadings)
+        variances = einsum('...i,ij,...j->...', gradients, cov, gradients)
+        if order == 2:
+            hessians = einsum('...k,...ki,...kj->...ij', weights, loadings, loadings)
+            products = matmul(hessians, cov)
+            variances = variances + einsum('...ij,...ji->...', products, products) / 2.
+        elif order != 1:
+            raise TypeError('Analytic order can only be 1 or 2')
+        return sqrt(variances)
+
+    def PNL_std_grid(self, tenors, strategies=(0, 1, 2)):
+        '''
+        Standard deviation of the simulation PNL for every (tenor, hedging strategy) cell, in one pass over a single 
+        set of factor shocks: the forward revaluations for all tenors are one (tenors x runs) broadcast, and all the 
+        cells share the same draws (common random numbers).
+        '''
+        tenors = asarray(tenors, dtype=float)[:, newaxis]
+        forwards = self.Spot * (exp(-(self.Q+self.rate_shocks(tenors))*tenors) - exp(-self.Q*tenors))
+        hedges1 = self.Spot * (exp(-(self.Q+self.DQ1s)*self.T1) - exp(-self.Q*self.T1))
+        hedges2 = self.Spot * (exp(-(self.Q+self.DQ2s)*self.T2) - exp(-self.Q*self.T2))
+
+        stds = zeros((tenors.size, len(strategies)))
+        for i, strategy in enumerate(strategies):
+            notionals1, notionals2 = self.hedging_notionals(tenors, strategy)
+            stds[:, i] = (forwards - notionals1 * hedges1 - notionals2 * hedges2).std(axis=1)
+        return stds
+
+    @lazy
+    def Horizon(self):
+        ''' length of time the path mode simulates the book over, a month by default '''
+        return 1. / 12.
+
+    @lazy
+    def PathSteps(self):
+        ''' number of Dt steps in the horizon '''
+        return int(round(self.Horizon / self.Dt))
+
+    @lazy
+    def RebalanceInterval(self):
+        ''' time between hedge rebalances in the path mode, weekly by default '''
+        return 1. / 52.
+
+    @lazy
+    def RebalanceSchedule(self):
+        '''
+        steps at whose start the hedges are reset in the path mode: the hedge forwards are closed out and new ones struck
+        at the T1 and T2 benchmark tenors. The hedges are always set at time 0, whatever the schedule.
+        '''
+        return arange(0, self.PathSteps, int(maximum(1, round(self.RebalanceInterval / self.Dt))))
+
+    @lazy
+    def PathChunkSize(self):
+        ''' number of paths simulated at once in the path mode '''
+        return 10000
+
+    @lazy
+    def PathSeed(self):
+        ''' seed of the path mode; every chunk of paths gets its own stream spawned from it '''
+        return 100
+
+    @lazy
+    def Compression(self):
+        ''' compression of the quantile sketch of the path mode's PNL '''
+        return 1000
+
+    def forward_values(self, settlement, t, z1, z2):
+        '''
+        Value at time t of a unit forward settling at time settlement, on the curve Q(x) = Q + σ_1 e^(-β_1 x) z_1 + 
+        σ_2 e^(-β_2 x) z_2 driven by the cumulated brownian motions z_1, z_2 (x is the time to settlement, floored at 0
+        once the forward has settled)
+        '''
+        x = maximum(settlement - t, 0.)
+        return self.Spot * exp(-(self.Q + self.Sigma1*exp(-self.Beta1*x)*z1 + self.Sigma2*exp(-self.Beta2*x)*z2) * x)
+
+    def path_hedges(self, t, z1, z2):
+        '''
+        Notionals of the benchmark forwards struck at time t hedging the position on each path's curve: the flat-curve
+        notionals of hedging_notionals, with the PV01 ratios repriced on the shifted curve
+        '''
+        x = maximum(self.Tenor - t, 0.)
+        shift = lambda y: (self.Sigma1*exp(-self.Beta1*y)*z1 + self.Sigma2*exp(-self.Beta2*y)*z2) * y
+        notional1, notional2 = self.hedging_notionals(x, self.HedgingStrategy)
+        return notional1 * exp(shift(self.T1) - shift(x)), notional2 * exp(shift(self.T2) - shift(x))
+
+    def simulate_paths(self):
+        '''
+        Path mode: simulate the two factor curve over PathSteps steps of Dt, the position rolling down the curve and the
+        hedges reset on RebalanceSchedule. Paths are run PathChunkSize at a time, each chunk drawing from its own
+        stream spawned from PathSeed, and only their current state is kept, so memory does not grow with the number of
+        steps; the moments of the cumulated PNL at the end of every step and the quantile sketch of the PNL over the
+        horizon are accumulated online across chunks. Returns the PNL of each path over the horizon, the RunningMoments
+        of each step and the QuantileSketch.
+        '''
+        rebalances = zeros(self.PathSteps, dtype=bool)
+        rebalances[asarray(self.RebalanceSchedule, dtype=int)] = True
+        pnls = zeros(int(self.Nruns))
+        moments = [RunningMoments() for step in range(self.PathSteps)]
+        sketch = QuantileSketch(self.Compression)
+        seeds = random.SeedSequence(self.PathSeed)
+
+        for start in range(0, len(pnls), self.PathChunkSize):
+            chunk = pnls[start:start + self.PathChunkSize]
+            rng = random.default_rng(seeds.spawn(1)[0])
+            z1, z2 = zeros(len(chunk)), zeros(len(chunk))
+            settlement1, settlement2 = self.T1, self.T2
+            notional1, notional2 = self.path_hedges(0., z1, z2)
+            position = self.forward_values(self.Tenor, 0., z1, z2)
+            hedge1 = self.forward_values(settlement1, 0., z1, z2)
+            hedge2 = self.forward_values(settlement2, 0., z1, z2)
+
+            for step in range(self.PathSteps):
+                t = step * self.Dt
+                if step and rebalances[step]:
+                    settlement1, settlement2 = t + self.T1, t + self.T2
+                    notional1, notional2 = self.path_hedges(t, z1, z2)
+                    hedge1 = self.forward_values(settlement1, t, z1, z2)
+                    hedge2 = self.forward_values(settlement2, t, z1, z2)
+
+                dz1 = rng.normal(0, self.SqrtDt, len(chunk))
+                z1 += dz1
+                z2 += self.Rho * dz1 + sqrt(1 - self.Rho ** 2) * rng.normal(0, self.SqrtDt, len(chunk))
+
+                t += self.Dt
+                new_position = self.forward_values(self.Tenor, t, z1, z2)
+                new_hedge1 = self.forward_values(settlement1, t, z1, z2)
+                new_hedge2 = self.forward_values(settlement2, t, z1, z2)
+                chunk += (new_position - position) - notional1 * (new_hedge1 - hedge1) - notional2 * (new_hedge2 - hedge2)
+                position, hedge1, hedge2 = new_position, new_hedge1, new_hedge2
+                moments[step].add(chunk)
+
+            sketch.add(chunk)
+
+        return pnls, moments, sketch
+
+    @lazy
+    def PathSimulation(self):
+        ''' results of simulate_paths '''
+        return self.simulate_paths()
+
+    @lazy
+    def PathPNLs(self):
+        ''' PNL of each path over the horizon '''
+        return self.PathSimulation[0]
+
+    @lazy
+    def PathPNLMeans(self):
+        ''' mean of the cumulated PNL at the end of each step '''
+        return array([moments.Mean for moments in self.PathSimulation[1]])
+
+    @lazy
+    def PathPNLStds(self):
+        ''' standard deviation of the cumulated PNL at the end of each step, showing the hedge error build up '''
+        return array([moments.StdDev for moments in self.PathSimulation[1]])
+
+    @lazy
+    def PathPNLDistribution(self):
+        ''' quantile sketch of the PNL over the horizon, giving its quantiles, VaR and expected shortfall '''
+        return self.PathSimulation[2]
@@ -4,16 +4,127 @@ Copyright:   Copyright (C) 2015 Baruch College, Modeling and Market Making in Fo
 Description: Test for hedger.py
 '''
 
+from numpy import *
 from hedger import Hedger
 
+Tenors = [0.1, 0.25, 0.5, 0.75, 1, 2]
+Strategies = ['Non-hedging', 'Triangle-hedging', 'Factor-hedging']
+
 def hedger_test():
-    for tenor in [0.1, 0.25, 0.5, 0.75, 1, 2]:
+    stds = Hedger().PNL_std_grid(Tenors)
+    for tenor, tenor_stds in zip(Tenors, stds):
         print('Value of Tenor:', tenor)
-        for i, hedingStrategy in enumerate(['Non-hedging', 'Triangle-hedging', 'Factor-hedging']):
+        for hedingStrategy, std in zip(Strategies, tenor_stds):
+            print('\t', hedingStrategy,'strategy PNL std:', std * 1e4)
+
+def test_grid():
+    ''' the grid should match one Hedger per cell driven by the same factor shocks '''
+    h = Hedger()
+    stds = h.PNL_std_grid(Tenors)
+    for i, tenor in enumerate(Tenors):
+        for j in range(len(Strategies)):
+            cell = Hedger()
+            cell.Dz1s, cell.Dz2s = h.Dz1s, h.Dz2s
+            cell.Tenor = tenor
+            cell.HedgingStrategy = j
+            assert allclose(stds[i, j], cell.PNL_std, rtol=1e-10, atol=1e-15)
+
+    # factor hedging beats triangle hedging (both are exact at the benchmarks), which beats not hedging at all
+    assert all(stds[:, 2] <= stds[:, 1] + 1e-15) and all(stds[:, 1] < stds[:, 0])
+
+def test_analytic():
+    ''' the closed form PNL std should agree with Monte Carlo within its error '''
+    random.seed(0)
+    h = Hedger()
+    for tenor in Tenors:
+        for j in range(len(Strategies)):
+            cell = Hedger()
+            cell.Dz1s, cell.Dz2s = h.Dz1s, h.Dz2s
+            cell.Tenor = tenor
+            cell.HedgingStrategy = j
+            cell.CrossCheck = True
+            assert cell.PNL_std == cell.PNLs.std()
+
+    for i, tenor in enumerate(Tenors):
+        for j in range(len(Strategies)):
+            cell = Hedger()
+            cell.Tenor = tenor
+            cell.HedgingStrategy = j
+            cell.Method = 'analytic'
+            cell.CrossCheck = True
+            assert cell.PNL_std == h.PNL_std_analytic(tenor, j)
+
+    # the delta approximation misses the convexity left over by the factor hedge
+    cell = Hedger()
+    cell.Tenor = .5
+    cell.HedgingStrategy = 2
+    cell.AnalyticOrder = 1
+    cell.CrossCheck = True
+    try:
+        cell.PNL_std
+        assert False
+    except ValueError:
+        pass
+
+    # the std scales with the notional
+    assert allclose(h.PNL_std_analytic(.5, 1, [1., -2., 10.]), h.PNL_std_analytic(.5, 1) * array([1., 2., 10.]))
+
+def test_paths():
+    ''' the path mode's online step statistics match its paths, and rebalancing more often hedges better '''
+    stds = {}
+    for schedule in ['never', 'weekly', 'daily']:
+        for j in range(len(Strategies)):
             h = Hedger()
-            h.Tenor = tenor
-            h.HedgingStrategy = i
-            print('\t', hedingStrategy,'strategy PNL std:', h.PNL_std * 1e4)
+            h.Tenor = .5
+            h.HedgingStrategy = j
+            h.Nruns = 20000
+            h.PathChunkSize = 7000
+            if schedule == 'never':
+                h.RebalanceSchedule = [0]
+            elif schedule == 'daily':
+                h.RebalanceInterval = 1. / 260.
+            assert h.PathPNLStds.shape == (h.PathSteps,)
+            assert allclose(h.PathPNLStds[-1], h.PathPNLs.std()) and allclose(h.PathPNLMeans[-1], h.PathPNLs.mean())
+            stds[schedule, j] = h.PathPNLStds[-1]
+
+    for j in [1, 2]:
+        assert stds['daily', j] < stds['weekly', j] < stds['never', j] < stds['never', 0] / 5.
+    # the unhedged book does not depend on the schedule
+    assert stds['never', 0] == stds['weekly', 0] == stds['daily', 0]
+
+    # the paths are reproducible from their seed, whatever the other inputs, and their quantiles come from the sketch
+    h = Hedger()
+    h.Nruns = 20000
+    h.PathChunkSize = 7000
+    pnls = h.PathPNLs.copy()
+    h.PathSeed = 1
+    assert not any(h.PathPNLs == pnls)
+    h.PathSeed = 100
+    assert all(h.PathPNLs == pnls)
+    levels = array([.01, .05, .5, .95, .99])
+    quantiles = quantile(pnls, levels)
+    assert allclose(h.PathPNLDistribution.quantile(levels), quantiles, rtol=0, atol=.02 * pnls.std())
+    assert h.PathPNLDistribution.Count == 20000
+
+    # over a single step the path mode is the one period simulation, up to the position rolling down the curve by Dt
+    h = Hedger()
+    h.Horizon = h.Dt
+    assert abs(h.PathPNLs.std() / h.PNL_std - 1.) < .02
+
+def test_invalidation():
+    ''' changing an input recomputes what depends on it, and keeps what does not '''
+    h = Hedger()
+    h.PNL_std
+    dz1s, notionals = h.Dz1s, h.HedgingNotional1
+    h.Tenor = .5
+    h.HedgingStrategy = 1
+
+    fresh = Hedger()
+    fresh.Dz1s, fresh.Dz2s = h.Dz1s, h.Dz2s
+    fresh.Tenor, fresh.HedgingStrategy = .5, 1
+    assert h.PNL_std == fresh.PNL_std and h.HedgingNotional1 == fresh.HedgingNotional1 != notionals
+    # the factor shocks do not depend on the tenor
+    assert h.Dz1s is dz1s
 
 if __name__=="__main__":
-    hedger_test()
\ No newline at end of file
+    hedger_test()
@@ -4,8 +4,8 @@ Copyright: Copyright (C) 2015 Baruch College, Modeling and Market Making in FX -
 Description: Test for VolSpliner
 """
 
-from volspliner import VolSpliner
-from scipy import *
+from volspliner import VolSpliner, fit_smiles
+from numpy import *
 import scipy.stats as stats
 import matplotlib.pyplot as plot
 
@@ -20,15 +20,75 @@ def test():
         sp.Extrap_fact = extrap_fact
         
         nstrikes   = 100
-        dstrike    = (sp.StrikeMax-sp.StrikeMin)/(nstrikes-1)
-        
-        plot_strikes, plot_vols = [], []
-        for i in range(nstrikes):
-            strike = sp.StrikeMin + i * dstrike
-            plot_strikes.append(strike)
-            plot_vols.append(sp.volatility(strike))
-        plot.plot(plot_strikes,plot_vols)
+        plot_strikes = linspace(sp.StrikeMin, sp.StrikeMax, nstrikes)
+        plot.plot(plot_strikes, sp.volatility(plot_strikes))
     plot.show()
 
+def test_batch():
+    '''The banded batch fit should reproduce the dense solve of every smile'''
+
+    rng = random.RandomState(0)
+    n = 1000
+    quotes = [.08 + rng.uniform(-.02, .02, n), rng.uniform(-.02, .02, n), rng.uniform(-.03, .03, n),
+              rng.uniform(0, .005, n), rng.uniform(.003, .01, n), rng.uniform(.05, 2, n), rng.uniform(.1, 10, n)]
+    coefficients = fit_smiles(*quotes)
+    assert coefficients.shape == (n, 6, 4)
+
+    for i in range(0, n, 50):
+        sp = VolSpliner()
+        sp.ATM, sp.Rr25, sp.Rr10, sp.Bf25, sp.Bf10, sp.Texp, sp.Extrap_fact = [quote[i] for quote in quotes]
+        dense = array(sp.dense_params())
+        assert allclose(coefficients[i].ravel(), dense, rtol=0, atol=1e-8 * abs(dense).max())
+        assert allclose(sp.CSParams, coefficients[i].ravel())
+
+        # the fitted smile goes through the market vols
+        assert allclose([sp.volatility(strike) for strike in sp.Strikes], sp.Vols, rtol=0, atol=1e-10)
+
+def test_smile():
+    '''Array evaluation should match the scalar one, with derivatives matching finite differences'''
+
+    for extrap_fact in [0.01, 1, 10]:
+        sp = VolSpliner()
+        sp.Extrap_fact = extrap_fact
+        strikes = concatenate([linspace(sp.StrikeMin * .9, sp.StrikeMax * 1.1, 1000), sp.Strikes])
+        vols, slopes, curvatures = sp.smile(strikes)
+        assert allclose(vols, [sp.volatility(strike) for strike in strikes], rtol=0, atol=1e-12)
+
+        # flat outside the extrapolation strikes
+        outside = (strikes < sp.StrikeMin) | (strikes > sp.StrikeMax)
+        assert all(slopes[outside] == 0) and all(curvatures[outside] == 0)
+        assert allclose(vols[strikes < sp.StrikeMin], sp.volatility(sp.StrikeMin))
+
+        h = 1e-5
+        inside = strikes[(strikes > sp.StrikeMin + 10 * h) & (strikes < sp.StrikeMax - 10 * h)]
+        up, mid, down = sp.volatility(inside + h), sp.volatility(inside), sp.volatility(inside - h)
+        assert allclose(sp.smile(inside)[1], (up - down) / (2 * h), rtol=0, atol=1e-5 * abs(slopes).max())
+        assert allclose(sp.smile(inside)[2], (up - 2 * mid + down) / h**2, rtol=0, atol=5e-3 * abs(curvatures).max())
+
+    # a batch of smiles evaluates each smile at its own strikes
+    rng = random.RandomState(0)
+    batch = VolSpliner()
+    batch.ATM = .08 + rng.uniform(-.02, .02, 20)
+    batch.Texp = rng.uniform(.1, 2., 20)
+    batch.Extrap_fact = 2.
+    strikes = linspace(batch.StrikeMin * .95, batch.StrikeMax * 1.05, 7).T
+    results = batch.smile(strikes)
+    for i in range(20):
+        sp = VolSpliner()
+        sp.ATM, sp.Texp, sp.Extrap_fact = batch.ATM[i], batch.Texp[i], 2.
+        for result, single in zip(results, sp.smile(strikes[i])):
+            assert allclose(result[i], single)
+
+def test_invalidation():
+    '''Changing a quote refits the smile'''
+    sp = VolSpliner()
+    sp.Extrap_fact = 2.
+    sp.volatility(1.)
+    sp.ATM, sp.Rr25 = .1, -.01
+
+    fresh = VolSpliner()
+    fresh.Extrap_fact, fresh.ATM, fresh.Rr25 = 2., .1, -.01
+    assert all(sp.Strikes == fresh.Strikes) and all(sp.Coefficients == fresh.Coefficients)
+
 if __name__=="__main__":
     test()
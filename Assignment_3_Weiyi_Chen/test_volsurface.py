@@ -0,0 +1,104 @@
+"""
+Author: Weiyi Chen
+Copyright: Copyright (C) 2015 Baruch College, Modeling and Market Making in FX - All Rights Reserved
+Description: Test for VolSurface
+"""
+
+from volspliner import VolSpliner
+from volsurface import VolSurface
+from numpy import *
+
+def spliner(surface, i):
+    '''The VolSpliner of one tenor of the surface'''
+    sp = VolSpliner()
+    sp.Texp = surface.Tenors[i]
+    sp.ATM, sp.Rr25, sp.Rr10 = surface.ATM[i], surface.Rr25[i], surface.Rr10[i]
+    sp.Bf25, sp.Bf10, sp.Extrap_fact = surface.Bf25[i], surface.Bf10[i], surface.Extrap_fact[i]
+    return sp
+
+def test_interpolation():
+    '''The surface is each tenor's smile at its tenor, linear in total variance in between and flat outside'''
+
+    surface = VolSurface()
+    strikes = linspace(.8, 1.2, 41)
+    smiles = [spliner(surface, i).volatility(strikes) for i in range(len(surface.Tenors))]
+    for tenor, smile in zip(surface.Tenors, smiles):
+        assert allclose(surface.volatility(strikes, tenor), smile)
+
+    t0, t1 = surface.Tenors[1], surface.Tenors[2]
+    texp = .3 * t0 + .7 * t1
+    assert allclose(surface.volatility(strikes, texp)**2 * texp, .3 * smiles[1]**2 * t0 + .7 * smiles[2]**2 * t1)
+
+    assert allclose(surface.volatility(strikes, surface.Tenors[0] / 2), smiles[0])
+    assert allclose(surface.volatility(strikes, surface.Tenors[-1] * 2), smiles[-1])
+
+    # strikes and expiries broadcast together
+    assert surface.volatility(strikes[:, newaxis], surface.Tenors).shape == (41, len(surface.Tenors))
+    assert isinstance(surface.volatility(1., .3), float)
+
+def test_update():
+    '''A tick refits only its tenor, to the surface built from scratch with the new quotes'''
+
+    surface = VolSurface()
+    surface.volatility(1., 1.)
+    before = surface.Coefficients.copy()
+
+    surface.update(2, ATM=.09, Rr25=.015)
+    surface.update(4, Bf10=.01)
+    assert surface.Stale == {2, 4}
+    surface.refit()
+    assert not surface.Stale
+
+    changed = [2, 4]
+    unchanged = [0, 1, 3]
+    assert all(surface.Coefficients[unchanged] == before[unchanged])
+    assert not any(all(surface.Coefficients[changed] == before[changed], axis=(1, 2)))
+
+    fresh = VolSurface()
+    fresh.ATM[2], fresh.Rr25[2], fresh.Bf10[4] = .09, .015, .01
+    strikes = linspace(.8, 1.2, 41)[:, newaxis]
+    texps = linspace(0., 3., 31)
+    assert allclose(surface.volatility(strikes, texps), fresh.volatility(strikes, texps))
+    assert allclose(surface.volatility(strikes[:, 0], surface.Tenors[2]), spliner(surface, 2).volatility(strikes[:, 0]))
+
+    try:
+        surface.update(0, Texp=1.)
+        assert False
+    except TypeError:
+        pass
+
+def test_assignment():
+    '''Assigning whole quote arrays or tenors refits the smiles'''
+    surface = VolSurface()
+    surface.volatility(1., 1.)
+    surface.ATM = full(5, .1)
+    surface.refit()
+    surface.Tenors = array([.1, .2, .5, 1., 3.])
+    assert surface.Stale == set(range(5))
+
+    fresh = VolSurface()
+    fresh.ATM, fresh.Tenors = full(5, .1), array([.1, .2, .5, 1., 3.])
+    strikes = linspace(.8, 1.2, 41)[:, newaxis]
+    texps = linspace(0., 3., 31)
+    assert allclose(surface.volatility(strikes, texps), fresh.volatility(strikes, texps), rtol=0., atol=1e-15)
+
+def test_spot():
+    '''Assigning the spot refits every smile'''
+    surface = VolSurface()
+    surface.volatility(1., 1.)
+    assert not surface.Stale
+    surface.Spot = 1.2
+    assert surface.Stale == set(range(5))
+
+    fresh = VolSurface()
+    fresh.Spot = 1.2
+    strikes = linspace(.9, 1.4, 41)[:, newaxis]
+    texps = linspace(0., 3., 31)
+    assert allclose(surface.volatility(strikes, texps), fresh.volatility(strikes, texps), rtol=0., atol=1e-15)
+    assert not allclose(surface.volatility(strikes, texps), VolSurface().volatility(strikes, texps))
+
+if __name__=="__main__":
+    test_interpolation()
+    test_update()
+    test_assignment()
+    test_spot()
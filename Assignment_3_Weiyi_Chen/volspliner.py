@@ -7,13 +7,17 @@ Test: interpolator_test.py
 """
 
 # python imports
-import bisect
 import math
 
 # 3rd party imports
-from scipy import *
+from numpy import *
 import scipy.stats as stats
-from lazy import lazy
+
+# local imports
+from graph import lazy
+
+# standard normal quantiles of the 25 and 10 delta strikes
+N25, N10 = stats.norm.ppf(0.25), stats.norm.ppf(0.10)
 
 class VolSpliner:
     ''' A cubic spliner fit to five implied volatilities/strikes, with boundary conditions set such that vols flatten 
@@ -67,19 +71,19 @@ class VolSpliner:
 
     @lazy
     def Strike25c(self):
-        return self.Spot * exp(self.Vol25c**2 * self.Texp / 2. - self.Vol25c * sqrt(self.Texp) * stats.norm.ppf(0.25))
+        return self.Spot * exp(self.Vol25c**2 * self.Texp / 2. - self.Vol25c * sqrt(self.Texp) * N25)
 
     @lazy
     def Strike25p(self):
-        return self.Spot * exp(self.Vol25p**2 * self.Texp / 2. + self.Vol25p * sqrt(self.Texp) * stats.norm.ppf(0.25))
+        return self.Spot * exp(self.Vol25p**2 * self.Texp / 2. + self.Vol25p * sqrt(self.Texp) * N25)
 
     @lazy
     def Strike10c(self):
-        return self.Spot * exp(self.Vol10c**2 * self.Texp / 2. - self.Vol10c * sqrt(self.Texp) * stats.norm.ppf(0.10))
+        return self.Spot * exp(self.Vol10c**2 * self.Texp / 2. - self.Vol10c * sqrt(self.Texp) * N10)
 
     @lazy
     def Strike10p(self):
-        return self.Spot * exp(self.Vol10p**2 * self.Texp / 2. + self.Vol10p * sqrt(self.Texp) * stats.norm.ppf(0.10))
+        return self.Spot * exp(self.Vol10p**2 * self.Texp / 2. + self.Vol10p * sqrt(self.Texp) * N10)
 
     @lazy
     def Strikes(self):
@@ -119,9 +123,22 @@ class VolSpliner:
     def AllStrikes(self):
         return [self.StrikeMin] + self.Strikes + [self.StrikeMax]
 
+    @lazy
+    def Coefficients(self):
+        '''
+        (a, b, c, d) of the six cubics a + b*K + c*K**2 + d*K**3, one row per interval between AllStrikes; when the
+        market inputs are arrays of smiles, an array of shape (smiles x 6 x 4)
+        '''
+        return spline_coefficients(stack(broadcast_arrays(*self.AllStrikes), axis=-1),
+                                   stack(broadcast_arrays(*self.Vols), axis=-1))
+
     @lazy
     def CSParams(self):
         '''Construct the spline parameters'''
+        return list(self.Coefficients.ravel())
+
+    def dense_params(self):
+        '''Spline parameters from the original dense 24x24 system, kept as a reference for the banded solve'''
         
         a, b = matrix(zeros((24,24))), matrix(zeros((24,1)))
         
@@ -160,21 +177,101 @@ class VolSpliner:
         return cs_params
 
     def volatility(self, strike):
-        '''Interpolates a volatility for the given strike'''
-        
-        if strike < self.AllStrikes[0]:
-            strike = self.AllStrikes[0]
-        
-        if strike > self.AllStrikes[-1]:
-            strike = self.AllStrikes[-1]
-        
-        # interpolate a vol from the spline
-        
-        ind = bisect.bisect_left(self.Strikes,strike)
-        
-        a = self.CSParams[4*ind]
-        b = self.CSParams[4*ind+1]
-        c = self.CSParams[4*ind+2]
-        d = self.CSParams[4*ind+3]
-        
-        return a + b*strike + c*strike**2 + d*strike**3
\ No newline at end of file
+        '''Interpolates a volatility for the given strike, or an array of strikes'''
+        vols = self.smile(strike)[0]
+        return float(vols) if ndim(vols) == 0 else vols
+
+    def smile(self, strikes):
+        '''
+        Vols and their first and second derivatives in strike for an array of strikes, clamped to [StrikeMin, StrikeMax]
+        (the smile, hence its derivatives, is flat outside). For a batch of smiles, strikes has the shape of the smiles
+        plus a trailing axis of strikes per smile (see spline_values).
+        '''
+        return spline_values(self.Coefficients, stack(broadcast_arrays(*self.AllStrikes), axis=-1), strikes)
+
+
+def spline_values(coefficients, knots, strikes):
+    '''
+    Evaluate splines from their (... x 6 x 4) coefficients and (... x 7) strikes (StrikeMin, the market strikes and
+    StrikeMax) at strikes clamped to the outside ones; returns the vols and their first and second strike derivatives.
+    For a single spline strikes can have any shape; for a batch they have the batch shape plus a trailing axis.
+    '''
+    strikes = asarray(strikes, dtype=float64)
+
+    # interval of each strike: the number of market strikes below it, as bisect_left
+    if knots.ndim == 1:
+        clamped = clip(strikes, knots[0], knots[-1])
+        a, b, c, d = moveaxis(coefficients[searchsorted(knots[1:6], clamped)], -1, 0)
+    else:
+        clamped = clip(strikes, knots[..., :1], knots[..., 6:])
+        intervals = (clamped[..., newaxis] > knots[..., newaxis, 1:6]).sum(axis=-1)
+        a, b, c, d = moveaxis(take_along_axis(coefficients, intervals[..., newaxis], axis=-2), -1, 0)
+
+    # Horner's rule for the cubic and its derivatives
+    inside = (strikes == clamped)
+    vols = a + clamped * (b + clamped * (c + clamped * d))
+    slopes = where(inside, b + clamped * (2. * c + clamped * 3. * d), 0.)
+    curvatures = where(inside, 2. * c + clamped * 6. * d, 0.)
+    return vols, slopes, curvatures
+
+
+def spline_coefficients(strikes, vols):
+    '''
+    Fit the VolSpliner cubic spline to any number of smiles at once. strikes is (... x 7): StrikeMin, the five market
+    strikes and StrikeMax; vols is (... x 5), the market vols. Returns the (... x 6 x 4) power basis coefficients.
+
+    The spline is solved in terms of its second derivatives M_i at the strikes x_i. With h_i = x_(i+1) - x_i, first
+    derivative continuity at the five market strikes reads
+
+        h_(i-1) M_(i-1) + 2 (h_(i-1) + h_i) M_i + h_i M_(i+1) = 6 ((y_(i+1) - y_i) / h_i - (y_i - y_(i-1)) / h_(i-1))
+
+    The flat wings set M_0 = M_6 = 0 and zero slopes at the outside strikes, which give the free end vols
+    y_0 = y_1 - h_0^2 M_1 / 6 and y_6 = y_5 - h_5^2 M_5 / 6. Substituting them leaves a 5x5 tridiagonal system,
+    solved by forward elimination and back substitution for every smile together.
+    '''
+    strikes, vols = asarray(strikes, dtype=float64), asarray(vols, dtype=float64)
+    h = diff(strikes, axis=-1)
+    slopes = diff(vols, axis=-1) / h[..., 1:5]
+
+    # tridiagonal system in M_1..M_5: sub, main and super diagonals and right hand side
+    lower, upper = h[..., 1:5], h[..., 1:5]
+    main = 2. * (h[..., :5] + h[..., 1:])
+    rhs = zeros(main.shape)
+    rhs[..., 1:4] = 6. * diff(slopes, axis=-1)
+    main[..., 0] += h[..., 0]
+    rhs[..., 0] = 6. * slopes[..., 0]
+    main[..., 4] += h[..., 5]
+    rhs[..., 4] = -6. * slopes[..., 3]
+
+    # Thomas algorithm along the last axis
+    for i in range(1, 5):
+        factor = lower[..., i-1] / main[..., i-1]
+        main[..., i] -= factor * upper[..., i-1]
+        rhs[..., i] -= factor * rhs[..., i-1]
+    moments = zeros(strikes.shape)
+    moments[..., 5] = rhs[..., 4] / main[..., 4]
+    for i in range(3, -1, -1):
+        moments[..., i+1] = (rhs[..., i] - upper[..., i] * moments[..., i+2]) / main[..., i]
+
+    ys = concatenate([vols[..., :1] - h[..., :1]**2 * moments[..., 1:2] / 6., vols,
+                      vols[..., 4:] - h[..., 5:]**2 * moments[..., 5:6] / 6.], axis=-1)
+
+    # each cubic about its left strike, then expanded to the power basis
+    x, m0, m1 = strikes[..., :6], moments[..., :6], moments[..., 1:]
+    p0 = ys[..., :6]
+    p1 = diff(ys, axis=-1) / h - h * (2. * m0 + m1) / 6.
+    p2 = m0 / 2.
+    p3 = (m1 - m0) / (6. * h)
+    return stack([p0 - p1*x + p2*x**2 - p3*x**3, p1 - 2.*p2*x + 3.*p3*x**2, p2 - 3.*p3*x, p3], axis=-1)
+
+
+def fit_smiles(atm, rr25, rr10, bf25, bf10, texp, extrap_fact, spot=1.):
+    '''
+    Batch fit of VolSpliner smiles from arrays (or scalars, broadcast together) of market quotes; returns the
+    (smiles x 6 x 4) spline coefficients
+    '''
+    sp = VolSpliner()
+    sp.Spot = spot
+    sp.ATM, sp.Rr25, sp.Rr10, sp.Bf25, sp.Bf10, sp.Texp, sp.Extrap_fact = [
+        asarray(quote, dtype=float64) for quote in (atm, rr25, rr10, bf25, bf10, texp, extrap_fact)]
+    return sp.Coefficients
@@ -0,0 +1,132 @@
+"""
+Author: Weiyi Chen
+Copyright: Copyright (C) 2015 Baruch College, Modeling and Market Making in FX - All Rights Reserved
+Description: A term structure of VolSpliner smiles, interpolated in total variance between expiries, which refits only
+             the smiles whose quotes have ticked
+Test: test_volsurface.py
+"""
+
+# 3rd party imports
+from numpy import *
+
+# local imports
+from graph import lazy
+from volspliner import VolSpliner, spline_values
+
+# market quotes of each tenor that can tick
+QUOTES = ('ATM', 'Rr25', 'Rr10', 'Bf25', 'Bf10', 'Extrap_fact')
+
+# inputs of the fit whose assignment makes every smile stale
+FIT_INPUTS = ('Spot', 'Tenors') + QUOTES
+
+class VolSurface:
+    ''' One VolSpliner smile per tenor, held as a table of spline coefficients. A vol between two tenors interpolates
+    the total variance vol^2 * T of their smiles linearly in T at the same strike; before the first tenor and after the
+    last the smile of the nearest tenor is used flat. Ticking a quote marks its tenor stale, and the stale tenors are
+    refit together, in one batch, on the next lookup '''
+
+    def __init__(self):
+        super(VolSurface, self).__init__()
+        # indices of the tenors whose splines are out of date with their quotes, all of them to start with
+        self.Stale = set(range(len(self.Tenors)))
+
+    def __setattr__(self, name, value):
+        ''' assigning an input of the fit (the Spot, the Tenors or a whole quote array) makes every smile stale '''
+        super(VolSurface, self).__setattr__(name, value)
+        if name in FIT_INPUTS:
+            self.Stale = set(range(len(self.Tenors)))
+
+    def __delattr__(self, name):
+        super(VolSurface, self).__delattr__(name)
+        if name in FIT_INPUTS:
+            self.Stale = set(range(len(self.Tenors)))
+
+    # Market Inputs
+
+    @lazy
+    def Spot(self):
+        return 1
+
+    @lazy
+    def Tenors(self):
+        ''' times to expiration of the smiles, increasing '''
+        return array([1. / 12., .25, .5, 1., 2.])
+
+    @lazy
+    def ATM(self):
+        return array([.075, .078, .08, .082, .083])
+
+    @lazy
+    def Rr25(self):
+        return full(len(self.Tenors), .01)
+
+    @lazy
+    def Rr10(self):
+        return full(len(self.Tenors), .018)
+
+    @lazy
+    def Bf25(self):
+        return full(len(self.Tenors), .0025)
+
+    @lazy
+    def Bf10(self):
+        return full(len(self.Tenors), .0080)
+
+    @lazy
+    def Extrap_fact(self):
+        ''' VolSpliner extrapolation factor of each smile '''
+        return full(len(self.Tenors), 2.)
+
+    # Coefficient table
+
+    @lazy
+    def Coefficients(self):
+        ''' (tenors x 6 x 4) VolSpliner coefficients of the smiles, kept current by refit '''
+        return zeros((len(self.Tenors), 6, 4))
+
+    @lazy
+    def Knots(self):
+        ''' (tenors x 7) AllStrikes of the smiles, kept current by refit '''
+        return zeros((len(self.Tenors), 7))
+
+    def update(self, tenor, **quotes):
+        ''' tick some of the QUOTES of the tenor at the given index in Tenors '''
+        for name, value in quotes.items():
+            if name not in QUOTES:
+                raise TypeError('Only %s can be updated' % ', '.join(QUOTES))
+            getattr(self, name)[tenor] = value
+        self.Stale.add(tenor)
+
+    def refit(self):
+        ''' fit the stale smiles in one batched VolSpliner and write them into the coefficient table '''
+        if not self.Stale:
+            return
+        rows = array(sorted(self.Stale))
+        sp = VolSpliner()
+        sp.Spot = self.Spot
+        sp.Texp = asarray(self.Tenors, dtype=float64)[rows]
+        for name in QUOTES:
+            setattr(sp, name, asarray(getattr(self, name), dtype=float64)[rows])
+        self.Coefficients[rows] = sp.Coefficients
+        self.Knots[rows] = stack(broadcast_arrays(*sp.AllStrikes), axis=-1)
+        self.Stale = set()
+
+    def volatility(self, strike, texp):
+        '''Interpolates a volatility for the given strikes and times to expiration, broadcast together'''
+        self.refit()
+        tenors = asarray(self.Tenors, dtype=float64)
+        strikes, texps = broadcast_arrays(asarray(strike, dtype=float64), asarray(texp, dtype=float64))
+
+        # neighbouring tenors and the weight of the right one
+        texps = clip(texps, tenors[0], tenors[-1])
+        right = minimum(searchsorted(tenors, texps), len(tenors) - 1)
+        left = maximum(right - 1, 0)
+        spans = tenors[right] - tenors[left]
+        weights = where(spans > 0, (texps - tenors[left]) / where(spans > 0, spans, 1.), 1.)
+
+        # each smile evaluated at its own strikes, then total variance interpolated
+        vols_left = spline_values(self.Coefficients[left], self.Knots[left], strikes[..., newaxis])[0][..., 0]
+        vols_right = spline_values(self.Coefficients[right], self.Knots[right], strikes[..., newaxis])[0][..., 0]
+        variances = (1. - weights) * vols_left**2 * tenors[left] + weights * vols_right**2 * tenors[right]
+        vols = sqrt(variances / texps)
+        return float(vols) if ndim(vols) == 0 else vols
@@ -0,0 +1,221 @@
+"""
+Copyright:   Copyright (C) 2015 Baruch College FX modeling - All Rights Reserved
+Description: Daily update mode of the implied correlation analytics. Rather than recomputing the whole history on every
+             run, the state of every (triangle, tenor) - the previous day's cross vol and implied correlation, and
+             running statistics of the day-to-day cross vol changes and of the prediction errors - is kept, updated
+             one date at a time and saved between runs.
+Author:      Weiyi Chen
+"""
+
+# 3rd party imports
+import numpy
+import pandas
+
+# local imports
+from graph import lazy
+from impliedcorr import find_triangles, find_tenors, leg_columns, triangle_signs
+from pnlstats import RunningMoments
+
+
+class StreamingStats(object):
+    '''
+    Running statistics of an array of series, one value per series at a time, with NaNs skipped, as pandas' describe()
+    gives them: count, mean and std from RunningMoments, and min, max and the quartiles exactly, from the values of
+    each series kept sorted. A value goes into its place among them by shifting up the ones above it, so an update
+    costs the moments' constant time plus a shift of the longest series.
+    '''
+    QUANTILES = numpy.array([.25, .5, .75])
+
+    def __init__(self):
+        super(StreamingStats, self).__init__()
+        self.Moments = None
+
+    def start(self, shape):
+        ''' empty statistics for series of the given shape '''
+        self.Moments = RunningMoments()
+        self.Moments.Count = numpy.zeros(shape, dtype=int)
+        self.Moments.Mean = numpy.zeros(shape)
+        self.Moments.M2 = numpy.zeros(shape)
+        # the values of each series sorted, padded with inf past its count
+        self.Sorted = numpy.full(shape + (0,), numpy.inf)
+
+    def add(self, values):
+        ''' fold one value of every series into the statistics '''
+        values = numpy.asarray(values, dtype=numpy.float64)
+        if self.Moments is None:
+            self.start(values.shape)
+        self.Moments.add(values[..., numpy.newaxis], skipna=True)
+
+        # room for the longest series, doubling the buffer as it fills
+        length = int(self.Count.max()) if self.Count.size else 0
+        if length > self.Sorted.shape[-1]:
+            padding = numpy.full(self.Sorted.shape[:-1] + (max(length, self.Sorted.shape[-1]),), numpy.inf)
+            self.Sorted = numpy.concatenate([self.Sorted, padding], axis=-1)
+
+        # each value after the ones not above it; a NaN is an inf inserted in the padding, changing nothing
+        x = numpy.where(numpy.isnan(values), numpy.inf, values)[..., numpy.newaxis]
+        sorted_values = self.Sorted[..., :length]
+        places = (sorted_values <= x).sum(axis=-1)[..., numpy.newaxis]
+        cells = numpy.arange(length)
+        shifted = numpy.concatenate([sorted_values[..., :1], sorted_values[..., :-1]], axis=-1)
+        self.Sorted[..., :length] = numpy.where(cells < places, sorted_values,
+                                                numpy.where(cells == places, x, shifted))
+        return self
+
+    @property
+    def Count(self):
+        return self.Moments.Count
+
+    @property
+    def Mean(self):
+        return self.Moments.Mean
+
+    @property
+    def Std(self):
+        ''' sample standard deviation, as pandas' describe() '''
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            return numpy.sqrt(self.Moments.M2 / (self.Count - 1))
+
+    def order_statistics(self, ranks):
+        ''' (series x ranks) values of the given ranks (0 the smallest) of each series, NaN past its count '''
+        ranks = numpy.asarray(ranks)
+        if not self.Sorted.shape[-1]:
+            return numpy.full(self.Count.shape + ranks.shape[-1:], numpy.nan)
+        values = numpy.take_along_axis(self.Sorted, numpy.minimum(ranks, self.Sorted.shape[-1] - 1), axis=-1)
+        return numpy.where(ranks < self.Count[..., numpy.newaxis], values, numpy.nan)
+
+    @property
+    def Min(self):
+        return self.order_statistics(numpy.zeros(self.Count.shape + (1,), dtype=int))[..., 0]
+
+    @property
+    def Max(self):
+        return self.order_statistics(numpy.maximum(self.Count - 1, 0)[..., numpy.newaxis])[..., 0]
+
+    def quantiles(self):
+        ''' (series x QUANTILES) quantiles, interpolated linearly between order statistics as pandas' describe() '''
+        positions = self.QUANTILES * numpy.maximum(self.Count - 1, 0)[..., numpy.newaxis]
+        below = numpy.floor(positions).astype(int)
+        lower, upper = self.order_statistics(below), self.order_statistics(numpy.ceil(positions).astype(int))
+        return lower + (positions - below) * (upper - lower)
+
+    def state(self, prefix):
+        return {prefix + 'Count': self.Count, prefix + 'Mean': self.Mean, prefix + 'M2': self.Moments.M2,
+                prefix + 'Sorted': self.Sorted}
+
+    def restore(self, prefix, state):
+        self.start(state[prefix + 'Count'].shape)
+        self.Moments.Count = numpy.array(state[prefix + 'Count'])
+        self.Moments.Mean = numpy.array(state[prefix + 'Mean'])
+        self.Moments.M2 = numpy.array(state[prefix + 'M2'])
+        self.Sorted = numpy.array(state[prefix + 'Sorted'])
+        return self
+
+
+class DailyImpliedCorr(object):
+    '''
+    impliedCorr_analytics of every triangle and tenor (see impliedCorr_cube), one date at a time: append() takes a
+    row of the spreadsheet and updates the statistics of the day-to-day cross vol changes and of the errors of the
+    cross vols predicted with the day before's implied correlations, in time proportional to the number of triangles
+    '''
+    def __init__(self):
+        super(DailyImpliedCorr, self).__init__()
+
+    @lazy
+    def Columns(self):
+        ''' names of the spreadsheet columns (other than 'Date') of the rows to append '''
+        raise ValueError('Columns must be set')
+
+    @lazy
+    def Triangles(self):
+        return find_triangles(self.Columns)
+
+    @lazy
+    def Tenors(self):
+        return find_tenors(self.Columns)
+
+    @lazy
+    def Legs(self):
+        ''' column indices of the cross and the two USD pairs for every (triangle, tenor) '''
+        return leg_columns(self.Columns, self.Triangles, self.Tenors)
+
+    @lazy
+    def LastDate(self):
+        return None
+
+    @lazy
+    def LastVolX(self):
+        ''' cross vols of the last date '''
+        return numpy.full((len(self.Triangles), len(self.Tenors)), numpy.nan)
+
+    @lazy
+    def LastCorr(self):
+        ''' implied correlations of the last date '''
+        return numpy.full((len(self.Triangles), len(self.Tenors)), numpy.nan)
+
+    @lazy
+    def Diffs1d(self):
+        ''' statistics of the day-to-day changes in the cross vols, empty until the first date '''
+        stats = StreamingStats()
+        stats.start((len(self.Triangles), len(self.Tenors)))
+        return stats
+
+    @lazy
+    def Errors(self):
+        ''' statistics of the predicted less the true cross vols, empty until the first date '''
+        stats = StreamingStats()
+        stats.start((len(self.Triangles), len(self.Tenors)))
+        return stats
+
+    def append(self, date, row):
+        ''' add the vols of a date later than the last one, in the order of Columns '''
+        date = numpy.datetime64(date, 'D')
+        if self.LastDate is not None and date <= self.LastDate:
+            raise ValueError('Dates must be appended in increasing order, %s is not after %s' % (date, self.LastDate))
+        vols = numpy.append(numpy.asarray(row, dtype=numpy.float64), numpy.nan)
+        volx, vol1, vol2 = [vols[leg] for leg in self.Legs]
+        signs = triangle_signs(self.Triangles)
+
+        impliedCorr = signs * (volx**2 - vol1**2 - vol2**2) / (2. * vol1 * vol2)
+        predicted = numpy.sqrt(vol1**2 + vol2**2 + 2. * signs * self.LastCorr * vol1 * vol2)
+        self.Diffs1d.add(volx - self.LastVolX)
+        self.Errors.add(predicted - volx)
+        self.LastDate, self.LastVolX, self.LastCorr = date, volx, impliedCorr
+
+    def extend(self, dates, rows):
+        ''' append dates one at a time, rows being (dates x columns) '''
+        for date, row in zip(dates, rows):
+            self.append(date, row)
+
+    @property
+    def Stats(self):
+        ''' statistics of the two series, laid out as impliedCorr_cube's with the quartiles added '''
+        stats = {}
+        for name, series in [('Diffs1d', self.Diffs1d), ('Errors', self.Errors)]:
+            stats[name, 'count'] = series.Count
+            stats[name, 'mean'] = numpy.where(series.Count > 0, series.Mean, numpy.nan)
+            stats[name, 'std'] = series.Std
+            stats[name, 'min'] = series.Min
+            for quantile, values in zip(['25%', '50%', '75%'], numpy.moveaxis(series.quantiles(), -1, 0)):
+                stats[name, quantile] = values
+            stats[name, 'max'] = series.Max
+        return pandas.DataFrame(dict((key, value.ravel()) for key, value in stats.items()),
+                                index=pandas.MultiIndex.from_product([[triangle[0] for triangle in self.Triangles],
+                                                                      self.Tenors], names=['pairx', 'tenor']))
+
+    def save(self, path):
+        ''' write the state to a .npz file '''
+        state = dict(self.Diffs1d.state('Diffs1d.'), **self.Errors.state('Errors.'))
+        numpy.savez(path, Columns=numpy.array(self.Columns), LastVolX=self.LastVolX, LastCorr=self.LastCorr,
+                    LastDate=numpy.array([] if self.LastDate is None else [self.LastDate], dtype='datetime64[D]'),
+                    **state)
+
+    def load(self, path):
+        ''' read back the state written by save() '''
+        with numpy.load(path) as state:
+            self.Columns = list(state['Columns'])
+            self.LastVolX, self.LastCorr = state['LastVolX'], state['LastCorr']
+            self.LastDate = state['LastDate'][0] if len(state['LastDate']) else None
+            self.Diffs1d = StreamingStats().restore('Diffs1d.', state)
+            self.Errors = StreamingStats().restore('Errors.', state)
+        return self
@@ -0,0 +1,189 @@
+"""
+Copyright:   Copyright (C) 2015 Baruch College FX modeling - All Rights Reserved
+Description: Analysis on implied correlations and see how much moves in implied
+             correlation contribute to moves in cross volatility, versus moves in
+             the underlying USD-pair volatilities.
+Author:      Weiyi Chen
+"""
+
+# python imports
+import datetime
+
+# 3rd party imports
+import numpy
+import pandas
+
+# local imports
+from voldata import VolData
+
+def impliedCorr_analytics(pairx, pair1, pair2, tenor, sign, startDate, endDate, path='fx_vol_data.xlsx'):
+    '''
+    Function that construct two DataFrames: one holding day-to-day changes in the
+    cross ATM volatility, and one holding differences between the predicted cross
+    volatility (assuming the implied correlation from the day before) and the true
+    cross volatility. The function should print out statistics on both those series,
+    and returns them.
+
+
+    :param pairx:     name of the cross pair (as 'AUDJPY')
+    :type  pairx:     string
+    :param pair1:     name of the first pair (as 'AUDUSD')
+    :type  pair1:     string
+    :param pair2:     name of the second pair (as 'USDJPY')
+    :type  pair2:     string
+    :param tenor:     a string tenor (like '3m')
+    :type  tenor:     string
+    :param sign:      a flag to define whether the cross spot is the product or the ratio
+                      of the two USD spots (which affects the sign of the correlation)
+    :type  sign:      bool, True if ratio, False if product
+    :param startDate: the start date of the historical window
+    :type  startDate: datetime
+    :param endDate:   the end date of the historical window
+    :type  endDate:   datetime
+    :param path:      the spreadsheet of ATM implied volatilities, read through its columnar cache
+    :type  path:      string
+
+    '''
+
+    # It should start by loading the data for the ATM implied volatility for the three
+    # tenors from the spreadsheet into pandas DataFrames
+
+    data = VolData()
+    data.Path = path
+    df = data.frame(startDate, endDate, [pairx+' '+tenor, pair1+' '+tenor, pair2+' '+tenor])
+    dfx = df[pairx+' '+tenor]
+    df1 = df[pair1+' '+tenor]
+    df2 = df[pair2+' '+tenor]
+
+    # and then calculate a pandas DataFrame of implied correlations.
+
+    impliedCorr = ((dfx**2 - df1**2 - df2**2) / (2.*df1*df2)) * (1-2*sign)
+
+    # The next step: use the correlation from date i, along with the implied volatilities
+    # for the USD pairs on date i+1, to predict the cross volatility on date i+1. Do this
+    # with the pandas DataFrames you have already created.
+
+    dfx_predicted = numpy.sqrt(df1**2 + df2**2 + 2*(1-2*sign)*impliedCorr.shift(1)*df1*df2)
+
+    # Finally, construct two DataFrames: one holding day-to-day changes in the cross ATM
+    # volatility, and one holding differences between the predicted cross volatility
+    # (assuming the implied correlation from the day before) and the true cross volatility.
+
+    diffs_1d  = dfx - dfx.shift(1)
+    diffs_err = dfx_predicted - dfx
+
+    # The function should print out statistics on both those series.
+
+    print('Statistics for day-to-day changes in the cross ATM vol:')
+    print(diffs_1d.describe())
+    print()
+
+    print('Statistics for difference between the predicted and the true cross vol:')
+    print(diffs_err.describe())
+    print()
+
+    return diffs_1d, diffs_err
+
+def find_triangles(columns):
+    '''
+    All the (pairx, pair1, pair2, sign) triangles that can be formed from columns named 'PAIR TENOR': every cross pair
+    XY without USD whose two currencies each have a USD pair. With the USD value of a currency being its USD pair to
+    the power 1 (XUSD) or -1 (USDX), the cross spot is the ratio of the USD values of X and Y: the product of the two
+    USD spots when the powers differ, and their ratio (sign True) when they are the same.
+    '''
+    pairs = sorted(set(column.split()[0] for column in columns if len(column.split()) == 2))
+    usd_pairs = {}
+    for pair in pairs:
+        if pair[:3] == 'USD':
+            usd_pairs[pair[3:]] = (pair, -1)
+        elif pair[3:] == 'USD':
+            usd_pairs[pair[:3]] = (pair, 1)
+
+    triangles = []
+    for pairx in pairs:
+        ccy1, ccy2 = pairx[:3], pairx[3:]
+        if 'USD' not in (ccy1, ccy2) and ccy1 in usd_pairs and ccy2 in usd_pairs:
+            (pair1, power1), (pair2, power2) = usd_pairs[ccy1], usd_pairs[ccy2]
+            triangles.append((pairx, pair1, pair2, power1 == power2))
+    return triangles
+
+def find_tenors(columns):
+    ''' the tenors of columns named 'PAIR TENOR', in order of appearance '''
+    return list(dict.fromkeys(column.split()[1] for column in columns if len(column.split()) == 2))
+
+def leg_columns(columns, triangles, tenors):
+    '''
+    for the cross, first and second pair of the triangles, the (triangles x tenors) indices of their columns; -1 for
+    a missing column
+    '''
+    index = dict((column, i) for i, column in enumerate(columns))
+    return [numpy.array([[index.get(triangle[leg]+' '+tenor, -1) for tenor in tenors] for triangle in triangles],
+                        dtype=int).reshape(len(triangles), len(tenors)) for leg in range(3)]
+
+def triangle_signs(triangles):
+    ''' column of +1 for the product triangles and -1 for the ratio ones '''
+    return numpy.array([1. - 2. * triangle[3] for triangle in triangles])[:, numpy.newaxis]
+
+def impliedCorr_cube(startDate, endDate, path='fx_vol_data.xlsx', tenors=None):
+    '''
+    impliedCorr_analytics for every triangle of the spreadsheet (see find_triangles) and every tenor in one pass: the
+    vols of the three legs are gathered into (dates x triangles x tenors) cubes and the implied correlations,
+    day-before predictions of the cross vols and their errors computed on the whole cubes at once. A missing column
+    gives NaNs for its triangle and tenor.
+
+    Returns a dict with the 'Dates', the 'Triangles', the 'Tenors', the 'ImpliedCorr', 'Predicted', 'Diffs1d' and
+    'Errors' cubes, and 'Stats': count, mean, std, min and max of the day-to-day cross vol changes and of the
+    prediction errors, as a DataFrame indexed by (pairx, tenor).
+    '''
+    data = VolData()
+    data.Path = path
+    rows = data.window(startDate, endDate)
+    triangles = find_triangles(data.Columns)
+    tenors = find_tenors(data.Columns) if tenors is None else tenors
+
+    # the extra last row of vols is all NaN, for missing columns
+    vols = numpy.vstack([data.Values[:, rows], numpy.full((1, rows.stop - rows.start), numpy.nan)])
+    volx, vol1, vol2 = [vols[leg].transpose(2, 0, 1) for leg in leg_columns(data.Columns, triangles, tenors)]
+    signs = triangle_signs(triangles)
+
+    impliedCorr = signs * (volx**2 - vol1**2 - vol2**2) / (2. * vol1 * vol2)
+    predicted = numpy.full(volx.shape, numpy.nan)
+    predicted[1:] = numpy.sqrt(vol1[1:]**2 + vol2[1:]**2 + 2. * signs * impliedCorr[:-1] * vol1[1:] * vol2[1:])
+    diffs_1d = numpy.full(volx.shape, numpy.nan)
+    diffs_1d[1:] = volx[1:] - volx[:-1]
+    diffs_err = predicted - volx
+
+    stats = {}
+    for name, cube in [('Diffs1d', diffs_1d), ('Errors', diffs_err)]:
+        valid = ~numpy.isnan(cube)
+        counts = valid.sum(axis=0)
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            means = numpy.nansum(cube, axis=0) / counts
+            stats[name, 'std'] = numpy.sqrt(numpy.nansum((cube - means)**2, axis=0) / (counts - 1))
+        stats[name, 'count'] = counts
+        stats[name, 'mean'] = means
+        stats[name, 'min'] = numpy.where(counts > 0, numpy.where(valid, cube, numpy.inf).min(axis=0), numpy.nan)
+        stats[name, 'max'] = numpy.where(counts > 0, numpy.where(valid, cube, -numpy.inf).max(axis=0), numpy.nan)
+    stats = pandas.DataFrame(dict((key, value.ravel()) for key, value in stats.items()),
+                             index=pandas.MultiIndex.from_product([[triangle[0] for triangle in triangles], tenors],
+                                                                  names=['pairx', 'tenor']))
+
+    return {'Dates': data.Dates[rows], 'Triangles': triangles, 'Tenors': tenors, 'ImpliedCorr': impliedCorr,
+            'Predicted': predicted, 'Diffs1d': diffs_1d, 'Errors': diffs_err, 'Stats': stats}
+
+def main():
+    for tenor in ['1w','1m','6m','1y']:
+        print('Tenor:',tenor)
+        impliedCorr_analytics(
+            pairx = 'AUDJPY',
+            pair1 = 'AUDUSD',
+            pair2 = 'USDJPY',
+            tenor = tenor,
+            sign = False,
+            startDate = datetime.date(2007,1,1),
+            endDate = datetime.date(2013,5,31),
+        )
+        print()
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Copyright:   Copyright (C) 2015 Baruch College FX modeling - All Rights Reserved
+Description: Test for dailycorr.py
+Author:      Weiyi Chen
+"""
+
+# python imports
+import os
+import tempfile
+
+# 3rd party imports
+import numpy
+import pandas
+
+# local imports
+from dailycorr import DailyImpliedCorr, StreamingStats
+from impliedcorr import impliedCorr_cube
+from voldata import VolData
+
+def write_vols(folder, periods=300):
+    rng = numpy.random.RandomState(0)
+    dates = pandas.bdate_range('2010-01-01', periods=periods)
+    columns = {'Date': dates}
+    for pair in ['AUDUSD', 'USDJPY', 'EURUSD', 'GBPUSD', 'AUDJPY', 'EURGBP', 'EURJPY', 'GBPAUD']:
+        for tenor in ['1w', '1m']:
+            columns[pair+' '+tenor] = 10. + numpy.cumsum(rng.standard_normal(len(dates))) * .1
+    del columns['EURJPY 1w']
+    columns['GBPAUD 1m'][10:20] = numpy.nan
+    path = os.path.join(folder, 'vols.csv')
+    pandas.DataFrame(columns).to_csv(path, index=False, float_format='%.17g')
+    return path
+
+def test_streaming_stats():
+    '''Moments and quartiles match pandas' describe(), for short series and long ones'''
+    rng = numpy.random.RandomState(0)
+    values = rng.standard_normal((1000, 20))
+    values[::7, 3] = numpy.nan
+    stats = StreamingStats()
+    for row in values[:3]:
+        stats.add(row)
+    assert numpy.allclose(stats.quantiles(), numpy.nanquantile(values[:3], [.25, .5, .75], axis=0).T)
+    for row in values[3:]:
+        stats.add(row)
+    frame = pandas.DataFrame(values).describe()
+    assert numpy.array_equal(stats.Count, frame.loc['count'])
+    for stat, streamed in [('mean', stats.Mean), ('std', stats.Std), ('min', stats.Min), ('max', stats.Max)]:
+        assert numpy.allclose(streamed, frame.loc[stat])
+    assert numpy.allclose(stats.quantiles(), frame.loc[['25%', '50%', '75%']].T, rtol=0., atol=1e-15)
+
+def test_daily_matches_cube():
+    '''Appending the dates one at a time gives the statistics of the whole cube'''
+    with tempfile.TemporaryDirectory() as folder:
+        path = write_vols(folder)
+        data = VolData()
+        data.Path = path
+        daily = DailyImpliedCorr()
+        daily.Columns = data.Columns
+        daily.extend(data.Dates, data.Values.T)
+
+        cube = impliedCorr_cube(None, None, path=path)
+        stats = cube['Stats']
+        assert list(daily.Stats.index) == list(stats.index)
+        for name in ['Diffs1d', 'Errors']:
+            for stat in ['count', 'mean', 'std', 'min', 'max']:
+                assert numpy.allclose(daily.Stats[name, stat], stats[name, stat], equal_nan=True)
+            series = cube[name].reshape(len(cube['Dates']), -1)
+            quartiles = pandas.DataFrame(series).describe().loc[['25%', '50%', '75%']].T
+            assert numpy.allclose(daily.Stats[[(name, '25%'), (name, '50%'), (name, '75%')]], quartiles, rtol=0.,
+                                  atol=1e-12, equal_nan=True)
+
+def test_save_load():
+    '''A saved state carries on as if it had never been stopped, and dates must increase'''
+    with tempfile.TemporaryDirectory() as folder:
+        path = write_vols(folder)
+        data = VolData()
+        data.Path = path
+        whole, resumed = DailyImpliedCorr(), DailyImpliedCorr()
+        whole.Columns = resumed.Columns = data.Columns
+        whole.extend(data.Dates, data.Values.T)
+
+        resumed.extend(data.Dates[:100], data.Values.T[:100])
+        state = os.path.join(folder, 'state.npz')
+        resumed.save(state)
+        resumed = DailyImpliedCorr().load(state)
+        resumed.extend(data.Dates[100:], data.Values.T[100:])
+        assert whole.Stats.equals(resumed.Stats)
+
+        try:
+            resumed.append(data.Dates[-1], data.Values[:, -1])
+        except ValueError:
+            pass
+        else:
+            assert False, 'a date already appended should raise'
+
+def test_save_empty():
+    '''A state saved before the first date resumes like a fresh one'''
+    with tempfile.TemporaryDirectory() as folder:
+        path = write_vols(folder)
+        data = VolData()
+        data.Path = path
+        whole, empty = DailyImpliedCorr(), DailyImpliedCorr()
+        whole.Columns = empty.Columns = data.Columns
+        whole.extend(data.Dates, data.Values.T)
+
+        state = os.path.join(folder, 'state.npz')
+        empty.save(state)
+        # loading into an object set up for other columns replaces their triangles, tenors and legs
+        resumed = DailyImpliedCorr()
+        resumed.Columns = ['AUDUSD 1y', 'USDJPY 1y', 'AUDJPY 1y']
+        assert resumed.Tenors == ['1y'] and len(resumed.Legs[0]) == 1
+        resumed.load(state)
+        assert resumed.Triangles == whole.Triangles and resumed.Tenors == whole.Tenors
+        assert resumed.LastDate is None and (resumed.Stats['Diffs1d', 'count'] == 0).all()
+        resumed.extend(data.Dates, data.Values.T)
+        assert whole.Stats.equals(resumed.Stats)
+
+if __name__=='__main__':
+    test_streaming_stats()
+    test_daily_matches_cube()
+    test_save_load()
+    test_save_empty()
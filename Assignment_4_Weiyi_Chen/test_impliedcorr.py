@@ -0,0 +1,80 @@
+"""
+Copyright:   Copyright (C) 2015 Baruch College FX modeling - All Rights Reserved
+Description: Test for impliedcorr.py
+Author:      Weiyi Chen
+"""
+
+# python imports
+import datetime
+import os
+import tempfile
+
+# 3rd party imports
+import numpy
+import pandas
+
+# local imports
+from impliedcorr import impliedCorr_analytics, impliedCorr_cube, find_triangles
+
+def test_constant_correlation():
+    '''With a constant implied correlation the day-before prediction of the cross vol is exact'''
+    for sign, rho in [(False, .3), (True, -.6)]:
+        rng = numpy.random.RandomState(0)
+        dates = pandas.bdate_range('2010-01-01', periods=100)
+        vol1, vol2 = 10. + rng.uniform(-1, 1, 100), 8. + rng.uniform(-1, 1, 100)
+        # product crosses add the correlation term, ratio crosses subtract it
+        cross = numpy.sqrt(vol1**2 + vol2**2 + 2 * (1 - 2 * sign) * rho * vol1 * vol2)
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'vols.csv')
+            frame = pandas.DataFrame({'Date': dates, 'A 1m': vol1, 'B 1m': vol2, 'X 1m': cross})
+            frame.to_csv(path, index=False, float_format='%.17g')
+
+            diffs_1d, diffs_err = impliedCorr_analytics('X', 'A', 'B', '1m', sign, datetime.date(2010, 1, 15),
+                                                        datetime.date(2010, 3, 31), path=path)
+            window = (dates >= '2010-01-15') & (dates <= '2010-03-31')
+            assert list(diffs_1d.index) == list(dates[window])
+            assert numpy.allclose(diffs_1d.values[1:], numpy.diff(cross[window]))
+            assert numpy.allclose(diffs_err.dropna(), 0.)
+
+def test_triangles():
+    '''Triangles are found from the column names, with the sign from the quoting of the USD pairs'''
+    columns = ['Date'] + [pair+' 1m' for pair in ['AUDJPY', 'AUDUSD', 'USDJPY', 'EURUSD', 'GBPUSD', 'EURGBP', 'EURJPY',
+                                                 'GBPAUD', 'EURCHF']]
+    assert find_triangles(columns) == [('AUDJPY', 'AUDUSD', 'USDJPY', False), ('EURGBP', 'EURUSD', 'GBPUSD', True),
+                                       ('EURJPY', 'EURUSD', 'USDJPY', False), ('GBPAUD', 'GBPUSD', 'AUDUSD', True)]
+
+def test_cube():
+    '''The cube holds impliedCorr_analytics of every triangle and tenor'''
+    rng = numpy.random.RandomState(0)
+    dates = pandas.bdate_range('2010-01-01', periods=60)
+    columns = {'Date': dates}
+    for pair in ['AUDUSD', 'USDJPY', 'EURUSD', 'GBPUSD', 'AUDJPY', 'EURGBP', 'EURJPY', 'GBPAUD']:
+        for tenor in ['1w', '1m']:
+            columns[pair+' '+tenor] = 10. + rng.uniform(-1, 1, len(dates))
+    del columns['EURJPY 1w']
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'vols.csv')
+        pandas.DataFrame(columns).to_csv(path, index=False, float_format='%.17g')
+
+        start, end = datetime.date(2010, 1, 10), datetime.date(2010, 3, 10)
+        cube = impliedCorr_cube(start, end, path=path)
+        assert cube['Tenors'] == ['1w', '1m'] and len(cube['Triangles']) == 4
+        assert cube['Errors'].shape == (len(cube['Dates']), 4, 2)
+        for i, (pairx, pair1, pair2, sign) in enumerate(cube['Triangles']):
+            for j, tenor in enumerate(cube['Tenors']):
+                if pairx == 'EURJPY' and tenor == '1w':
+                    assert numpy.isnan(cube['Errors'][:, i, j]).all()
+                    continue
+                diffs_1d, diffs_err = impliedCorr_analytics(pairx, pair1, pair2, tenor, sign, start, end, path=path)
+                assert numpy.allclose(cube['Diffs1d'][:, i, j], diffs_1d.values, equal_nan=True)
+                assert numpy.allclose(cube['Errors'][:, i, j], diffs_err.values, equal_nan=True)
+                stats = cube['Stats'].loc[(pairx, tenor)]
+                for name, series in [('Diffs1d', diffs_1d), ('Errors', diffs_err)]:
+                    described = series.describe()
+                    for stat in ['count', 'mean', 'std', 'min', 'max']:
+                        assert numpy.isclose(stats[name, stat], described[stat])
+
+if __name__=='__main__':
+    test_constant_correlation()
+    test_triangles()
+    test_cube()
@@ -0,0 +1,102 @@
+"""
+Copyright:   Copyright (C) 2015 Baruch College FX modeling - All Rights Reserved
+Description: Test for voldata.py
+Author:      Weiyi Chen
+"""
+
+# python imports
+import datetime
+import os
+import tempfile
+
+# 3rd party imports
+import numpy
+import pandas
+
+# local imports
+from voldata import VolData
+
+class CountedVolData(VolData):
+    ''' VolData counting how often it parses its source '''
+    Parses = 0
+
+    def read_source(self):
+        CountedVolData.Parses += 1
+        return super(CountedVolData, self).read_source()
+
+def sample(path, ndates=300, seed=0):
+    ''' a spreadsheet of random vols on business days, written out of date order '''
+    rng = numpy.random.RandomState(seed)
+    dates = pandas.bdate_range('2010-01-01', periods=ndates)
+    df = pandas.DataFrame({'Date': dates})
+    for pair in ['AUDUSD', 'USDJPY', 'AUDJPY']:
+        for tenor in ['1w', '1m']:
+            df[pair+' '+tenor] = 10. + rng.standard_normal(ndates).cumsum() / 10.
+    df.iloc[rng.permutation(ndates)].to_csv(path, index=False, float_format='%.17g')
+    return df
+
+def open_data(path):
+    data = CountedVolData()
+    data.Path = path
+    return data
+
+def test_cache():
+    '''The cache serves the spreadsheet's data sorted by date, and slices date windows by binary search'''
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'vols.csv')
+        df = sample(path)
+        data = open_data(path)
+        assert data.Columns == list(df.columns[1:])
+        assert numpy.array_equal(data.Dates, df['Date'].values.astype('datetime64[D]'))
+        for name in data.Columns:
+            assert numpy.array_equal(data.column(name), df[name].values)
+            assert data.column(name).flags['C_CONTIGUOUS']
+
+        for start, end in [(datetime.date(2010, 2, 6), datetime.date(2010, 3, 7)), (datetime.date(2009, 1, 1), None),
+                           (None, datetime.date(2010, 1, 1)), (datetime.date(2010, 5, 3), datetime.date(2010, 5, 3))]:
+            mask = numpy.ones(len(df), dtype=bool)
+            if start is not None:
+                mask &= (df['Date'] >= pandas.Timestamp(start)).values
+            if end is not None:
+                mask &= (df['Date'] <= pandas.Timestamp(end)).values
+            assert numpy.array_equal(data.column('AUDJPY 1m', start, end), df['AUDJPY 1m'].values[mask])
+            frame = data.frame(start, end)
+            assert list(frame.columns) == data.Columns and len(frame) == mask.sum()
+
+def test_invalidation():
+    '''The source is parsed once, and again only when its content changes'''
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'vols.csv')
+        sample(path)
+        CountedVolData.Parses = 0
+        open_data(path).Values
+        open_data(path).Values
+        assert CountedVolData.Parses == 1
+
+        # touched but unchanged
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        open_data(path).Values
+        assert CountedVolData.Parses == 1
+
+        df = sample(path, seed=1)
+        data = open_data(path)
+        assert numpy.array_equal(data.column('USDJPY 1w'), df['USDJPY 1w'].values)
+        assert CountedVolData.Parses == 2
+
+def test_new_path():
+    '''Pointing a VolData at another spreadsheet serves that one's data rather than the cached arrays of the first'''
+    with tempfile.TemporaryDirectory() as folder:
+        first, second = os.path.join(folder, 'first.csv'), os.path.join(folder, 'second.csv')
+        sample(first)
+        df = sample(second, ndates=200, seed=1)
+        data = open_data(first)
+        assert len(data.Dates) == 300 and len(data.column('AUDUSD 1w')) == 300
+        data.Path = second
+        assert data.CacheDir == second + '.cache' and len(data.Dates) == 200
+        assert numpy.array_equal(data.column('AUDUSD 1w'), df['AUDUSD 1w'].values)
+
+if __name__=='__main__':
+    test_cache()
+    test_invalidation()
+    test_new_path()
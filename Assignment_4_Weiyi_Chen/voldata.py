@@ -0,0 +1,141 @@
+"""
+Copyright:   Copyright (C) 2015 Baruch College FX modeling - All Rights Reserved
+Description: Columnar cache of the historical volatility spreadsheet. The workbook is parsed once into a directory of
+             numpy arrays next to it - one contiguous float column per sheet column and a sorted date index - which
+             later runs memory-map instead of parsing the spreadsheet again. The cache is rebuilt whenever the source
+             changes (its size, modification time and, when those differ, its content hash).
+Author:      Weiyi Chen
+"""
+
+# python imports
+import hashlib
+import json
+import os
+
+# 3rd party imports
+import numpy
+import pandas
+
+# local imports
+from graph import lazy
+
+
+class VolData(object):
+    '''
+    Historical data of a spreadsheet with a 'Date' column and one column per series (like 'AUDUSD 1m'), served from
+    the columnar cache
+    '''
+    def __init__(self):
+        super(VolData, self).__init__()
+
+    @lazy
+    def Path(self):
+        ''' source spreadsheet, .xlsx/.xls or .csv '''
+        return 'fx_vol_data.xlsx'
+
+    @lazy
+    def CacheDir(self):
+        ''' directory holding the cached arrays '''
+        return self.Path + '.cache'
+
+    @lazy
+    def Meta(self):
+        ''' description of the cache (columns and source fingerprint), rebuilding the cache if it is out of date '''
+        stat = os.stat(self.Path)
+        try:
+            with open(os.path.join(self.CacheDir, 'meta.json')) as f:
+                meta = json.load(f)
+        except (IOError, ValueError):
+            return self.rebuild()
+
+        if meta['size'] == stat.st_size and meta['mtime'] == stat.st_mtime_ns:
+            return meta
+        if meta['size'] == stat.st_size and meta['sha256'] == self.source_hash():
+            # touched but unchanged
+            meta['mtime'] = stat.st_mtime_ns
+            self.write_meta(meta)
+            return meta
+        return self.rebuild()
+
+    @lazy
+    def Columns(self):
+        ''' names of the series '''
+        return self.Meta['columns']
+
+    @lazy
+    def Dates(self):
+        ''' sorted datetime64[D] index of the rows '''
+        return self.load_array('dates.npy')
+
+    @lazy
+    def Values(self):
+        ''' memory-mapped (columns x dates) array of the data, each series contiguous '''
+        return self.load_array('values.npy', mmap_mode='r')
+
+    def load_array(self, name, mmap_mode=None):
+        ''' an array of the cache, bringing the cache up to date first '''
+        self.Meta
+        return numpy.load(os.path.join(self.CacheDir, name), mmap_mode=mmap_mode)
+
+    def source_hash(self):
+        digest = hashlib.sha256()
+        with open(self.Path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def read_source(self):
+        ''' parse the spreadsheet into a DataFrame '''
+        if self.Path.endswith('.csv'):
+            return pandas.read_csv(self.Path, parse_dates=['Date'], float_precision='round_trip')
+        return pandas.read_excel(self.Path)
+
+    def rebuild(self):
+        ''' parse the source and write the cache; returns its description '''
+        stat = os.stat(self.Path)
+        df = self.read_source().sort_values('Date', kind='stable')
+        columns = [column for column in df.columns if column != 'Date']
+
+        if not os.path.isdir(self.CacheDir):
+            os.makedirs(self.CacheDir)
+        dates = df['Date'].values.astype('datetime64[D]')
+        values = numpy.ascontiguousarray(df[columns].values.T, dtype=numpy.float64)
+        self.write_array('dates.npy', dates)
+        self.write_array('values.npy', values)
+
+        meta = {'columns': columns, 'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'sha256': self.source_hash()}
+        self.write_meta(meta)
+        return meta
+
+    def write_array(self, name, array):
+        ''' write an array to the cache, replacing the old one only once it is complete '''
+        path = os.path.join(self.CacheDir, name)
+        with open(path + '.tmp', 'wb') as f:
+            numpy.save(f, array)
+        os.replace(path + '.tmp', path)
+
+    def write_meta(self, meta):
+        path = os.path.join(self.CacheDir, 'meta.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(meta, f)
+        os.replace(path + '.tmp', path)
+
+    def window(self, startDate=None, endDate=None):
+        ''' slice of the rows dated between startDate and endDate inclusive, found by binary search on the dates '''
+        start, end = 0, len(self.Dates)
+        if startDate is not None:
+            start = numpy.searchsorted(self.Dates, numpy.datetime64(startDate, 'D'), 'left')
+        if endDate is not None:
+            end = numpy.searchsorted(self.Dates, numpy.datetime64(endDate, 'D'), 'right')
+        return slice(start, end)
+
+    def column(self, name, startDate=None, endDate=None):
+        ''' a series between two dates, as a read-only array view of the cache '''
+        return self.Values[self.Columns.index(name), self.window(startDate, endDate)]
+
+    def frame(self, startDate=None, endDate=None, columns=None):
+        ''' the data between two dates as a DataFrame indexed by date, like the rows of the spreadsheet '''
+        rows = self.window(startDate, endDate)
+        columns = self.Columns if columns is None else columns
+        return pandas.DataFrame({name: self.column(name)[rows] for name in columns},
+                                index=pandas.DatetimeIndex(self.Dates[rows], name='Date'), columns=columns)
@@ -0,0 +1,94 @@
+"""
+Author: Weiyi Chen
+Copyright: Copyright (C) 2015 Baruch College, Modeling and Market Making in FX - All Rights Reserved
+Description: Black-Scholes prices, greeks and implied volatilities of European options, with continuously compounded
+             domestic and foreign rates rd and rf; every argument can be a numpy array, and they broadcast together
+Test: test_bs.py
+"""
+
+# 3rd party imports
+import numpy
+from scipy.special import ndtr
+
+
+def norm_pdf(x):
+    return numpy.exp(-x * x / 2.) / numpy.sqrt(2. * numpy.pi)
+
+def d1_d2(fwd, strike, stdev):
+    ''' the Black-Scholes d1 and d2 of a forward, for a total standard deviation vol*sqrt(texp) '''
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        d1 = numpy.log(fwd / strike) / stdev + stdev / 2.
+    return d1, d1 - stdev
+
+def black(is_call, fwd, strike, stdev):
+    ''' undiscounted price of an option on a forward; the intrinsic value when stdev is zero '''
+    sign = numpy.where(is_call, 1., -1.)
+    d1, d2 = d1_d2(fwd, strike, stdev)
+    price = sign * (fwd * ndtr(sign * d1) - strike * ndtr(sign * d2))
+    return numpy.where(stdev > 0., price, numpy.maximum(sign * (fwd - strike), 0.))
+
+def opt_price(is_call, spot, strike, texp, vol, rd, rf):
+    ''' Black-Scholes price of a European call or put '''
+    fwd = spot * numpy.exp((rd - rf) * texp)
+    return numpy.exp(-rd * texp) * black(is_call, fwd, strike, vol * numpy.sqrt(texp))
+
+def opt_delta(is_call, spot, strike, texp, vol, rd, rf):
+    ''' derivative of the price with respect to spot '''
+    fwd = spot * numpy.exp((rd - rf) * texp)
+    d1, d2 = d1_d2(fwd, strike, vol * numpy.sqrt(texp))
+    return numpy.exp(-rf * texp) * numpy.where(is_call, ndtr(d1), ndtr(d1) - 1.)
+
+def opt_vega(is_call, spot, strike, texp, vol, rd, rf):
+    ''' derivative of the price with respect to vol, the same for calls and puts '''
+    fwd = spot * numpy.exp((rd - rf) * texp)
+    d1, d2 = d1_d2(fwd, strike, vol * numpy.sqrt(texp))
+    return numpy.exp(-rd * texp) * fwd * norm_pdf(d1) * numpy.sqrt(texp)
+
+def imp_vol(is_call, spot, strike, texp, price, rd, rf, tol=1e-14, max_iter=100):
+    '''
+    Black-Scholes implied volatility of option prices, NaN where a price is outside the no-arbitrage bounds.
+
+    Every price is first turned into the undiscounted price of the out of the money option at the same strike, which
+    is the better conditioned one, and the total standard deviation s = vol*sqrt(texp) started from the Corrado-Miller
+    closed form approximation. Halley steps, which use the vega and volga, then refine all strikes at once; a bracket
+    of s is kept from the signs of the price errors, and a step that would leave it bisects it instead, so that far
+    out of the money strikes, where the price is convex in s, still converge.
+    '''
+    is_call, spot, strike, texp, price, rd, rf = numpy.broadcast_arrays(is_call, spot, strike, texp, price, rd, rf)
+    fwd = spot * numpy.exp((rd - rf) * texp)
+    undiscounted = price * numpy.exp(rd * texp)
+    call = numpy.where(is_call, undiscounted, undiscounted + fwd - strike)
+
+    otm_call = strike >= fwd
+    target = numpy.where(otm_call, call, call - fwd + strike)
+    valid = (target > 0.) & (target < numpy.where(otm_call, fwd, strike))
+
+    # Corrado-Miller approximation from the call price
+    a = call - (fwd - strike) / 2.
+    root = numpy.sqrt(numpy.maximum(a * a - (fwd - strike)**2 / numpy.pi, 0.))
+    s = numpy.sqrt(2. * numpy.pi) / (fwd + strike) * (a + root)
+    s = numpy.where(valid & (s > 0.) & numpy.isfinite(s), s, .1)
+
+    # the iterations work on the strikes not converged yet only
+    index = numpy.flatnonzero(valid)
+    fwd, strike, otm_call, target = [x.ravel()[index] for x in (fwd, strike, otm_call, target)]
+    s, result = s.ravel()[index], s.ravel().copy()
+    lo, hi = numpy.zeros(s.shape), numpy.full(s.shape, numpy.inf)
+    with numpy.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        for _ in range(max_iter):
+            if not len(index):
+                break
+            d1, d2 = d1_d2(fwd, strike, s)
+            error = black(otm_call, fwd, strike, s) - target
+            lo = numpy.where(error < 0., s, lo)
+            hi = numpy.where(error > 0., s, hi)
+            newton = error / (fwd * norm_pdf(d1))
+            stepped = s - newton / (1. - newton * d1 * d2 / (2. * s))
+            outside = ~((stepped > lo) & (stepped < hi))
+            stepped = numpy.where(outside, numpy.where(numpy.isinf(hi), 2. * s, (lo + hi) / 2.), stepped)
+            result[index] = stepped
+            active = (numpy.abs(stepped - s) > tol * s) & (error != 0.)
+            index, s, lo, hi = index[active], stepped[active], lo[active], hi[active]
+            fwd, strike, otm_call, target = fwd[active], strike[active], otm_call[active], target[active]
+
+    return numpy.where(valid, result.reshape(valid.shape) / numpy.sqrt(texp), numpy.nan)
@@ -0,0 +1,151 @@
+"""
+Author: Weiyi Chen
+Copyright: Copyright (C) 2015 Baruch College, Modeling and Market Making in FX - All Rights Reserved
+Description: Calibration of the Merton jump diffusion parameters (vol, jump_freq, jump_mean, jump_sd) to market
+             smiles quoted as ATM, 25 and 10 delta risk reversals and butterflies, with the quote conventions of
+             VolSpliner: zero rates, the smile strangle convention and forward deltas. A smile is fitted by least
+             squares on the five implied vols, every step pricing the five strikes in one pass; a surface is fitted
+             pair by pair over a pool of worker processes, each tenor starting from the previous fit.
+Test: test_calibration.py
+"""
+
+# python imports
+import math
+from multiprocessing import Pool
+
+# 3rd party imports
+import numpy
+import scipy.optimize
+import scipy.stats as stats
+
+# local imports
+from merton import imp_vols_merton_cos
+
+# standard normal quantiles of the 25 and 10 delta strikes
+N25, N10 = stats.norm.ppf(0.25), stats.norm.ppf(0.10)
+# and of the five quoted strikes, from the 10 delta put to the 10 delta call
+QUANTILES = numpy.array([N10, N25, 0., -N25, -N10])
+
+# bounds of the parameters vol, jump_freq, jump_mean, jump_sd
+LOWER = numpy.array([1e-3, 0., -.5, 0.])
+UPPER = numpy.array([2., 20., .5, .5])
+# typical sizes of the parameters, for scaling the optimizer's steps and the finite difference bumps
+SCALES = numpy.array([.01, 1., .01, .01])
+
+
+def smile_quotes(atm, rr25, rr10, bf25, bf10, texp, spot=1.):
+    ''' strikes and vols of the 10 and 25 delta puts, the ATM and the 25 and 10 delta calls, on a trailing axis '''
+    vols = numpy.stack(numpy.broadcast_arrays(atm - rr10 / 2. + bf10, atm - rr25 / 2. + bf25, atm,
+                                              atm + rr25 / 2. + bf25, atm + rr10 / 2. + bf10), axis=-1)
+    texp = numpy.asarray(texp)[..., numpy.newaxis]
+    strikes = spot * numpy.exp(vols * vols * texp / 2. + vols * numpy.sqrt(texp) * QUANTILES)
+    return strikes, vols
+
+def merton_smile(params, strikes, texp, spot=1.):
+    '''
+    implied vols of the Merton model with params (vol, jump_freq, jump_mean, jump_sd) at an array of strikes; params
+    can be a (models x 4) array, the vols then being (models x strikes)
+    '''
+    vol, jump_freq, jump_mean, jump_sd = numpy.moveaxis(numpy.asarray(params), -1, 0)
+    return imp_vols_merton_cos(spot, strikes, texp, vol, 0., 0., jump_freq, jump_mean, jump_sd)
+
+def merton_quotes(params, texp, spot=1., iterations=50):
+    '''
+    ATM, 25 and 10 delta risk reversal and butterfly quotes of the Merton model; as the delta strikes depend on their
+    own vols, those are iterated to a fixed point
+    '''
+    vols = numpy.full(5, params[0])
+    for _ in range(iterations):
+        strikes = spot * numpy.exp(vols * vols * texp / 2. + vols * math.sqrt(texp) * QUANTILES)
+        vols, previous = merton_smile(params, strikes, texp, spot), vols
+        if numpy.abs(vols - previous).max() < 1e-14:
+            break
+    vol10p, vol25p, atm, vol25c, vol10c = vols
+    return atm, vol25c - vol25p, vol10c - vol10p, (vol25c + vol25p) / 2. - atm, (vol10c + vol10p) / 2. - atm
+
+def initial_guesses(atm, rr25):
+    '''
+    starts for fitting a smile with nothing better to go on - frequent small jumps, a few middling ones and rare
+    large ones, skewed the way of the risk reversal - as the fit can settle in a different local minimum from each
+    '''
+    sign = math.copysign(1., rr25)
+    return numpy.array([[atm, 5., .01 * sign, .02], [atm, 1., .02 * sign, .05], [atm, 1., .02 * sign, 0.]])
+
+def fit_smile(strikes, vols, texp, spot, guess, stiffness=0.):
+    '''
+    least squares fit of the Merton parameters to the vols at strikes, from guess; a stiffness adds residuals of
+    stiffness * (params - guess) / SCALES, holding the parameters near the guess along directions the smile barely
+    distinguishes. Returns the parameters and the root mean square vol error.
+    '''
+    guess = numpy.clip(guess, LOWER, UPPER)
+
+    def residuals(params):
+        # parameters giving prices without implied vols are pushed away
+        errors = numpy.nan_to_num(merton_smile(params, strikes, texp, spot) - vols, nan=1.)
+        return numpy.concatenate([errors, stiffness * (params - guess) / SCALES], axis=-1)
+
+    def jacobian(params):
+        # forward differences, the four bumped models priced in one batch; bumps near the upper bounds go down
+        bumps = 1e-5 * numpy.maximum(numpy.abs(params), SCALES)
+        bumps = numpy.where(params + bumps > UPPER, -bumps, bumps)
+        bumped = residuals(numpy.vstack([params, params + numpy.diag(bumps)]))
+        return (bumped[1:] - bumped[0]).T / bumps
+
+    fit = scipy.optimize.least_squares(residuals, guess, jac=jacobian, bounds=(LOWER, UPPER), x_scale=SCALES,
+                                       xtol=1e-10, ftol=1e-12)
+    return fit.x, math.sqrt(numpy.mean(fit.fun[:len(vols)]**2))
+
+def calibrate_smile(atm, rr25, rr10, bf25, bf10, texp, spot=1., guess=None, stiffness=0.):
+    '''
+    Merton parameters (vol, jump_freq, jump_mean, jump_sd) fitting one smile's five quotes. With a guess (the fit of a
+    neighbouring tenor, or of the day before) the fit starts there, and a positive stiffness holds it near the guess
+    (see fit_smile) so that parameters move only as far as the quotes need; without, it is the best fit from the
+    initial_guesses. Returns the parameters and the root mean square vol error.
+    '''
+    strikes, vols = smile_quotes(atm, rr25, rr10, bf25, bf10, texp, spot)
+    if guess is not None:
+        return fit_smile(strikes, vols, texp, spot, guess, stiffness)
+    fits = [fit_smile(strikes, vols, texp, spot, guess) for guess in initial_guesses(atm, rr25)]
+    return min(fits, key=lambda fit: fit[1])
+
+def calibrate_pair(task):
+    ''' fit the tenors of one pair in turn, each started from its guess or else the fit of the tenor before '''
+    quotes, texps, spot, guesses, stiffness = task
+    params, errors, previous = numpy.zeros((len(texps), 4)), numpy.zeros(len(texps)), None
+    for i, texp in enumerate(texps):
+        guess = previous if guesses is None or numpy.isnan(guesses[i]).any() else guesses[i]
+        params[i], errors[i] = calibrate_smile(*quotes[i], texp=texp, spot=spot, guess=guess, stiffness=stiffness)
+        previous = params[i]
+    return params, errors
+
+def calibrate_surface(quotes, texps, spots=1., guesses=None, processes=None, stiffness=0.):
+    '''
+    Merton parameters of every (pair, tenor) of a surface.
+
+    :param quotes:    (pairs x tenors x 5) ATM, Rr25, Rr10, Bf25 and Bf10 quotes
+    :type  quotes:    array
+    :param texps:     times to expiration of the tenors, in increasing order
+    :type  texps:     array
+    :param spots:     spot of each pair, or one for all
+    :type  spots:     float or array
+    :param guesses:   (pairs x tenors x 4) starting parameters, typically the last fit; NaN rows start from the
+                      previous tenor's fit
+    :type  guesses:   array or None
+    :param processes: number of worker processes the pairs are spread over; None fits them in this process
+    :type  processes: int or None
+    :param stiffness: how strongly started fits are held near their guesses (see fit_smile); 0 leaves them free
+    :type  stiffness: float
+
+    Returns the (pairs x tenors x 4) parameters and (pairs x tenors) root mean square vol errors.
+    '''
+    quotes = numpy.asarray(quotes, dtype=numpy.float64)
+    spots = numpy.broadcast_to(spots, quotes.shape[:1])
+    tasks = [(quotes[i], texps, spots[i], None if guesses is None else guesses[i], stiffness)
+             for i in range(len(quotes))]
+
+    if processes:
+        with Pool(processes) as pool:
+            fits = pool.map(calibrate_pair, tasks)
+    else:
+        fits = list(map(calibrate_pair, tasks))
+    return numpy.array([params for params, errors in fits]), numpy.array([errors for params, errors in fits])
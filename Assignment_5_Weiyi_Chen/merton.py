@@ -0,0 +1,225 @@
+"""
+Author: Weiyi Chen
+Copyright: Copyright (C) 2015 Baruch College, Modeling and Market Making in FX - All Rights Reserved
+Description: Vanilla option pricing in the Merton jump diffusion model of question 4: through the characteristic
+             function, one strike at a time by quadrature or a whole strike grid at once with the Fourier-cosine (COS)
+             expansion, and by the conditional expectation over the number of jumps
+Test: test_merton.py
+"""
+
+# python imports
+import cmath
+import math
+
+# 3rd party imports
+import numpy
+import scipy.integrate
+import scipy.optimize
+import scipy.stats as stats
+
+# local imports
+import bs
+
+
+def diffusive_drift(spot,fwd,texp,vol,jump_freq,jump_mean,jump_sd):
+    return 1/texp*numpy.log(fwd/spot)-jump_freq*(numpy.exp(jump_mean+jump_sd*jump_sd/2.)-1)-vol*vol/2.
+
+def opt_price_merton_charfn(is_call,spot,strike,texp,vol,rd,rf,jump_freq,jump_mean,jump_sd):
+    fwd = spot*math.exp((rd-rf)*texp)
+    mu  = diffusive_drift(spot,fwd,texp,vol,jump_freq,jump_mean,jump_sd)
+
+    i        = 1j
+    jump_var = jump_sd*jump_sd
+
+    # characteristic function of log(S(T)/S(0)), the strike being measured relative to spot below
+    def char_fn(theta):
+        A = i*theta*mu*texp-theta*theta*vol*vol*texp/2.+jump_freq*texp*(cmath.exp(i*theta*jump_mean-theta*theta*jump_var/2.)-1)
+        return cmath.exp(A)
+
+    strike_ratio = math.log(strike/spot)
+
+    def integrand(theta):
+        f = char_fn(theta)
+
+        val = f*cmath.exp(-i*theta*strike_ratio)/(theta*theta+i*theta)
+        return val.real
+
+    theta_scale = math.sqrt(2/vol/vol/texp)
+
+    integ    = 0
+    theta_lo = 0
+    theta_hi = theta_scale
+    count    = 0
+    while True:
+        integ_piece = scipy.integrate.quad(integrand,theta_lo,theta_hi)[0]
+        integ += integ_piece
+        if abs(integ_piece)<1e-10: break
+
+        theta_lo  = theta_hi
+        theta_hi += theta_scale
+
+        count += 1
+
+    price = fwd-strike/2.-strike/math.pi*integ
+
+    if not is_call:
+        price -= fwd-strike
+
+    price *= math.exp(-rd*texp)
+    return price
+
+def merton_char_fn(theta,texp,mu,vol,jump_freq,jump_mean,jump_sd):
+    ''' characteristic function of log(S(T)/S(0)) over an array of theta '''
+    jump_var = jump_sd*jump_sd
+    A = 1j*theta*mu*texp-theta*theta*vol*vol*texp/2.
+    A = A+jump_freq*texp*(numpy.exp(1j*theta*jump_mean-theta*theta*jump_var/2.)-1)
+    return numpy.exp(A)
+
+def merton_cumulants(texp,mu,vol,jump_freq,jump_mean,jump_sd):
+    ''' first, second and fourth cumulants of log(S(T)/S(0)) '''
+    jump_var = jump_sd*jump_sd
+    c1 = (mu+jump_freq*jump_mean)*texp
+    c2 = (vol*vol+jump_freq*(jump_mean*jump_mean+jump_var))*texp
+    c4 = jump_freq*texp*(jump_mean**4+6*jump_mean*jump_mean*jump_var+3*jump_var*jump_var)
+    return c1, c2, c4
+
+def opt_prices_merton_cos(is_call,spot,strikes,texp,vol,rd,rf,jump_freq,jump_mean,jump_sd,n_terms=256,trunc=12.):
+    '''
+    Prices of a whole array of strikes with the COS method of Fang and Oosterlee: the density of y = log(S(T)/S(0)) on
+    [a,b] = c1 -/+ trunc*sqrt(c2+sqrt(c4)) is expanded in n_terms cosines, whose coefficients need the characteristic
+    function at the n_terms frequencies k*pi/(b-a) only, once for all strikes; a put's payoff then integrates against
+    each cosine in closed form. Puts are expanded, and calls got by put-call parity, since the put payoff is bounded.
+    The error decays exponentially in n_terms for the smooth Merton density; trunc sets the part of it left outside
+    [a,b]. is_call may be an array matching strikes.
+
+    The model inputs (spot, texp, vol, rates and jump parameters) can also be arrays of a common shape, for a batch of
+    models priced at once; strikes then has that shape plus a trailing axis of strikes for each model.
+
+    :param n_terms: number of cosine terms
+    :type  n_terms: int
+    :param trunc:   half width of the truncation range in standard deviations
+    :type  trunc:   float
+    '''
+    strikes = numpy.asarray(strikes, dtype=numpy.float64)
+    model = numpy.broadcast_arrays(spot,texp,vol,rd,rf,jump_freq,jump_mean,jump_sd)
+    if model[0].ndim:
+        model = [x[...,numpy.newaxis] for x in model]
+    spot,texp,vol,rd,rf,jump_freq,jump_mean,jump_sd = model
+
+    fwd = spot*numpy.exp((rd-rf)*texp)
+    mu  = diffusive_drift(spot,fwd,texp,vol,jump_freq,jump_mean,jump_sd)
+
+    c1, c2, c4 = merton_cumulants(texp,mu,vol,jump_freq,jump_mean,jump_sd)
+    a = c1-trunc*numpy.sqrt(c2+numpy.sqrt(c4))
+    b = c1+trunc*numpy.sqrt(c2+numpy.sqrt(c4))
+
+    # the cosine terms go on a last axis
+    texp_, mu_, vol_, a_, b_ = [x[...,numpy.newaxis] for x in (texp,mu,vol,a,b)]
+    jump_freq_, jump_mean_, jump_sd_ = [x[...,numpy.newaxis] for x in (jump_freq,jump_mean,jump_sd)]
+    u = numpy.arange(n_terms)*math.pi/(b_-a_)
+    weights = (merton_char_fn(u,texp_,mu_,vol_,jump_freq_,jump_mean_,jump_sd_)*numpy.exp(-1j*u*a_)).real
+    weights[...,0] /= 2.
+
+    # cosine coefficients of the put payoff strike*(1-exp(y-k))+ on [a, k], k the log strike clamped to [a,b]
+    k  = numpy.clip(numpy.log(strikes/spot),a,b)[...,numpy.newaxis]
+    uk = u*(k-a_)
+    sin_uk, cos_uk = numpy.sin(uk), numpy.cos(uk)
+    chi = ((cos_uk+u*sin_uk)*numpy.exp(k)-numpy.exp(a_))/(1+u*u)
+    psi = numpy.where(u>0,sin_uk/numpy.where(u>0,u,1.),k-a_)
+    payoff = 2./(b_-a_)*strikes[...,numpy.newaxis]*(psi-numpy.exp(-k)*chi)
+
+    prices = numpy.exp(-rd*texp)*(payoff*weights).sum(axis=-1)
+    prices = numpy.where(is_call,prices+numpy.exp(-rd*texp)*(fwd-strikes),prices)
+    return numpy.maximum(prices,0.)
+
+def poisson_weights(mean, tol=1e-16):
+    ''' probabilities of 0, 1, 2... events of a Poisson distribution, up to where those left sum to less than tol '''
+    return stats.poisson.pmf(numpy.arange(stats.poisson.isf(tol, mean)+1), mean)
+
+def opt_prices_merton_condexp(is_call,spot,strikes,texp,vol,rd,rf,jump_freq,jump_mean,jump_sd,tol=1e-16):
+    '''
+    Prices of a strike array by conditioning on the number of jumps: given n jumps log spot is normal, and the price
+    the Black-Scholes one for the conditional forward and variance. All jump counts are priced against all strikes in
+    one broadcast, and averaged with the Poisson weights of the counts, up to a tail probability of tol.
+    '''
+    strikes = numpy.asarray(strikes, dtype=numpy.float64)
+    fwd = spot*math.exp((rd-rf)*texp)
+    mu  = diffusive_drift(spot,fwd,texp,vol,jump_freq,jump_mean,jump_sd)+vol*vol/2.
+
+    jump_var = jump_sd*jump_sd
+    weights  = poisson_weights(jump_freq*texp,tol)
+    n_jumps  = numpy.arange(len(weights)).reshape((-1,)+(1,)*strikes.ndim)
+
+    fwd_cond   = spot*numpy.exp(mu*texp+n_jumps*(jump_mean+jump_var/2))
+    stdev_cond = numpy.sqrt(vol*vol*texp+n_jumps*jump_var)
+    prices_cond = bs.black(is_call,fwd_cond,strikes,stdev_cond)
+    return math.exp(-rd*texp)*numpy.tensordot(weights,prices_cond,axes=1)
+
+def opt_price_merton_condexp(is_call,spot,strike,texp,vol,rd,rf,jump_freq,jump_mean,jump_sd):
+    return float(opt_prices_merton_condexp(is_call,spot,strike,texp,vol,rd,rf,jump_freq,jump_mean,jump_sd))
+
+def imp_vols_merton_cos(spot,strikes,texp,vol,rd,rf,jump_freq,jump_mean,jump_sd):
+    ''' implied volatilities of out of the money options over a strike array, priced in one COS pass '''
+    fwd = spot*math.exp((rd-rf)*texp)
+    is_call = numpy.asarray(strikes)>=fwd
+    prices = opt_prices_merton_cos(is_call,spot,strikes,texp,vol,rd,rf,jump_freq,jump_mean,jump_sd)
+    return bs.imp_vol(is_call,spot,strikes,texp,prices,rd,rf)
+
+def imp_vols_merton_condexp(spot,strikes,texp,vol,rd,rf,jump_freq,jump_mean,jump_sd):
+    ''' implied volatilities of out of the money options over a strike array, priced by conditional expectation '''
+    fwd = spot*math.exp((rd-rf)*texp)
+    is_call = numpy.asarray(strikes)>=fwd
+    prices = opt_prices_merton_condexp(is_call,spot,strikes,texp,vol,rd,rf,jump_freq,jump_mean,jump_sd)
+    return bs.imp_vol(is_call,spot,strikes,texp,prices,rd,rf)
+
+def imp_vol_merton_charfn(spot,strike,texp,vol,rd,rf,jump_freq,jump_mean,jump_sd):
+    fwd = spot*math.exp((rd-rf)*texp)
+    is_call = strike>=fwd
+    price = opt_price_merton_charfn(is_call,spot,strike,texp,vol,rd,rf,jump_freq,jump_mean,jump_sd)
+    return float(bs.imp_vol(is_call,spot,strike,texp,price,rd,rf))
+
+def imp_vol_merton_condexp(spot,strike,texp,vol,rd,rf,jump_freq,jump_mean,jump_sd):
+    return float(imp_vols_merton_condexp(spot,strike,texp,vol,rd,rf,jump_freq,jump_mean,jump_sd))
+
+def test():
+    import matplotlib.pyplot as plot
+
+    spot      = 1
+    pnts      = 0.03
+    texp      = 0.5
+    vol       = 0.08
+    rd        = 0.05
+    jump_freq = 3
+    jump_mean = -0.04
+    jump_sd   = 0.
+
+    fwd = spot+pnts
+    rf  = rd-1/texp*math.log(fwd/spot)
+
+    delta_limit = 0.10
+
+    def arg_func(strike):
+        imp_vol = imp_vols_merton_cos(spot,strike,texp,vol,rd,rf,jump_freq,jump_mean,jump_sd)
+        return bs.opt_delta(False,spot,strike,texp,imp_vol,rd,rf)+delta_limit
+
+    strike_lo = scipy.optimize.newton(arg_func,fwd*math.exp(-vol*math.sqrt(texp)))
+
+    def arg_func(strike):
+        imp_vol = imp_vols_merton_cos(spot,strike,texp,vol,rd,rf,jump_freq,jump_mean,jump_sd)
+        return bs.opt_delta(True,spot,strike,texp,imp_vol,rd,rf)-delta_limit
+
+    strike_hi = scipy.optimize.newton(arg_func,fwd*math.exp(vol*math.sqrt(texp)))
+
+    nstrikes = 100
+    strikes  = numpy.linspace(strike_lo,strike_hi,nstrikes)
+
+    # the whole smile in one pass of each pricer
+    vols_charfn  = imp_vols_merton_cos(spot,strikes,texp,vol,rd,rf,jump_freq,jump_mean,jump_sd)*100
+    vols_condexp = imp_vols_merton_condexp(spot,strikes,texp,vol,rd,rf,jump_freq,jump_mean,jump_sd)*100
+
+    plot.plot(strikes, vols_charfn)
+    plot.plot(strikes, vols_condexp)
+    plot.show()
+
+if __name__=="__main__":
+    test()
@@ -0,0 +1,53 @@
+"""
+Author: Weiyi Chen
+Copyright: Copyright (C) 2015 Baruch College, Modeling and Market Making in FX - All Rights Reserved
+Description: Test for bs.py
+"""
+
+import numpy
+from bs import opt_price, opt_delta, opt_vega, imp_vol
+
+def random_options(n=10000, seed=0):
+    rng = numpy.random.RandomState(seed)
+    spot, texp, vol = rng.uniform(.5, 2., n), rng.uniform(.05, 5., n), rng.uniform(.05, 1., n)
+    rd, rf = rng.uniform(-.01, .1, n), rng.uniform(-.01, .1, n)
+    fwd = spot * numpy.exp((rd - rf) * texp)
+    strike = fwd * numpy.exp(rng.uniform(-4., 4., n) * vol * numpy.sqrt(texp))
+    return rng.rand(n) < .5, spot, strike, texp, vol, rd, rf
+
+def test_greeks():
+    '''Put-call parity, and delta and vega against finite differences'''
+    is_call, spot, strike, texp, vol, rd, rf = random_options()
+    calls, puts = opt_price(True, spot, strike, texp, vol, rd, rf), opt_price(False, spot, strike, texp, vol, rd, rf)
+    assert numpy.allclose(calls - puts, spot * numpy.exp(-rf * texp) - strike * numpy.exp(-rd * texp), rtol=1e-14,
+                          atol=1e-14)
+
+    h = 1e-5
+    delta = (opt_price(is_call, spot + h, strike, texp, vol, rd, rf) -
+             opt_price(is_call, spot - h, strike, texp, vol, rd, rf)) / (2 * h)
+    assert numpy.allclose(opt_delta(is_call, spot, strike, texp, vol, rd, rf), delta, rtol=0., atol=1e-7)
+    vega = (opt_price(is_call, spot, strike, texp, vol + h, rd, rf) -
+            opt_price(is_call, spot, strike, texp, vol - h, rd, rf)) / (2 * h)
+    assert numpy.allclose(opt_vega(is_call, spot, strike, texp, vol, rd, rf), vega, rtol=0., atol=1e-7)
+
+def test_imp_vol():
+    '''Implied vols of calls and puts, in and out of the money, recover the vols they were priced with'''
+    is_call, spot, strike, texp, vol, rd, rf = random_options()
+    prices = opt_price(is_call, spot, strike, texp, vol, rd, rf)
+    vols = imp_vol(is_call, spot, strike, texp, prices, rd, rf)
+
+    # deep in the money prices carry too little time value to recover the vol from
+    fwd = spot * numpy.exp((rd - rf) * texp)
+    otm = numpy.where(is_call, strike >= fwd, strike <= fwd)
+    assert numpy.allclose(vols[otm], vol[otm], rtol=1e-8, atol=0.)
+    repriced = opt_price(is_call, spot, strike, texp, vols, rd, rf)
+    found = ~numpy.isnan(vols)
+    assert numpy.allclose(repriced[found], prices[found], rtol=0., atol=1e-12 * strike[found])
+
+    # prices outside the no-arbitrage bounds have no implied vol
+    assert numpy.isnan(imp_vol(True, 1., 1.1, 1., [0., 1., 2.], 0., 0.)).all()
+    assert numpy.isnan(imp_vol(False, 1., .9, 1., .95, 0., 0.))
+
+if __name__=='__main__':
+    test_greeks()
+    test_imp_vol()
@@ -0,0 +1,57 @@
+"""
+Author: Weiyi Chen
+Copyright: Copyright (C) 2015 Baruch College, Modeling and Market Making in FX - All Rights Reserved
+Description: Test for calibration.py
+"""
+
+import numpy
+from calibration import smile_quotes, merton_smile, merton_quotes, calibrate_smile, calibrate_surface
+
+def test_calibrate_smile():
+    '''A smile quoted off the Merton model is fitted back to its quotes, and to its parameters'''
+    params, texp = numpy.array([.08, 3., -.04, .03]), .25
+    quotes = merton_quotes(params, texp)
+
+    # the quotes reproduce the model's vols at their own delta strikes
+    strikes, vols = smile_quotes(*quotes, texp=texp)
+    assert numpy.allclose(merton_smile(params, strikes, texp), vols, rtol=0., atol=1e-12)
+    assert quotes[1] < 0 and quotes[3] > 0
+
+    fit, error = calibrate_smile(*quotes, texp=texp)
+    assert error < 1e-8
+    assert numpy.allclose(fit, params, rtol=1e-3)
+
+    # started from the answer the fit stays there
+    warm, error = calibrate_smile(*quotes, texp=texp, guess=fit)
+    assert error < 1e-8 and numpy.allclose(warm, fit, rtol=1e-6)
+
+    # started elsewhere and left free it finds the cold start's fit, while a stiffness holds it back near the guess
+    guess = params * numpy.array([1.1, .7, 1.2, .8])
+    warm, error = calibrate_smile(*quotes, texp=texp, guess=guess)
+    assert error < 1e-8 and numpy.allclose(warm, fit, rtol=1e-4)
+    held, held_error = calibrate_smile(*quotes, texp=texp, guess=guess, stiffness=1e-2)
+    assert held_error > error
+
+def test_calibrate_surface():
+    '''Pairs fitted in worker processes match the serial fit, tenor by tenor'''
+    texps = numpy.array([1 / 12., .5, 1.])
+    truth = [numpy.array([.1, .5, .08, .05]), numpy.array([.07, 2., -.03, .02])]
+    quotes = numpy.array([[merton_quotes(params, texp) for texp in texps] for params in truth])
+
+    params, errors = calibrate_surface(quotes, texps)
+    assert params.shape == (2, 3, 4) and errors.max() < 1e-6
+    for i in range(2):
+        for j, texp in enumerate(texps):
+            strikes, vols = smile_quotes(*quotes[i, j], texp=texp)
+            assert numpy.allclose(merton_smile(params[i, j], strikes, texp), vols, atol=1e-6)
+
+    parallel, parallel_errors = calibrate_surface(quotes, texps, processes=2)
+    assert numpy.array_equal(parallel, params) and numpy.array_equal(parallel_errors, errors)
+
+    # the next day, started from the last fit
+    warm, warm_errors = calibrate_surface(quotes, texps, guesses=params)
+    assert warm_errors.max() < 1e-6 and numpy.allclose(warm, params, rtol=1e-6)
+
+if __name__=='__main__':
+    test_calibrate_smile()
+    test_calibrate_surface()
@@ -0,0 +1,72 @@
+"""
+Author: Weiyi Chen
+Copyright: Copyright (C) 2015 Baruch College, Modeling and Market Making in FX - All Rights Reserved
+Description: Test for merton.py
+"""
+
+import math
+import numpy
+import scipy.stats as stats
+from merton import opt_price_merton_charfn, opt_prices_merton_cos, opt_prices_merton_condexp, imp_vols_merton_cos, \
+    imp_vols_merton_condexp
+
+CASES = [
+    # spot, texp, vol, rd, rf, jump_freq, jump_mean, jump_sd
+    (1., .5, .08, .05, .05 - 2 * math.log(1.03), 3., -.04, 0.),
+    (1.3, .1, .1, .02, .01, 1., -.05, .1),
+    (100., 2., .2, .01, .03, .5, .1, .2),
+]
+
+def test_cos_vs_quad():
+    '''The COS strike grid reproduces the quadrature pricer, strike by strike'''
+    for spot, texp, vol, rd, rf, jump_freq, jump_mean, jump_sd in CASES:
+        fwd = spot * math.exp((rd - rf) * texp)
+        strikes = fwd * numpy.exp(numpy.linspace(-3, 3, 21) * vol * math.sqrt(texp))
+        is_call = strikes >= fwd
+        prices = opt_prices_merton_cos(is_call, spot, strikes, texp, vol, rd, rf, jump_freq, jump_mean, jump_sd)
+        for strike, call, price in zip(strikes, is_call, prices):
+            quad = opt_price_merton_charfn(call, spot, strike, texp, vol, rd, rf, jump_freq, jump_mean, jump_sd)
+            assert abs(price - quad) < 1e-9 * spot
+
+        # fewer terms converge to the same prices, and calls and puts satisfy put-call parity
+        coarse = opt_prices_merton_cos(is_call, spot, strikes, texp, vol, rd, rf, jump_freq, jump_mean, jump_sd,
+                                       n_terms=128)
+        assert numpy.allclose(coarse, prices, rtol=0., atol=1e-9 * spot)
+        calls = opt_prices_merton_cos(True, spot, strikes, texp, vol, rd, rf, jump_freq, jump_mean, jump_sd)
+        puts = opt_prices_merton_cos(False, spot, strikes, texp, vol, rd, rf, jump_freq, jump_mean, jump_sd)
+        assert numpy.allclose(calls - puts, math.exp(-rd * texp) * (fwd - strikes), rtol=0., atol=1e-12 * spot)
+
+def test_condexp():
+    '''Conditioning on the number of jumps gives the same prices and implied vols as the characteristic function'''
+    for spot, texp, vol, rd, rf, jump_freq, jump_mean, jump_sd in CASES:
+        fwd = spot * math.exp((rd - rf) * texp)
+        strikes = fwd * numpy.exp(numpy.linspace(-3, 3, 21) * vol * math.sqrt(texp))
+        for is_call in [True, False]:
+            prices = opt_prices_merton_condexp(is_call, spot, strikes, texp, vol, rd, rf, jump_freq, jump_mean,
+                                               jump_sd)
+            cos = opt_prices_merton_cos(is_call, spot, strikes, texp, vol, rd, rf, jump_freq, jump_mean, jump_sd)
+            assert numpy.allclose(prices, cos, rtol=0., atol=1e-11 * spot)
+        vols = imp_vols_merton_condexp(spot, strikes, texp, vol, rd, rf, jump_freq, jump_mean, jump_sd)
+        assert numpy.allclose(vols, imp_vols_merton_cos(spot, strikes, texp, vol, rd, rf, jump_freq, jump_mean,
+                                                        jump_sd), rtol=1e-8)
+
+    # a downward jump skews the smile: out of the money puts above out of the money calls
+    spot, texp, vol, rd, rf, jump_freq, jump_mean, jump_sd = CASES[0]
+    vols = imp_vols_merton_condexp(spot, [.95, 1.12], texp, vol, rd, rf, jump_freq, jump_mean, jump_sd)
+    assert vols[0] > vols[1] > vol
+
+def test_no_jumps():
+    '''Without jumps the prices are Black-Scholes'''
+    spot, texp, vol, rd, rf = 1.2, .75, .15, .03, .01
+    fwd = spot * math.exp((rd - rf) * texp)
+    strikes = numpy.linspace(.8, 1.6, 17)
+    d1 = numpy.log(fwd / strikes) / (vol * math.sqrt(texp)) + vol * math.sqrt(texp) / 2.
+    d2 = d1 - vol * math.sqrt(texp)
+    calls = math.exp(-rd * texp) * (fwd * stats.norm.cdf(d1) - strikes * stats.norm.cdf(d2))
+    assert numpy.allclose(opt_prices_merton_cos(True, spot, strikes, texp, vol, rd, rf, 0., 0., 0.), calls,
+                          rtol=0., atol=1e-12)
+
+if __name__=='__main__':
+    test_cos_vs_quad()
+    test_condexp()
+    test_no_jumps()
@@ -0,0 +1,194 @@
+"""
+Author: Weiyi Chen
+Copyright: Copyright (C) 2015 Baruch College, Modeling and Market Making in FX - All Rights Reserved
+Description: Two-asset options under a Gaussian copula of two USD pairs with no smile: a cross-pair option with its
+             analytic correlation delta and gamma and its vegas to the two USD pair vols, and a dual digital option
+             priced from the two single-asset digitals. The inputs of both can be arrays, to price and risk a whole
+             book of cross options, or a grid of (Price(1), Price(2), Rho), in one evaluation.
+Test: test_copula.py
+"""
+
+# 3rd party imports
+import numpy
+import scipy.stats as stats
+
+# local imports
+import bivariate
+import graph
+
+
+def opt_price(is_call, spot, strike, texp, vol, rd, rf):
+    ''' Black-Scholes price of a European call or put, with continuously compounded rates rd and rf, over arrays '''
+    fwd = spot * numpy.exp((rd - rf) * texp)
+    stdev = vol * numpy.sqrt(texp)
+    d1 = numpy.log(fwd / strike) / stdev + stdev / 2.
+    d2 = d1 - stdev
+    sign = numpy.where(is_call, 1., -1.)
+    return numpy.exp(-rd * texp) * sign * (fwd * stats.norm.cdf(sign * d1) - strike * stats.norm.cdf(sign * d2))
+
+
+class CorrOption(graph.Object):
+    ''' An out of the money option on the cross pair Spot1/Spot2, whose Black-Scholes implied volatility is
+    sqrt(Vol1^2 + Vol2^2 - 2 Rho Vol1 Vol2), with zero interest rates; the inputs can be arrays of a book of options '''
+
+    @graph.settable
+    def Spot1(self):
+        return 1.
+
+    @graph.settable
+    def Spot2(self):
+        return 1.
+
+    @graph.settable
+    def Vol1(self):
+        return .1
+
+    @graph.settable
+    def Vol2(self):
+        return .2
+
+    @graph.settable
+    def Rho(self):
+        return .25
+
+    @graph.settable
+    def StrikeX(self):
+        return 1.
+
+    @graph.settable
+    def Texp(self):
+        return .5
+
+    @graph.settable
+    def Rho_eps(self):
+        ''' correlation bump of the bumped cross volatilities and prices '''
+        return 1e-4
+
+    @graph.node
+    def VolX(self, key):
+        ''' cross pair volatility at the correlation, key 'mid', or bumped 'up' or 'down' by Rho_eps '''
+        if key == 'mid':
+            rho = self.Rho()
+        elif key == 'up':
+            rho = self.Rho() + self.Rho_eps()
+        elif key == 'down':
+            rho = self.Rho() - self.Rho_eps()
+        else:
+            raise ValueError("VolX key can only be 'mid', 'up' or 'down'")
+        return numpy.sqrt(self.Vol1()**2 + self.Vol2()**2 - 2 * rho * self.Vol1() * self.Vol2())
+
+    @graph.node
+    def SpotX(self):
+        ''' the cross pair spot '''
+        return self.Spot1() / self.Spot2()
+
+    @graph.node
+    def OptX(self, key):
+        ''' price of the cross option at VolX(key): a call when struck above the cross spot, otherwise a put '''
+        return opt_price(self.StrikeX() >= self.SpotX(), self.SpotX(), self.StrikeX(), self.Texp(), self.VolX(key),
+                         0., 0.)
+
+    @graph.node
+    def D1(self):
+        ''' Black-Scholes d1 of the cross option at VolX('mid') '''
+        stdev = self.VolX('mid') * numpy.sqrt(self.Texp())
+        return numpy.log(self.SpotX() / self.StrikeX()) / stdev + stdev / 2.
+
+    @graph.node
+    def VegaX(self):
+        ''' derivative of the cross option price with respect to VolX, the same for the call and the put '''
+        return self.SpotX() * stats.norm.pdf(self.D1()) * numpy.sqrt(self.Texp())
+
+    @graph.node
+    def VolgaX(self):
+        ''' second derivative of the cross option price with respect to VolX '''
+        volx = self.VolX('mid')
+        return self.VegaX() * self.D1() * (self.D1() - volx * numpy.sqrt(self.Texp())) / volx
+
+    @graph.node
+    def Delta(self):
+        ''' derivative of the cross option price with respect to the correlation, through dVolX/dRho '''
+        return -self.VegaX() * self.Vol1() * self.Vol2() / self.VolX('mid')
+
+    @graph.node
+    def Gamma(self):
+        '''
+        second derivative of the cross option price with respect to the correlation, Vega d2VolX/dRho2 + Volga
+        (dVolX/dRho)^2, where dVolX/dRho = -Vol1 Vol2 / VolX and d2VolX/dRho2 = -(Vol1 Vol2)^2 / VolX^3
+        '''
+        volx, v12 = self.VolX('mid'), self.Vol1() * self.Vol2()
+        return -self.VegaX() * v12**2 / volx**3 + self.VolgaX() * (v12 / volx)**2
+
+    @graph.node
+    def FdGamma(self):
+        ''' Gamma by central differences of the price at the correlation bumped by Rho_eps '''
+        return (self.OptX('up') + self.OptX('down') - 2 * self.OptX('mid')) / self.Rho_eps()**2
+
+    @graph.node
+    def Vega(self, key):
+        ''' derivative of the cross option price with respect to the vol of pair key (1 or 2) '''
+        if key == 1:
+            own, other = self.Vol1(), self.Vol2()
+        elif key == 2:
+            own, other = self.Vol2(), self.Vol1()
+        else:
+            raise ValueError('Vega key can only be 1 or 2')
+        return self.VegaX() * (own - self.Rho() * other) / self.VolX('mid')
+
+
+class DualDigital(graph.Object):
+    ''' A dual digital paying $1 when both pairs finish above (or, for puts, both below) their strikes, priced from the
+    two single-asset digitals with a Gaussian copula; discount rates are zero '''
+
+    @graph.settable
+    def IsCall(self):
+        return True
+
+    @graph.settable
+    def Price(self, key):
+        ''' price of the single-asset digital on pair key (1 or 2) '''
+        if key == 1:
+            return .65
+        elif key == 2:
+            return .3
+        raise ValueError('Price key can only be 1 or 2')
+
+    @graph.settable
+    def Rho(self):
+        return 0.
+
+    @graph.node
+    def F(self, key):
+        ''' probability that pair key finishes below its strike '''
+        return numpy.where(self.IsCall(), 1 - self.Price(key), self.Price(key))
+
+    @graph.node
+    def X(self, key):
+        ''' strike of pair key as a standard normal variable of the copula '''
+        return stats.norm.ppf(self.F(key))
+
+    @graph.node
+    def Limit(self, key):
+        ''' upper limit of the copula variable of pair key in the probability of the payoff '''
+        return numpy.where(self.IsCall(), -1., 1.) * self.X(key)
+
+    @graph.node
+    def DualDigi(self):
+        ''' price of the dual digital '''
+        return bivariate.bvn_cdf(self.Limit(1), self.Limit(2), self.Rho())
+
+    @graph.node
+    def RhoDelta(self):
+        ''' derivative of the price with respect to the correlation: the copula density at the limits '''
+        return bivariate.bvn_pdf(self.Limit(1), self.Limit(2), self.Rho())
+
+    @graph.node
+    def PriceDelta(self, key):
+        '''
+        derivative of the price with respect to the single-asset digital on pair key: the probability of the other
+        pair paying given this one at its strike
+        '''
+        if key not in (1, 2):
+            raise ValueError('PriceDelta key can only be 1 or 2')
+        own, other = self.Limit(key), self.Limit(3 - key)
+        return stats.norm.cdf((other - self.Rho() * own) / numpy.sqrt(1. - self.Rho()**2))
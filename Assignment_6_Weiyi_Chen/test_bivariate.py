@@ -0,0 +1,45 @@
+"""
+Author: Weiyi Chen
+Copyright: Copyright (C) 2015 Baruch College, Modeling and Market Making in FX - All Rights Reserved
+Description: Test for bivariate.py
+"""
+
+import math
+import numpy
+import scipy.integrate as integrate
+from scipy.special import ndtr
+from bivariate import bvn_cdf, bvn_pdf
+
+def reference(h, k, rho):
+    ''' P(X < h, Y < k) by quadrature of the conditional distribution of Y given X '''
+    s = math.sqrt(1. - rho * rho)
+    density = lambda x: math.exp(-x * x / 2.) / math.sqrt(2. * math.pi) * ndtr((k - rho * x) / s)
+    return integrate.quad(density, -40., h, epsabs=1e-15, epsrel=1e-13, limit=500)[0]
+
+def test_cdf():
+    '''Agrees with quadrature for moderate and extreme correlations, and with the limiting cases'''
+    rng = numpy.random.RandomState(0)
+    h, k = rng.uniform(-4., 4., 200), rng.uniform(-4., 4., 200)
+    rho = numpy.concatenate([rng.uniform(-.925, .925, 100), rng.uniform(.925, .99999, 100) * rng.choice([-1, 1], 100)])
+    # near the diagonal, where strong correlations put the mass
+    k[150:] = numpy.sign(rho[150:]) * (h[150:] + rng.normal(0., .05, 50))
+    cdf = bvn_cdf(h, k, rho)
+    assert numpy.allclose(cdf, [reference(*args) for args in zip(h, k, rho)], rtol=0., atol=1e-12)
+
+    assert numpy.allclose(bvn_cdf(h, k, 0.), ndtr(h) * ndtr(k), rtol=0., atol=1e-15)
+    assert numpy.allclose(bvn_cdf(h, k, 1.), ndtr(numpy.minimum(h, k)), rtol=0., atol=1e-15)
+    assert numpy.allclose(bvn_cdf(h, k, -1.), numpy.maximum(ndtr(h) + ndtr(k) - 1., 0.), rtol=0., atol=1e-15)
+    assert numpy.allclose(bvn_cdf([numpy.inf, -numpy.inf, 1.], [.5, 1., numpy.inf], .3), [ndtr(.5), 0., ndtr(1.)])
+    assert isinstance(bvn_cdf(0., 0., .5), float) and abs(bvn_cdf(0., 0., .5) - 1. / 3.) < 1e-15
+
+def test_pdf():
+    '''The density is the derivative of the distribution function in the correlation'''
+    rng = numpy.random.RandomState(1)
+    h, k, rho = rng.uniform(-3., 3., 100), rng.uniform(-3., 3., 100), rng.uniform(-.99, .99, 100)
+    eps = 1e-6
+    derivative = (bvn_cdf(h, k, rho + eps) - bvn_cdf(h, k, rho - eps)) / (2 * eps)
+    assert numpy.allclose(bvn_pdf(h, k, rho), derivative, rtol=1e-6, atol=1e-9)
+
+if __name__=='__main__':
+    test_cdf()
+    test_pdf()
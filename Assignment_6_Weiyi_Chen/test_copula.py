@@ -0,0 +1,128 @@
+"""
+Author: Weiyi Chen
+Copyright: Copyright (C) 2015 Baruch College, Modeling and Market Making in FX - All Rights Reserved
+Description: Test for copula.py
+"""
+
+import math
+import numpy
+import scipy.stats as stats
+from copula import CorrOption, DualDigital
+
+def test_corr_gamma():
+    '''The analytic and finite difference correlation gammas match the chain rule through the cross volatility'''
+    opt = CorrOption()
+    v1, v2 = opt.Vol1(), opt.Vol2()
+    # the notebook's pair vols
+    assert (v1, v2) == (.1, .2)
+    for strike in [.8, .9, 1., 1.1, 1.25]:
+        opt.StrikeX.set(strike)
+        volx, texp = opt.VolX('mid'), opt.Texp()
+        d1 = math.log(1. / strike) / (volx * math.sqrt(texp)) + volx * math.sqrt(texp) / 2.
+        vega = stats.norm.pdf(d1) * math.sqrt(texp)
+        volga = vega * d1 * (d1 - volx * math.sqrt(texp)) / volx
+        dvol, d2vol = -v1 * v2 / volx, -(v1 * v2)**2 / volx**3
+        assert abs(opt.FdGamma() - (vega * d2vol + volga * dvol**2)) < 1e-3 * abs(vega * d2vol)
+        assert abs(opt.Gamma() - (vega * d2vol + volga * dvol**2)) < 1e-12
+
+    # negative at the money, positive far out of the money
+    opt.StrikeX.set(1.)
+    assert opt.Gamma() < 0
+    opt.StrikeX.set(1.25)
+    assert opt.Gamma() > 0
+
+def test_corr_option_book():
+    '''A book of cross options prices as the options one at a time, with greeks matching finite differences'''
+    rng = numpy.random.RandomState(0)
+    n = 1000
+    spot1, spot2 = rng.uniform(.5, 2., n), rng.uniform(50., 150., n)
+    vol1, vol2, rho, texp = rng.uniform(.05, .3, n), rng.uniform(.05, .3, n), rng.uniform(-.9, .9, n), \
+        rng.uniform(.05, 2., n)
+    strike = spot1 / spot2 * numpy.exp(rng.uniform(-2., 2., n) * .1 * numpy.sqrt(texp))
+    book = CorrOption()
+    for node, value in [(book.Spot1, spot1), (book.Spot2, spot2), (book.Vol1, vol1), (book.Vol2, vol2),
+                        (book.Rho, rho), (book.StrikeX, strike), (book.Texp, texp)]:
+        node.set(value)
+    prices = book.OptX('mid')
+    assert prices.shape == (n,) and (prices > 0).all()
+
+    opt = CorrOption()
+    for i in range(0, n, 97):
+        for node, value in [(opt.Spot1, spot1), (opt.Spot2, spot2), (opt.Vol1, vol1), (opt.Vol2, vol2),
+                            (opt.Rho, rho), (opt.StrikeX, strike), (opt.Texp, texp)]:
+            node.set(value[i])
+        assert abs(opt.OptX('mid') - prices[i]) < 1e-15
+        assert abs(opt.Gamma() - book.Gamma()[i]) < 1e-15
+
+    eps = 1e-5
+    for node, value, delta, scale in [(book.Rho, rho, book.Delta(), vol1 * vol2 / book.VolX('mid')),
+                                      (book.Vol1, vol1, book.Vega(1), 1.), (book.Vol2, vol2, book.Vega(2), 1.)]:
+        with node.tweak(value + eps):
+            up = book.OptX('mid')
+        with node.tweak(value - eps):
+            down = book.OptX('mid')
+        assert numpy.allclose(delta, (up - down) / (2 * eps), rtol=1e-6, atol=1e-10 * scale * book.SpotX())
+    with book.Rho.tweak(rho + eps):
+        up = book.Delta()
+    with book.Rho.tweak(rho - eps):
+        down = book.Delta()
+    assert numpy.allclose(book.Gamma(), (up - down) / (2 * eps), rtol=1e-6, atol=1e-10 * book.SpotX())
+
+def test_dual_digital():
+    '''The dual digital goes from the lower to the upper Frechet bound as the correlation goes from -1 to 1'''
+    dd = DualDigital()
+    p1, p2 = dd.Price(1), dd.Price(2)
+    prices = []
+    for rho in [-1., -.5, 0., .5, 1.]:
+        dd.Rho.set(rho)
+        prices.append(dd.DualDigi())
+    assert abs(prices[0] - max(p1 + p2 - 1, 0.)) < 1e-6
+    assert abs(prices[2] - p1 * p2) < 1e-6
+    assert abs(prices[-1] - min(p1, p2)) < 1e-6
+    assert all(a < b for a, b in zip(prices[:-1], prices[1:]))
+
+    # both below is one minus either above, and either above is the two digitals less both above
+    put = DualDigital()
+    put.IsCall.set(False)
+    put.Price.set(1, 1 - p1)
+    put.Price.set(2, 1 - p2)
+    put.Rho.set(.5)
+    dd.Rho.set(.5)
+    assert abs(put.DualDigi() - (1 - p1 - p2 + dd.DualDigi())) < 1e-6
+
+def test_dual_digital_grid():
+    '''A grid of inputs prices as the points one at a time, with the correlation and price deltas of the prices'''
+    rng = numpy.random.RandomState(0)
+    p1, p2, rho = rng.uniform(.05, .95, 1000), rng.uniform(.05, .95, 1000), rng.uniform(-.95, .95, 1000)
+    for is_call in [True, False]:
+        grid = DualDigital()
+        grid.IsCall.set(is_call)
+        grid.Price.set(1, p1)
+        grid.Price.set(2, p2)
+        grid.Rho.set(rho)
+        prices = grid.DualDigi()
+        assert prices.shape == (1000,)
+
+        dd = DualDigital()
+        dd.IsCall.set(is_call)
+        for i in range(0, 1000, 97):
+            dd.Price.set(1, p1[i])
+            dd.Price.set(2, p2[i])
+            dd.Rho.set(rho[i])
+            assert abs(dd.DualDigi() - prices[i]) < 1e-12
+
+        eps = 1e-6
+        for node, key, value, delta in [(grid.Rho, (), rho, grid.RhoDelta()),
+                                        (grid.Price, (1,), p1, grid.PriceDelta(1)),
+                                        (grid.Price, (2,), p2, grid.PriceDelta(2))]:
+            with node.tweak(*(key + (value + eps,))):
+                up = grid.DualDigi()
+            with node.tweak(*(key + (value - eps,))):
+                down = grid.DualDigi()
+            assert numpy.allclose(delta, (up - down) / (2 * eps), rtol=1e-5, atol=1e-7)
+
+if __name__=="__main__":
+    test_corr_gamma()
+    test_corr_option_book()
+    test_dual_digital()
+    test_dual_digital_grid()
@@ -0,0 +1,296 @@
+"""
+Author: Weiyi Chen
+Copyright: Copyright (C) 2015 Baruch College, Modeling and Market Making in FX - All Rights Reserved
+Description: Benchmarks of the assignments' engines - Simulator.simulate, a PortfolioSimulator book, the Hedger
+             tenor x strategy grid, VolSpliner fit and evaluation, the Merton pricers and the implied correlation
+             analytics of a vol history - as throughputs (paths, smiles, strikes, prices or dates per second). The
+             results are written as JSON and compared with stored baselines: a case slower than its baseline by more
+             than the tolerance is a regression, and makes the run fail.
+Run: python3 benchmark.py [case filters] [--quick] [--output results.json] [--update]
+Test: test_benchmark.py
+"""
+
+# python imports
+import argparse
+import collections
+import datetime
+import functools
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+
+# 3rd party imports
+import numpy
+import pandas
+
+# the assignments import their modules from their own folders, and the modules they share from the common one
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder in ['common', 'Assignment_1_Weiyi_Chen', 'Assignment_2_Weiyi_Chen', 'Assignment_3_Weiyi_Chen',
+               'Assignment_4_Weiyi_Chen', 'Assignment_5_Weiyi_Chen']:
+    sys.path.insert(0, os.path.join(ROOT, folder))
+
+# local imports
+from dailycorr import DailyImpliedCorr
+from hedger import Hedger
+from impliedcorr import impliedCorr_cube
+from merton import opt_price_merton_charfn, opt_prices_merton_condexp, opt_prices_merton_cos
+from portfolio import PortfolioSimulator
+from simulator import Simulator
+from voldata import VolData
+from volspliner import VolSpliner, fit_smiles, spline_values
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+SPREADSHEET = os.path.join(ROOT, 'Assignment_4_Weiyi_Chen', 'fx_vol_data.xlsx')
+
+# a benchmark: run() does one unit of work of items items, counted in unit (like 'paths/s')
+Case = collections.namedtuple('Case', ['name', 'run', 'items', 'unit'])
+
+
+def simulator_cases(quick):
+    ''' Simulator.simulate with the stepped, in-place kernel and event driven engines, as NRuns grows '''
+    for engine in ['stepped', 'kernel', 'event']:
+        for nruns in ([200, 1000] if quick else [1000, 10000, 50000]):
+            def run(engine=engine, nruns=nruns):
+                s = Simulator()
+                s.Engine, s.NRuns = engine, nruns
+                s.simulate()
+            yield Case('simulator.simulate[%s,NRuns=%d]' % (engine, nruns), run, nruns, 'paths/s')
+
+def portfolio_cases(quick):
+    '''
+    PortfolioSimulator.simulate of a book of 20 pairs like Simulator's, at a flat .5 correlation, on the stepped and
+    event driven engines: its rate in pair paths per second compares with the single pair engines' paths per second
+    '''
+    npairs, nruns = 20, 200 if quick else 10000
+    for engine in ['stepped', 'event']:
+        def run(engine=engine):
+            s, p = Simulator(), PortfolioSimulator()
+            p.Engine, p.NRuns = engine, nruns
+            p.Pairs = ['Pair%d' % i for i in range(npairs)]
+            p.Spot = numpy.ones((npairs, 1))
+            for name in ['Vol', 'Lambda', 'SpreadClient', 'SpreadDealer', 'DeltaLimit']:
+                setattr(p, name, numpy.full((npairs, 1), float(getattr(s, name))))
+            p.Correlation = .5 * numpy.eye(npairs) + .5
+            p.simulate()
+        yield Case('portfolio.simulate[%s,Pairs=%d,NRuns=%d]' % (engine, npairs, nruns), run, npairs * nruns,
+                   'pair paths/s')
+
+def hedger_cases(quick):
+    ''' the PNL standard deviations of the tenor x strategy grid, drawing the shocks afresh each time '''
+    nruns = 1e4 if quick else 1e5
+    tenors = [.1, .25, .5, .75, 1., 2.]
+
+    def run():
+        h = Hedger()
+        h.Nruns = nruns
+        h.PNL_std_grid(tenors)
+    yield Case('hedger.PNL_std_grid[Nruns=%d]' % nruns, run, int(nruns) * len(tenors) * 3, 'path cells/s')
+
+def volspliner_cases(quick):
+    ''' batch fits of random smiles, and evaluation of one smile and of a batch over arrays of strikes '''
+    n = 1000 if quick else 10000
+    rng = numpy.random.RandomState(0)
+    quotes = [.08 + rng.uniform(-.02, .02, n), rng.uniform(-.02, .02, n), rng.uniform(-.03, .03, n),
+              rng.uniform(0, .005, n), rng.uniform(.003, .01, n), rng.uniform(.05, 2, n), rng.uniform(.1, 10, n)]
+    yield Case('volspliner.fit_smiles[%d]' % n, lambda: fit_smiles(*quotes), n, 'smiles/s')
+
+    sp = VolSpliner()
+    sp.Extrap_fact = 1.
+    strikes = numpy.linspace(sp.StrikeMin * .9, sp.StrikeMax * 1.1, 10 * n)
+    yield Case('volspliner.smile[%d]' % strikes.size, lambda: sp.smile(strikes), strikes.size, 'strikes/s')
+
+    coefficients = fit_smiles(*quotes)
+    batch = VolSpliner()
+    batch.ATM, batch.Rr25, batch.Rr10, batch.Bf25, batch.Bf10, batch.Texp, batch.Extrap_fact = quotes
+    knots = numpy.stack(numpy.broadcast_arrays(*batch.AllStrikes), axis=-1)
+    grid = knots[:, :1] + (knots[:, 6:] - knots[:, :1]) * numpy.linspace(-.1, 1.1, 10)
+    yield Case('volspliner.spline_values[%dx10]' % n, lambda: spline_values(coefficients, knots, grid), grid.size,
+               'strikes/s')
+
+def merton_cases(quick):
+    ''' the Merton pricers on a strike grid of question 4's model: quadrature per strike, and the grid pricers '''
+    spot, texp, vol, rd, rf, jump_freq, jump_mean, jump_sd = 1., .5, .08, .05, .05 - 2 * numpy.log(1.03), 3., -.04, .03
+    fwd = spot * numpy.exp((rd - rf) * texp)
+    nquad, ngrid = (5, 100) if quick else (20, 1000)
+    strikes = fwd * numpy.exp(numpy.linspace(-3., 3., ngrid) * vol * numpy.sqrt(texp))
+    quad_strikes = strikes[::ngrid // nquad]
+
+    def charfn():
+        for strike in quad_strikes:
+            opt_price_merton_charfn(strike >= fwd, spot, strike, texp, vol, rd, rf, jump_freq, jump_mean, jump_sd)
+    yield Case('merton.charfn[%d]' % len(quad_strikes), charfn, len(quad_strikes), 'prices/s')
+    for name, pricer in [('condexp', opt_prices_merton_condexp), ('cos', opt_prices_merton_cos)]:
+        def run(pricer=pricer):
+            pricer(strikes >= fwd, spot, strikes, texp, vol, rd, rf, jump_freq, jump_mean, jump_sd)
+        yield Case('merton.%s[%d]' % (name, ngrid), run, ngrid, 'prices/s')
+
+def write_vol_history(path, periods=1622, seed=0):
+    '''
+    a csv of vols shaped like fx_vol_data.xlsx - the AUDUSD, USDJPY and AUDJPY triangle at 1w, 1m, 6m and 1y over 1622
+    business days - with random walk USD pair vols and a cross vol from a wandering implied correlation
+    '''
+    rng = numpy.random.RandomState(seed)
+    columns = {'Date': pandas.bdate_range('2007-01-01', periods=periods)}
+    for tenor, level in [('1w', 12.), ('1m', 11.), ('6m', 10.5), ('1y', 10.)]:
+        vol1 = level * numpy.exp(numpy.cumsum(rng.standard_normal(periods)) * .02)
+        vol2 = level * numpy.exp(numpy.cumsum(rng.standard_normal(periods)) * .02)
+        corr = numpy.tanh(.5 + numpy.cumsum(rng.standard_normal(periods)) * .02)
+        columns['AUDUSD ' + tenor], columns['USDJPY ' + tenor] = vol1, vol2
+        columns['AUDJPY ' + tenor] = numpy.sqrt(vol1**2 + vol2**2 + 2. * corr * vol1 * vol2)
+    pandas.DataFrame(columns).to_csv(path, index=False, float_format='%.17g')
+
+def vol_history(folder, periods):
+    '''
+    a VolData of a vol history of at least periods dates, its source and cache in folder: a copy of fx_vol_data.xlsx
+    when it can be read and is long enough, else the synthetic history of write_vol_history
+    '''
+    data = VolData()
+    data.Path = os.path.join(folder, os.path.basename(SPREADSHEET))
+    try:
+        shutil.copy(SPREADSHEET, data.Path)
+        if len(data.Dates) >= periods:
+            return data
+    except (IOError, ImportError, KeyError, ValueError, zipfile.BadZipFile):
+        # no spreadsheet, no excel reader or a broken workbook
+        pass
+    data = VolData()
+    data.Path = os.path.join(folder, 'vols.csv')
+    write_vol_history(data.Path, periods)
+    return data
+
+def impliedcorr_cases(quick):
+    '''
+    the implied correlation cube of every triangle and tenor of a vol history (see vol_history), read through VolData's
+    columnar cache, and its daily update. The history is set up in a temporary folder by the first run of a case, the
+    warm up one, so that a filtered out case costs nothing, and the folder is removed once the cases are done.
+    '''
+    periods = 250 if quick else 1622
+    with tempfile.TemporaryDirectory() as folder:
+        @functools.lru_cache(maxsize=None)
+        def history():
+            ''' the path, dates and (dates x columns) values of the history, parsed into its cache once '''
+            data = vol_history(folder, periods)
+            return data.Path, data.Columns, data.Dates[:periods], numpy.ascontiguousarray(data.Values[:, :periods].T)
+
+        def cube():
+            path, _, dates, _ = history()
+            impliedCorr_cube(dates[0], dates[-1], path)
+        yield Case('impliedcorr.cube[%d]' % periods, cube, periods, 'dates/s')
+
+        def daily():
+            _, columns, dates, values = history()
+            corr = DailyImpliedCorr()
+            corr.Columns = columns
+            corr.extend(dates, values)
+            corr.Stats
+        yield Case('dailycorr.extend[%d]' % periods, daily, periods, 'dates/s')
+
+GENERATORS = [simulator_cases, portfolio_cases, hedger_cases, volspliner_cases, merton_cases, impliedcorr_cases]
+
+
+def measure(run, repeat=3, min_time=.2):
+    '''
+    seconds one call of run takes: the best of repeat timings, each of enough calls to last min_time, after a first
+    call to warm up
+    '''
+    run()
+    number, elapsed = 1, 0.
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            run()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number = max(number + 1, int(number * 1.2 * min_time / max(elapsed, 1e-9)))
+    timings = [elapsed]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            run()
+        timings.append(time.perf_counter() - start)
+    return min(timings) / number
+
+def machine():
+    ''' what the results were measured on '''
+    return {'date': datetime.datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+            'numpy': numpy.__version__, 'platform': platform.platform(), 'processor': platform.processor(),
+            'cpus': os.cpu_count()}
+
+def run_benchmarks(filters=(), quick=False, repeat=3, min_time=.2, log=None):
+    '''
+    time every case whose name contains one of the filters (all of them without filters). Returns the results as
+    {'machine': ..., 'results': {name: {'seconds', 'rate', 'unit'}}}.
+    '''
+    results = collections.OrderedDict()
+    for generator in GENERATORS:
+        for case in generator(quick):
+            if filters and not any(f in case.name for f in filters):
+                continue
+            seconds = measure(case.run, repeat, min_time)
+            results[case.name] = {'seconds': seconds, 'rate': case.items / seconds, 'unit': case.unit}
+            if log:
+                log('%-45s %12.4g %s' % (case.name, case.items / seconds, case.unit))
+    return {'machine': machine(), 'results': results}
+
+def compare(results, baselines, tolerance=.5):
+    '''
+    each result against its baseline: the ratio of the rates (above 1 is faster) and a status, 'regression' when the
+    rate fell by more than the tolerance, 'faster' when it rose by more, 'ok' in between, and 'new' without a baseline
+    '''
+    comparisons = collections.OrderedDict()
+    for name, result in results['results'].items():
+        baseline = baselines.get('results', {}).get(name)
+        if baseline is None:
+            comparisons[name] = {'rate': result['rate'], 'baseline': None, 'ratio': None, 'status': 'new'}
+            continue
+        ratio = result['rate'] / baseline['rate']
+        status = 'regression' if ratio < 1. - tolerance else 'faster' if ratio > 1. + tolerance else 'ok'
+        comparisons[name] = {'rate': result['rate'], 'baseline': baseline['rate'], 'ratio': ratio, 'status': status}
+    return comparisons
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('filters', nargs='*', help='run only the cases whose names contain one of these')
+    parser.add_argument('--quick', action='store_true', help='smaller problem sizes, for a smoke test')
+    parser.add_argument('--repeat', type=int, default=3, help='timings per case, the best one counting')
+    parser.add_argument('--min-time', type=float, default=.2, help='seconds each timing lasts at least')
+    parser.add_argument('--output', help='write the results (and comparisons) to this JSON file')
+    parser.add_argument('--baselines', default=BASELINES, help='JSON file of the baseline results')
+    parser.add_argument('--tolerance', type=float, default=.5, help='fraction a rate can fall below its baseline')
+    parser.add_argument('--update', action='store_true', help='store the results as the new baselines')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.filters, args.quick, args.repeat, args.min_time, log=print)
+    if os.path.exists(args.baselines):
+        with open(args.baselines) as f:
+            baselines = json.load(f)
+    else:
+        baselines = {}
+    results['comparisons'] = compare(results, baselines, args.tolerance)
+
+    print()
+    print('%-45s %12s %12s %8s  %s' % ('case', 'rate', 'baseline', 'ratio', 'status'))
+    for name, c in results['comparisons'].items():
+        print('%-45s %12.4g %12s %8s  %s' % (name, c['rate'], '-' if c['baseline'] is None else '%.4g' % c['baseline'],
+                                             '-' if c['ratio'] is None else '%.2f' % c['ratio'], c['status']))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.update:
+        # merge into the stored baselines, so that a filtered run only replaces its own cases
+        merged = baselines.get('results', {})
+        merged.update(results['results'])
+        with open(args.baselines, 'w') as f:
+            json.dump({'machine': results['machine'], 'results': merged}, f, indent=2)
+        return 0
+    return 1 if any(c['status'] == 'regression' for c in results['comparisons'].values()) else 0
+
+if __name__=='__main__':
+    sys.exit(main())
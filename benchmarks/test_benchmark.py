@@ -0,0 +1,72 @@
+"""
+Author: Weiyi Chen
+Copyright: Copyright (C) 2015 Baruch College, Modeling and Market Making in FX - All Rights Reserved
+Description: Test for benchmark.py
+"""
+
+import json
+import os
+import tempfile
+import pytest
+from benchmark import compare, main, run_benchmarks, vol_history
+
+def test_compare():
+    '''Rates are compared with their baselines within the tolerance, and cases without one are new'''
+    results = {'results': {'a': {'rate': 100.}, 'b': {'rate': 40.}, 'c': {'rate': 200.}, 'd': {'rate': 1.}}}
+    baselines = {'results': {'a': {'rate': 90.}, 'b': {'rate': 100.}, 'c': {'rate': 100.}}}
+    comparisons = compare(results, baselines, tolerance=.5)
+    assert [c['status'] for c in comparisons.values()] == ['ok', 'regression', 'faster', 'new']
+    assert abs(comparisons['b']['ratio'] - .4) < 1e-15 and comparisons['d']['ratio'] is None
+    assert compare(results, {})['a']['status'] == 'new'
+
+def test_run():
+    '''A filtered quick run times its cases only, stores them as baselines, and fails against much faster ones'''
+    results = run_benchmarks(['event', 'volspliner.fit', 'merton.cos', 'corr'], quick=True, repeat=1, min_time=0.)
+    assert list(results['results']) == ['simulator.simulate[event,NRuns=200]', 'simulator.simulate[event,NRuns=1000]',
+                                        'portfolio.simulate[event,Pairs=20,NRuns=200]', 'volspliner.fit_smiles[1000]',
+                                        'merton.cos[100]', 'impliedcorr.cube[250]', 'dailycorr.extend[250]']
+    assert all(result['rate'] > 0 for result in results['results'].values())
+
+    with tempfile.TemporaryDirectory() as folder:
+        baselines, output = os.path.join(folder, 'baselines.json'), os.path.join(folder, 'results.json')
+        args = ['merton.cos', '--quick', '--repeat', '1', '--min-time', '0', '--baselines', baselines]
+        assert main(args + ['--update']) == 0
+        with open(baselines) as f:
+            stored = json.load(f)
+        assert list(stored['results']) == ['merton.cos[100]']
+
+        stored['results']['merton.cos[100]']['rate'] *= 100.
+        with open(baselines, 'w') as f:
+            json.dump(stored, f)
+        assert main(args + ['--output', output]) == 1
+        with open(output) as f:
+            assert json.load(f)['comparisons']['merton.cos[100]']['status'] == 'regression'
+
+def test_event_speedup():
+    '''The event driven simulator, with about a tenth as many events as steps, is several times faster than stepping'''
+    results = run_benchmarks(['simulate[stepped,NRuns=1000]', 'simulate[event,NRuns=1000]'], quick=True)['results']
+    event, stepped = [results['simulator.simulate[%s,NRuns=1000]' % engine]['rate'] for engine in ['event', 'stepped']]
+    speedup = event / stepped
+    assert speedup > 3., speedup
+
+def test_vol_history():
+    '''The vol history is synthetic when the spreadsheet is too short'''
+    with tempfile.TemporaryDirectory() as folder:
+        data = vol_history(folder, 2000)
+        assert data.Path == os.path.join(folder, 'vols.csv') and len(data.Dates) == 2000
+        assert data.Columns[:4] == ['AUDUSD 1w', 'USDJPY 1w', 'AUDJPY 1w', 'AUDUSD 1m']
+
+def test_vol_history_spreadsheet():
+    '''The vol history is a copy of the spreadsheet when it is long enough, which takes openpyxl to read'''
+    pytest.importorskip('openpyxl')
+    with tempfile.TemporaryDirectory() as folder:
+        data = vol_history(folder, 250)
+        assert data.Path == os.path.join(folder, 'fx_vol_data.xlsx') and len(data.Dates) == 1622
+        assert os.path.isdir(data.CacheDir)
+
+if __name__=='__main__':
+    test_compare()
+    test_run()
+    test_event_speedup()
+    test_vol_history()
+    test_vol_history_spreadsheet()
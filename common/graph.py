@@ -0,0 +1,226 @@
+"""
+Author: Weiyi Chen
+Copyright: Copyright (C) 2015 Baruch College, Modeling and Market Making in FX - All Rights Reserved
+Description: A small calculation graph in the style of gromit. Nodes are methods whose values are cached per key, and
+             every node records which nodes it read while computing; setting a node throws away the cached values of
+             the nodes downstream of it, and only those, so scenario and bump-and-reprice loops recompute only what a
+             change actually reaches.
+
+             class Option(graph.Object):
+                 @graph.settable
+                 def Vol(self):
+                     return .1
+
+                 @graph.node
+                 def Price(self, key):
+                     return ... self.Vol() ...
+
+             opt = Option()
+             opt.Price('up')             # computed and cached
+             opt.Vol.set(.2)             # Price('up') is now stale, and recomputed on the next read
+             with opt.Vol.tweak(.25):    # a temporary value, restored on exit
+                 opt.Price('up')
+
+             For classes written with the lazy package's attributes, graph.lazy is a drop-in replacement that tracks
+             the same dependencies between attributes: assigning an attribute (or deleting it) throws away the cached
+             attributes computed from it.
+
+             class Hedger(object):
+                 @graph.lazy
+                 def Tenor(self):
+                     return .1
+
+                 @graph.lazy
+                 def DQTs(self):
+                     return ... self.Tenor ...
+
+             h = Hedger()
+             h.DQTs                      # computed and cached
+             h.Tenor = .5                # DQTs is now stale, and recomputed on the next read
+Test: test_graph.py
+"""
+
+# python imports
+from contextlib import contextmanager
+
+
+class Node(object):
+    ''' A graph method: the function computing the node's value for a key (the method's arguments) '''
+
+    def __init__(self, function, settable):
+        super(Node, self).__init__()
+        self.Function = function
+        self.Name = function.__name__
+        self.Settable = settable
+        self.__doc__ = function.__doc__
+
+    def __get__(self, obj, cls):
+        return self if obj is None else BoundNode(obj, self)
+
+
+class BoundNode(object):
+    ''' A node of a particular graph object; calling it with a key reads the node's value for that key '''
+
+    def __init__(self, obj, node):
+        super(BoundNode, self).__init__()
+        self.Object = obj
+        self.Node = node
+
+    def __call__(self, *key):
+        return self.Object.evaluate(self.Node, key)
+
+    def set(self, *args):
+        ''' set the node's value, key first: node.set(value) or node.set(key, value) '''
+        self.Object.set_value(self.Node, args[:-1], args[-1])
+
+    def unset(self, *key):
+        ''' drop a set value, so that the node is computed again '''
+        self.Object.unset_value(self.Node, key)
+
+    @contextmanager
+    def tweak(self, *args):
+        ''' set the node's value for the duration of a with block, as set(), then put back whatever was there '''
+        key, value = args[:-1], args[-1]
+        ident = (self.Node.Name, key)
+        was_set, previous = ident in self.Object._Set, self.Object._Set.get(ident)
+        self.set(*args)
+        try:
+            yield self
+        finally:
+            if was_set:
+                self.Object.set_value(self.Node, key, previous)
+            else:
+                self.unset(*key)
+
+
+class lazy(object):
+    '''
+    Decorator for a cached attribute, used like the lazy package's: the method is called on the first read and its
+    value kept, and assigning the attribute replaces the value. Unlike the lazy package's, every attribute records the
+    attributes it read while computing, and assigning or deleting an attribute throws away the cached values computed
+    from it, so that they are computed afresh on the next read. Assigned values are kept until deleted.
+    '''
+
+    def __init__(self, function):
+        super(lazy, self).__init__()
+        self.Function = function
+        self.Name = function.__name__
+        self.__doc__ = function.__doc__
+
+    def __get__(self, obj, cls):
+        if obj is None:
+            return self
+        state = lazy_state(obj)
+        if state.Evaluating:
+            state.Dependents.setdefault(self.Name, set()).add(state.Evaluating[-1])
+        if self.Name not in state.Values:
+            state.Evaluating.append(self.Name)
+            try:
+                state.Values[self.Name] = self.Function(obj)
+            finally:
+                state.Evaluating.pop()
+        return state.Values[self.Name]
+
+    def __set__(self, obj, value):
+        state = lazy_state(obj)
+        state.Values[self.Name] = value
+        state.Set.add(self.Name)
+        state.invalidate(self.Name)
+
+    def __delete__(self, obj):
+        state = lazy_state(obj)
+        state.Values.pop(self.Name, None)
+        state.Set.discard(self.Name)
+        state.invalidate(self.Name)
+
+
+class LazyState(object):
+    ''' The cached and assigned values of an object's lazy attributes, and the dependencies between them '''
+
+    def __init__(self):
+        super(LazyState, self).__init__()
+        self.Values = {}
+        self.Set = set()
+        self.Dependents = {}
+        self.Evaluating = []
+
+    def invalidate(self, name):
+        '''
+        throw away the cached values of everything computed from an attribute; assigned values stay, and so does
+        what was computed from them
+        '''
+        stale = [name]
+        while stale:
+            for dependent in self.Dependents.pop(stale.pop(), ()):
+                if dependent not in self.Set:
+                    self.Values.pop(dependent, None)
+                    stale.append(dependent)
+
+
+def lazy_state(obj):
+    ''' the LazyState of an object, created on first use '''
+    try:
+        return obj.__dict__['_LazyState']
+    except KeyError:
+        return obj.__dict__.setdefault('_LazyState', LazyState())
+
+
+def node(function):
+    ''' decorator for a computed graph method '''
+    return Node(function, settable=False)
+
+
+def settable(function):
+    ''' decorator for a graph method whose values can also be set, typically a model input '''
+    return Node(function, settable=True)
+
+
+class Object(object):
+    ''' Base class of graph objects: holds the cached and set node values and the dependencies between them '''
+
+    def __init__(self):
+        super(Object, self).__init__()
+        self._Values = {}
+        self._Set = {}
+        self._Dependents = {}
+        self._Evaluating = []
+
+    def evaluate(self, node, key):
+        ''' value of a node for a key, recording that the node being computed (if any) depends on it '''
+        ident = (node.Name, key)
+        if self._Evaluating:
+            self._Dependents.setdefault(ident, set()).add(self._Evaluating[-1])
+        if ident in self._Set:
+            return self._Set[ident]
+        if ident not in self._Values:
+            self._Evaluating.append(ident)
+            try:
+                self._Values[ident] = node.Function(self, *key)
+            finally:
+                self._Evaluating.pop()
+        return self._Values[ident]
+
+    def set_value(self, node, key, value):
+        if not node.Settable:
+            raise TypeError('%s is not settable' % node.Name)
+        ident = (node.Name, key)
+        self._Set[ident] = value
+        self.invalidate(ident)
+
+    def unset_value(self, node, key):
+        ident = (node.Name, key)
+        if ident in self._Set:
+            del self._Set[ident]
+            self.invalidate(ident)
+
+    def invalidate(self, ident):
+        '''
+        throw away the cached values of everything downstream of a node; their dependencies are recorded afresh when
+        they are next computed
+        '''
+        self._Values.pop(ident, None)
+        stale = [ident]
+        while stale:
+            for dependent in self._Dependents.pop(stale.pop(), ()):
+                self._Values.pop(dependent, None)
+                stale.append(dependent)
@@ -0,0 +1,150 @@
+'''
+Copyright:   Copyright (C) 2015 Baruch College, FX Modeling Course
+Author:      Weiyi Chen
+Description: Online accumulators for PNL statistics, so that simulation runs can be processed in chunks (or on
+             separate workers) and merged without ever holding all the PNLs at once.
+
+Test: Assignment_1_Weiyi_Chen/test_simulator.py
+'''
+
+# 3rd party imports
+
+from numpy import *
+
+
+class RunningMoments(object):
+    '''
+    Count, mean and sum of squared deviations of a stream of values. Batches are folded in with the pairwise update
+    of Chan et al, which is numerically stable and exact: merging the moments of two batches gives the moments of
+    their union.
+
+    Values are reduced along their last axis, so a 2-d batch accumulates one set of moments per row. With skipna the
+    NaNs of a batch are left out, and each row keeps its own count.
+    '''
+    def __init__(self):
+        super(RunningMoments, self).__init__()
+        self.Count = 0
+        self.Mean = 0.
+        self.M2 = 0.
+
+    def add(self, values, skipna=False):
+        ''' fold a batch of values into the running moments '''
+        values = asarray(values, dtype=float64)
+        if skipna:
+            valid = ~isnan(values)
+            count = valid.sum(axis=-1)
+            mean = where(valid, values, 0.).sum(axis=-1) / maximum(count, 1)
+            self._combine(count, mean, (where(valid, values - mean[..., newaxis], 0.)**2).sum(axis=-1))
+        elif values.size:
+            mean = values.mean(axis=-1)
+            self._combine(values.shape[-1], mean, ((values - mean[..., newaxis])**2).sum(axis=-1))
+        return self
+
+    def merge(self, other):
+        ''' fold another accumulator into this one '''
+        if other.Count:
+            self._combine(other.Count, other.Mean, other.M2)
+        return self
+
+    def _combine(self, count, mean, m2):
+        total = self.Count + count
+        delta = mean - self.Mean
+        # rows still without values (only with skipna) keep their zero moments
+        self.Mean += delta * count / maximum(total, 1)
+        self.M2 += m2 + delta**2 * self.Count * count / maximum(total, 1)
+        self.Count = total
+
+    @property
+    def Variance(self):
+        ''' population variance, as numpy's std() with the default ddof=0 '''
+        return self.M2 / self.Count if self.Count else 0.
+
+    @property
+    def StdDev(self):
+        return sqrt(self.Variance)
+
+    @property
+    def StdErr(self):
+        ''' standard error of the mean '''
+        return sqrt(self.Variance / self.Count) if self.Count else 0.
+
+
+class QuantileSketch(object):
+    '''
+    Mergeable streaming quantile sketch (a merging t-digest). Values are kept as weighted centroids whose size is
+    bounded by the logistic scale function k(q) = Compression / Z(n) * log(q / (1 - q)), Z(n) = 4 log(n / Compression)
+    + 24: each centroid covers at most one unit of k, so centroids are tiny in the tails, where VaR and expected 
+    shortfall live, and coarse in the body. Memory stays at a few hundred centroids whatever the number of values, and
+    merging two sketches is the same compression applied to the union of their centroids.
+    '''
+    def __init__(self, compression=1000):
+        super(QuantileSketch, self).__init__()
+        self.Compression = compression
+        self.Means = zeros(0)
+        self.Weights = zeros(0)
+        self.Min = inf
+        self.Max = -inf
+
+    @property
+    def Count(self):
+        return self.Weights.sum()
+
+    def add(self, values):
+        ''' fold a batch of values into the sketch '''
+        values = asarray(values, dtype=float64).ravel()
+        if values.size:
+            self.Min = minimum(self.Min, values.min())
+            self.Max = maximum(self.Max, values.max())
+            self._compress(concatenate([self.Means, values]), concatenate([self.Weights, ones(values.size)]))
+        return self
+
+    def merge(self, other):
+        ''' fold another sketch into this one '''
+        if other.Weights.size:
+            self.Min = minimum(self.Min, other.Min)
+            self.Max = maximum(self.Max, other.Max)
+            self._compress(concatenate([self.Means, other.Means]), concatenate([self.Weights, other.Weights]))
+        return self
+
+    def _compress(self, means, weights):
+        order = argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+
+        # scale function at the centre of each item decides which unit-width k bucket it falls in
+        cumulative = cumsum(weights)
+        count = cumulative[-1]
+        q = (cumulative - weights / 2.) / count
+        k = self.Compression / (4. * log(maximum(count / self.Compression, 1.)) + 24.) * log(q / (1. - q))
+        buckets = floor(k - k[0])
+        starts = flatnonzero(concatenate([[True], diff(buckets) > 0]))
+
+        self.Weights = add.reduceat(weights, starts)
+        self.Means = add.reduceat(means * weights, starts) / self.Weights
+
+    def _positions(self):
+        ''' cumulative weight at the centroids' centres, anchored by the exact min and max '''
+        centres = cumsum(self.Weights) - self.Weights / 2.
+        return (concatenate([[0.], centres, [self.Count]]), concatenate([[self.Min], self.Means, [self.Max]]))
+
+    def quantile(self, q):
+        ''' values at the given probability levels (scalar or array) '''
+        positions, values = self._positions()
+        return interp(asarray(q) * self.Count, positions, values)
+
+    def cdf(self, x):
+        ''' fraction of values below x (scalar or array) '''
+        positions, values = self._positions()
+        return interp(x, values, positions) / self.Count
+
+    def histogram(self, bins=50):
+        ''' approximate counts and bin edges, like numpy.histogram over [Min, Max] '''
+        edges = linspace(self.Min, self.Max, bins + 1) if isscalar(bins) else asarray(bins, dtype=float64)
+        return diff(self.cdf(edges)) * self.Count, edges
+
+    def VaR(self, level=.99):
+        ''' value at risk, the loss not exceeded with probability level '''
+        return -self.quantile(1. - level)
+
+    def ExpectedShortfall(self, level=.99, npoints=1000):
+        ''' average loss in the tail beyond the VaR, integrating the quantile function over the tail '''
+        return -self.quantile((1. - level) * (arange(npoints) + .5) / npoints).mean()
@@ -0,0 +1,171 @@
+"""
+Author: Weiyi Chen
+Copyright: Copyright (C) 2015 Baruch College, Modeling and Market Making in FX - All Rights Reserved
+Description: Test for the calculation graph
+"""
+
+import graph
+
+class Counted(graph.Object):
+    ''' A toy graph counting how often each node is computed '''
+
+    def __init__(self):
+        super(Counted, self).__init__()
+        self.Calls = {}
+
+    def count(self, name):
+        self.Calls[name] = self.Calls.get(name, 0) + 1
+
+    @graph.settable
+    def A(self):
+        return 1.
+
+    @graph.settable
+    def B(self, key):
+        return {'x': 2., 'y': 3.}[key]
+
+    @graph.node
+    def AB(self, key):
+        self.count(('AB', key))
+        return self.A() * self.B(key)
+
+    @graph.node
+    def Total(self):
+        self.count('Total')
+        return self.AB('x') + self.AB('y')
+
+    @graph.node
+    def OnlyY(self):
+        self.count('OnlyY')
+        return self.B('y') + 1.
+
+def test_caching():
+    '''Nodes are computed once per key'''
+    g = Counted()
+    assert g.Total() == 5.
+    assert g.Total() == 5. and g.AB('x') == 2.
+    assert g.Calls == {('AB', 'x'): 1, ('AB', 'y'): 1, 'Total': 1}
+
+def test_invalidation():
+    '''Setting a node recomputes its dependents only'''
+    g = Counted()
+    g.Total(), g.OnlyY()
+
+    g.B.set('x', 10.)
+    assert g.Total() == 13. and g.OnlyY() == 4.
+    assert g.Calls == {('AB', 'x'): 2, ('AB', 'y'): 1, 'Total': 2, 'OnlyY': 1}
+
+    g.A.set(2.)
+    assert g.Total() == 26. and g.OnlyY() == 4.
+    assert g.Calls == {('AB', 'x'): 3, ('AB', 'y'): 2, 'Total': 3, 'OnlyY': 1}
+
+    g.B.unset('x')
+    assert g.Total() == 10.
+
+    # only settable nodes can be set
+    try:
+        g.Total.set(0.)
+        assert False
+    except TypeError:
+        pass
+
+def test_tweak():
+    '''A tweak holds for the with block only'''
+    g = Counted()
+    g.A.set(3.)
+    with g.A.tweak(5.):
+        assert g.Total() == 25.
+        with g.B.tweak('y', 0.):
+            assert g.Total() == 10. and g.OnlyY() == 1.
+        assert g.OnlyY() == 4.
+    assert g.Total() == 15. and g.A() == 3.
+
+class Lazy(object):
+    ''' The toy graph with lazy attributes '''
+
+    def __init__(self):
+        super(Lazy, self).__init__()
+        self.Calls = {}
+
+    def count(self, name):
+        self.Calls[name] = self.Calls.get(name, 0) + 1
+
+    @graph.lazy
+    def A(self):
+        return 1.
+
+    @graph.lazy
+    def B(self):
+        return 2.
+
+    @graph.lazy
+    def AB(self):
+        self.count('AB')
+        return self.A * self.B
+
+    @graph.lazy
+    def Total(self):
+        self.count('Total')
+        return self.AB + 1.
+
+    @graph.lazy
+    def OnlyB(self):
+        self.count('OnlyB')
+        return self.B + 1.
+
+def test_lazy():
+    '''Lazy attributes are cached, and assigning one recomputes its dependents only'''
+    g = Lazy()
+    assert g.Total == 3. and g.Total == 3. and g.OnlyB == 3.
+    assert g.Calls == {'AB': 1, 'Total': 1, 'OnlyB': 1}
+
+    g.A = 5.
+    assert g.Total == 11. and g.OnlyB == 3.
+    assert g.Calls == {'AB': 2, 'Total': 2, 'OnlyB': 1}
+
+    # an assigned value stays until deleted, whatever it was computed from
+    g.AB = 0.
+    g.B = 3.
+    assert g.AB == 0. and g.Total == 1. and g.OnlyB == 4.
+    del g.AB
+    assert g.AB == 15. and g.Total == 16.
+    del g.A
+    assert g.Total == 4.
+    assert g.Calls == {'AB': 4, 'Total': 5, 'OnlyB': 2}
+
+    # the class attribute is the decorator itself, with the method's docstring
+    assert isinstance(Lazy.A, graph.lazy) and Lazy.OnlyB.Name == 'OnlyB'
+
+class Pending(Lazy):
+    ''' A cache updated in place, as VolSurface.Stale: it is only reset when an input it read is assigned '''
+
+    @graph.lazy
+    def Stale(self):
+        self.inputs()
+        return {'A', 'B'}
+
+    def inputs(self):
+        return self.A, self.B
+
+def test_lazy_in_place():
+    '''An attribute mutated in place is reset by any input it read, even through a method'''
+    g = Pending()
+    g.Stale.clear()
+    g.B = 3.
+    assert g.Stale == {'A', 'B'}
+    g.Stale.clear()
+    g.OnlyB
+    g.A = 2.
+    assert g.Stale == {'A', 'B'}
+
+    # an input it never read does not reset it
+    g.Stale.clear()
+    g.AB = 0.
+    assert not g.Stale
+
+if __name__=="__main__":
+    test_caching()
+    test_invalidation()
+    test_tweak()
+    test_lazy()
+    test_lazy_in_place()